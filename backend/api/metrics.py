@@ -0,0 +1,34 @@
+import time
+
+from flask import Blueprint, Response, g, request
+
+from backend.core.backend_manager import BackendManager
+from backend.core.metrics import METRICS
+
+
+bp = Blueprint("metrics", __name__)
+backend: BackendManager = None
+
+
+def init_metrics_routes(backend_manager):
+    global backend
+    backend = backend_manager
+
+
+@bp.before_app_request
+def start_request_timer():
+    g.start_time = time.perf_counter_ns()
+
+
+@bp.after_app_request
+def record_request_latency(response):
+    # Routes are labelled by their rule, not by their URL, so item IDs do not create new series:
+    if "start_time" in g and request.url_rule is not None:
+        METRICS.observe("commsman_http_request_seconds", time.perf_counter_ns() - g.start_time,
+                        method=request.method, route=request.url_rule.rule)
+    return response
+
+
+@bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(backend.get_metrics(), status=200, content_type="text/plain; version=0.0.4; charset=utf-8")
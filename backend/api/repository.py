@@ -1,6 +1,9 @@
+from datetime import datetime
+
 from flask import Blueprint, request
 
 from backend.api.utils import make_response
+from backend.core.downsampling import DOWNSAMPLING_METHODS
 from backend.repository.base_repository import BaseRepository
 
 
@@ -20,7 +23,8 @@ def create_item_request_from_handler():
         item_name = data['item_name']
         item_handler = data['item_handler']
         parent_item_id = data.get('parent_item_id')
-        result = repository.create_item_request_from_handler(item_name, item_handler, parent_item_id)
+        with repository.unit_of_work():
+            result = repository.create_item_request_from_handler(item_name, item_handler, parent_item_id)
         return make_response(result), 201
     except KeyError as e:
         return make_response({'error': f'Missing required field: {str(e)}'}), 400
@@ -35,7 +39,8 @@ def create_client_item():
         item_name = data['item_name']
         item_handler = data['item_handler']
         parent_item_id = data['parent_item_id']
-        result = repository.create_client_item(item_name, item_handler, parent_item_id)
+        with repository.unit_of_work():
+            result = repository.create_client_item(item_name, item_handler, parent_item_id)
         return make_response(result), 201
     except KeyError as e:
         return make_response({'error': f'Missing required field: {str(e)}'}), 400
@@ -50,7 +55,8 @@ def create_run_options_item():
         item_name = data['item_name']
         item_handler = data['item_handler']
         parent_item_id = data['parent_item_id']
-        result = repository.create_run_options_item(item_name, item_handler, parent_item_id)
+        with repository.unit_of_work():
+            result = repository.create_run_options_item(item_name, item_handler, parent_item_id)
         return make_response(result), 201
     except KeyError as e:
         return make_response({'error': f'Missing required field: {str(e)}'}), 400
@@ -61,7 +67,8 @@ def create_run_options_item():
 @bp.route('/items/<int:item_id>/request', methods=['GET'])
 def get_item_request(item_id):
     try:
-        item = repository.get_item_request(item_id)
+        with repository.unit_of_work():
+            item = repository.get_item_request(item_id)
         if item is None:
             return make_response({'error': 'Item not found'}), 404
         return make_response(item), 200
@@ -72,7 +79,8 @@ def get_item_request(item_id):
 @bp.route('/items/<int:item_id>/last_result_tree', methods=['GET'])
 def get_item_last_result_tree(item_id):
     try:
-        result = repository.get_item_last_result_tree(item_id)
+        with repository.unit_of_work():
+            result = repository.get_item_last_result_tree(item_id)
         return make_response(result), 200
     except Exception as e:
         return make_response({'error': str(e)}), 500
@@ -81,15 +89,148 @@ def get_item_last_result_tree(item_id):
 @bp.route('/items/<int:item_id>/results_history', methods=['GET'])
 def get_item_results_history(item_id):
     try:
-        result = repository.get_item_results_history(item_id)
+        since_id = request.args.get('since_id', None, type=int)
+        before_id = request.args.get('before_id', None, type=int)
+        limit = request.args.get('limit', 10, type=int)
+        with repository.unit_of_work():
+            result = repository.get_item_results_history(item_id, since_id, before_id, limit)
+        return make_response(result), 200
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+@bp.route('/items/<int:item_id>/latency', methods=['GET'])
+def get_item_latency_histograms(item_id):
+    try:
+        execution_session_id = request.args.get('execution_session_id', None, type=int)
+        with repository.unit_of_work():
+            result = repository.get_item_latency_histograms(item_id, execution_session_id)
+        return make_response(result), 200
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+@bp.route('/items/<int:item_id>/alarm_rules', methods=['GET'])
+def get_item_alarm_rules(item_id):
+    try:
+        with repository.unit_of_work():
+            result = repository.get_alarm_rules([item_id])
         return make_response(result), 200
     except Exception as e:
         return make_response({'error': str(e)}), 500
 
+
+@bp.route('/items/<int:item_id>/alarm_rules', methods=['POST'])
+def add_alarm_rule(item_id):
+    data = request.json
+    try:
+        with repository.unit_of_work():
+            result = repository.add_alarm_rule(item_id, **data)
+        return make_response(result), 201
+    except (TypeError, ValueError) as e:
+        return make_response({'error': str(e)}), 400
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+
+@bp.route('/alarm_rules/<int:rule_id>', methods=['PUT'])
+def update_alarm_rule(rule_id):
+    data = request.json
+    try:
+        with repository.unit_of_work():
+            result = repository.update_alarm_rule(rule_id, **data)
+        return make_response(result), 200
+    except ValueError as e:
+        return make_response({'error': str(e)}), 400
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+
+@bp.route('/alarm_rules/<int:rule_id>', methods=['DELETE'])
+def delete_alarm_rule(rule_id):
+    try:
+        with repository.unit_of_work():
+            repository.delete_alarm_rule(rule_id)
+        return make_response({'message': 'Alarm rule deleted successfully'}), 200
+    except ValueError as e:
+        return make_response({'error': str(e)}), 400
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+
+@bp.route('/items/<int:item_id>/alarm_events', methods=['GET'])
+def get_item_alarm_events(item_id):
+    try:
+        execution_session_id = request.args.get('execution_session_id', None, type=int)
+        limit = request.args.get('limit', 100, type=int)
+        with repository.unit_of_work():
+            result = repository.get_item_alarm_events(item_id, execution_session_id, limit)
+        return make_response(result), 200
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+
+@bp.route('/items/<int:item_id>/trend', methods=['GET'])
+def get_item_trend(item_id):
+    try:
+        time_from = request.args.get('from', None, type=datetime.fromisoformat)
+        time_to = request.args.get('to', None, type=datetime.fromisoformat)
+        since_id = request.args.get('since_id', None, type=int)
+        points = request.args.get('points', None, type=int)
+        method = request.args.get('method', 'lttb')
+        if method not in DOWNSAMPLING_METHODS:
+            return make_response({'error': f'Unknown downsampling method: {method}'}), 400
+        with repository.unit_of_work():
+            result = repository.get_item_trend(item_id, time_from, time_to, since_id, points, method)
+        return make_response(result), 200
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+
+@bp.route('/items/<int:item_id>/series', methods=['GET'])
+def get_item_series(item_id):
+    try:
+        time_from = request.args.get('from', None, type=datetime.fromisoformat)
+        time_to = request.args.get('to', None, type=datetime.fromisoformat)
+        bucket = request.args.get('bucket', 60, type=int)
+        aggregations = request.args.get('agg', None)
+        aggregations = aggregations.split(",") if aggregations else None
+        with repository.unit_of_work():
+            result = repository.get_item_series(item_id, time_from, time_to, bucket, aggregations)
+        return make_response(result), 200
+    except ValueError as e:
+        return make_response({'error': str(e)}), 400
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+
+@bp.route('/items/children', methods=['GET'])
+@bp.route('/items/<int:item_id>/children', methods=['GET'])
+def get_items_children(item_id=None):
+    try:
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', None, type=int)
+        with repository.unit_of_work():
+            result = repository.get_items_children(item_id, offset, limit)
+        return make_response(result), 200
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+@bp.route('/items/search', methods=['GET'])
+def search_items():
+    try:
+        pattern = request.args.get('name', '')
+        with repository.unit_of_work():
+            result = repository.search_items(pattern)
+        return make_response(result), 200
+    except ValueError as e:
+        return make_response({'error': str(e)}), 400
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
 @bp.route('/items/request_tree', methods=['GET'])
 def get_items_request_tree():
     try:
-        result = repository.get_items_request_tree()
+        with repository.unit_of_work():
+            result = repository.get_items_request_tree()
         return make_response(result), 200
     except Exception as e:
         return make_response({'error': str(e)}), 500
@@ -100,10 +241,42 @@ def update_item_from_handler(item_id):
     try:
         item_handler = data['item_handler']
         kwargs = data.get('kwargs', {})
-        result = repository.update_item_from_handler(item_id, item_handler, **kwargs)
+        with repository.unit_of_work():
+            result = repository.update_item_from_handler(item_id, item_handler, **kwargs)
+        return make_response(result), 200
+    except KeyError as e:
+        return make_response({'error': f'Missing required field: {str(e)}'}), 400
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+
+@bp.route('/items/positions', methods=['PATCH'])
+def update_items_positions():
+    data = request.json
+    try:
+        positions = data['positions']
+        with repository.unit_of_work():
+            result = repository.update_items_positions(positions)
+        return make_response(result), 200
+    except KeyError as e:
+        return make_response({'error': f'Missing required field: {str(e)}'}), 400
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
+
+
+@bp.route('/items/<int:item_id>/move', methods=['POST'])
+def move_item(item_id):
+    data = request.json
+    try:
+        parent_id = data['parent_id']
+        position = int(data['position'])
+        with repository.unit_of_work():
+            result = repository.move_item(item_id, parent_id, position)
         return make_response(result), 200
     except KeyError as e:
         return make_response({'error': f'Missing required field: {str(e)}'}), 400
+    except ValueError as e:
+        return make_response({'error': str(e)}), 400
     except Exception as e:
         return make_response({'error': str(e)}), 500
 
@@ -111,7 +284,8 @@ def update_item_from_handler(item_id):
 @bp.route('/items/<int:item_id>', methods=['DELETE'])
 def delete_item(item_id):
     try:
-        repository.delete_item(item_id)
+        with repository.unit_of_work():
+            repository.delete_item(item_id)
         return make_response({'message': 'Item deleted successfully'}), 200
     except Exception as e:
         return make_response({'error': str(e)}), 500
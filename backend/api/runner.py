@@ -1,7 +1,8 @@
-from flask import Blueprint
+from flask import Blueprint, request
 
 from backend.api.utils import make_response
 from backend.core.backend_manager import BackendManager
+from backend.core.profiler import PROFILER, capture_sampling_profile
 
 
 bp = Blueprint("runner", __name__)
@@ -20,16 +21,93 @@ def ping():
 
 @bp.route("/runner/start/<int:item_id>", methods=["PUT"])
 def run_item(item_id):
-    backend.start(item_id)
-    return make_response({"item_id": item_id, "running_threads": backend.get_running_threads()})
+    """Start a new run of the item, also when it is running. The run options given override those of the item for
+    this run only, e.g. {"run_options": {"polling_interval": 0.1}}."""
+    data = request.get_json(silent=True) or {}
+    try:
+        run_id = backend.start(item_id, data.get("run_options"))
+    except ValueError as e:
+        # Invalid run options:
+        return make_response({'error': str(e)}), 400
+    return make_response({"item_id": item_id, "run_id": run_id, "running_threads": backend.get_running_threads()})
 
 
 @bp.route("/runner/stop/<int:item_id>", methods=["PUT"])
 def stop_item(item_id):
+    """Ask the runner of the item, or all of them with item ID 0, to stop. It does not wait for them: the items are
+    'stopping' until they finish their sessions and leave the running threads."""
     backend.stop(item_id)
-    return make_response({"item_id": item_id, "running_threads": backend.get_running_threads()})
+    running_threads = backend.get_running_threads()
+    stopping_threads = backend.get_stopping_threads()
+    stopping = bool(stopping_threads) if item_id == 0 else item_id in stopping_threads
+    return make_response({"item_id": item_id,
+                          "state": "stopping" if stopping else "stopped",
+                          "running_threads": running_threads,
+                          "stopping_threads": stopping_threads}), 202 if stopping else 200
+
+
+@bp.route("/runner/runs", methods=["GET"])
+def get_runs():
+    return make_response({"runs": backend.get_runs()})
+
+
+@bp.route("/runner/runs/<int:run_id>/stop", methods=["PUT"])
+def stop_run(run_id):
+    """Ask a run to stop, without waiting for it, like '/runner/stop'."""
+    if not backend.stop_run(run_id):
+        return make_response({'error': f'Run {run_id} is not running'}), 404
+    return make_response({"run_id": run_id, "state": "stopping", "runs": backend.get_runs()}), 202
+
+
+@bp.route("/runner/runs/<int:run_id>/last_result_tree", methods=["GET"])
+def get_run_last_result_tree(run_id):
+    """Execution session of the run, with its last result tree and its live counters. Polled to follow a run while it
+    is running."""
+    try:
+        result = backend.get_run_last_result_tree(run_id)
+        return make_response(result), 200
+    except Exception as e:
+        return make_response({'error': str(e)}), 500
 
 
 @bp.route("/runner/running_threads", methods=["GET"])
 def get_running_threads():
-    return make_response({"running_threads": backend.get_running_threads()})
+    return make_response({"running_threads": backend.get_running_threads(),
+                          "stopping_threads": backend.get_stopping_threads()})
+
+
+@bp.route("/runner/latency", methods=["GET"])
+def get_latency_histograms():
+    return make_response({"latency": backend.get_latency_histograms()})
+
+
+@bp.route("/runner/serial_buses", methods=["GET"])
+def get_serial_buses():
+    return make_response({"serial_buses": backend.get_serial_buses()})
+
+
+@bp.route("/runner/profiling", methods=["GET"])
+def get_profiling():
+    return make_response(PROFILER.to_dict())
+
+
+@bp.route("/runner/profiling", methods=["PUT"])
+def set_profiling():
+    data = request.json or {}
+    if "enabled" in data:
+        PROFILER.enabled = bool(data["enabled"])
+    if data.get("reset"):
+        PROFILER.reset()
+    return make_response(PROFILER.to_dict())
+
+
+@bp.route("/runner/profiling/sample", methods=["POST"])
+def sample_profile():
+    data = request.json or {}
+    try:
+        result = capture_sampling_profile(seconds=float(data.get("seconds", 5)),
+                                          interval=float(data.get("interval", 0.005)),
+                                          top=int(data.get("top", 50)))
+        return make_response(result), 200
+    except ValueError as e:
+        return make_response({'error': str(e)}), 400
@@ -0,0 +1,202 @@
+import operator
+import struct
+import time
+from typing import Callable
+
+from backend.core.handlers.custom_modbus_handler import NUMERIC_DATA_TYPES
+from backend.core.metrics import METRICS
+from backend.core.result_records import AlarmEventRecord, ResultRecord
+from backend.models import AlarmRule, BaseRequest
+from utils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+RULE_TYPES = ("Threshold", "Range", "Rate of change", "Expected value")
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+SEVERITIES = ("Warning", "Critical")
+
+
+def compile_check(rule: AlarmRule, indexes: tuple) -> Callable:
+    """Check of a rule over the values of a response, with its limits bound once.
+
+    The check returns the indexes of the values in alarm. Values whose alarm is active are checked against the clearing
+    limits, 'hysteresis' beyond the raising ones, so values oscillating around a limit do not raise and clear alarms on
+    every poll.
+    """
+    hysteresis = abs(rule.hysteresis or 0)
+
+    if rule.rule_type == "Threshold":
+        compare = OPERATORS[rule.operator]
+        raise_limit = rule.limit
+        clear_limit = rule.limit - hysteresis if rule.operator in (">", ">=") else rule.limit + hysteresis
+
+        def check(values, active, previous, elapsed_time):
+            if not active:
+                return {index for index in indexes if compare(values[index], raise_limit)}
+            return {index for index in indexes
+                    if compare(values[index], clear_limit if index in active else raise_limit)}
+
+    elif rule.rule_type == "Range":
+        low, high = rule.low, rule.high
+        clear_low, clear_high = low + hysteresis, high - hysteresis
+
+        def check(values, active, previous, elapsed_time):
+            if not active:
+                return {index for index in indexes if not low <= values[index] <= high}
+            return {index for index in indexes
+                    if not ((clear_low <= values[index] <= clear_high) if index in active
+                            else (low <= values[index] <= high))}
+
+    elif rule.rule_type == "Rate of change":
+        raise_limit = abs(rule.limit)
+        clear_limit = raise_limit - hysteresis
+
+        def check(values, active, previous, elapsed_time):
+            # The rate needs a previous response, until then the alarms keep their state:
+            if previous is None or elapsed_time <= 0:
+                return set(active)
+            return {index for index in indexes
+                    if abs(values[index] - previous[index]) / elapsed_time > (clear_limit if index in active
+                                                                              else raise_limit)}
+
+    elif rule.rule_type == "Expected value":
+        expected = rule.limit
+        raise_tolerance = abs(rule.tolerance or 0)
+        clear_tolerance = max(raise_tolerance - hysteresis, 0)
+
+        def check(values, active, previous, elapsed_time):
+            if not active:
+                return {index for index in indexes if abs(values[index] - expected) > raise_tolerance}
+            return {index for index in indexes
+                    if abs(values[index] - expected) > (clear_tolerance if index in active else raise_tolerance)}
+
+    else:
+        raise ValueError(f"Unknown alarm rule type: {rule.rule_type}")
+
+    return check
+
+
+class CompiledRule:
+    __slots__ = ("rule", "check", "active")
+
+    def __init__(self, rule: AlarmRule, check: Callable):
+        self.rule = rule
+        self.check = check
+        self.active = set()  # Indexes of the values in alarm
+
+
+class CompiledRequest:
+    """Rules of a request bound to the layout of its response: the values decode with structs prepared once, and every
+    rule checks the whole tuple of values in a single pass."""
+    __slots__ = ("request_id", "register_count", "register_struct", "value_struct", "labels", "rules", "previous",
+                 "previous_time")
+
+    def __init__(self, item: BaseRequest, rules: list[AlarmRule]):
+        size, value_format = NUMERIC_DATA_TYPES[item.data_type]
+        count = max(item.count or 0, 0)
+        self.request_id = item.item_id
+        self.register_count = count * size
+        self.register_struct = struct.Struct(f">{count * size}H")
+        self.value_struct = struct.Struct(f">{count}{value_format}")
+        self.labels = [f"{address}" if size == 1 else f"{address}-{address + size - 1}"
+                       for address in range(item.address, item.address + count * size, size)]
+        self.rules = []
+        self.previous = None  # Values of the previous response, for the rates of change
+        self.previous_time = 0
+
+        for rule in rules:
+            if rule.address is None:
+                indexes = tuple(range(count))
+            else:
+                index, offset = divmod(rule.address - item.address, size)
+                if offset or not 0 <= index < count:
+                    continue
+                indexes = (index,)
+            self.rules.append(CompiledRule(rule, compile_check(rule, indexes)))
+
+    def decode(self, registers: list) -> tuple | None:
+        if len(registers) < self.register_count:
+            return None
+        return self.value_struct.unpack(self.register_struct.pack(*registers[:self.register_count]))
+
+
+class AlarmEngine:
+    """Alarm rules of the requests run by a runner, compiled when it starts.
+
+    The rules of a collection apply to all the requests below it. The engine evaluates the decoded values of every
+    answered request and returns the alarms raised and cleared, as events. Requests with active alarms are marked as
+    failed, with the alarms in the error message. Changes of the rules apply on the next run.
+    """
+
+    def __init__(self):
+        self.requests = {}  # Key: request ID, Value: compiled request
+
+    def compile(self, requests_tree: BaseRequest, rules: list[AlarmRule]):
+        rules_by_request = {}
+        for rule in rules:
+            if rule.enabled:
+                rules_by_request.setdefault(rule.request_id, []).append(rule)
+
+        def compile_item(item, inherited_rules):
+            item_rules = inherited_rules + rules_by_request.get(item.item_id, [])
+            if item.item_handler == "Collection":
+                for child in item.children:
+                    compile_item(child, item_rules)
+            elif item_rules and getattr(item, "data_type", None) in NUMERIC_DATA_TYPES:
+                try:
+                    compiled_request = CompiledRequest(item, item_rules)
+                except (ValueError, KeyError, TypeError, struct.error) as e:
+                    logger.warning("Alarm rules of '%s' could not be compiled: %s", item.name, e)
+                    return
+                if compiled_request.rules:
+                    self.requests[item.item_id] = compiled_request
+
+        self.requests.clear()
+        compile_item(requests_tree, [])
+
+    def evaluate(self, item: BaseRequest, result: ResultRecord) -> list[AlarmEventRecord]:
+        """Evaluate the rules of the request with its result. Failed requests keep the state of their alarms."""
+        compiled_request = self.requests.get(item.item_id)
+        if compiled_request is None or result.result != "OK":
+            return []
+        values = compiled_request.decode(result.registers or [])
+        if values is None:
+            return []
+
+        now = time.monotonic()
+        previous = compiled_request.previous
+        elapsed_time = now - compiled_request.previous_time
+        labels = compiled_request.labels
+        events = []
+        alarms = []
+        for compiled_rule in compiled_request.rules:
+            rule = compiled_rule.rule
+            active = compiled_rule.check(values, compiled_rule.active, previous, elapsed_time)
+            if active != compiled_rule.active:
+                for state, indexes in (("Raised", active - compiled_rule.active),
+                                       ("Cleared", compiled_rule.active - active)):
+                    for index in sorted(indexes):
+                        events.append(AlarmEventRecord(execution_session_id=result.execution_session_id,
+                                                       rule_id=rule.item_id,
+                                                       rule_name=rule.name,
+                                                       request_id=item.item_id,
+                                                       result=result,
+                                                       state=state,
+                                                       label=labels[index],
+                                                       value=values[index],
+                                                       severity=rule.severity))
+                        METRICS.increment("commsman_alarm_events_total", item_id=item.item_id, state=state,
+                                          severity=rule.severity)
+                compiled_rule.active = active
+            alarms += [AlarmEventRecord.get_message(rule.name, labels[index], values[index]) for index in sorted(active)]
+
+        compiled_request.previous = values
+        compiled_request.previous_time = now
+        if alarms:
+            result.result = "Failed"
+            result.error_message = f"Alarm: {', '.join(alarms)}"
+        return events
+
+
+METRICS.describe("commsman_alarm_events_total", "counter", "Alarms raised and cleared, by request, state and severity.")
@@ -1,19 +1,40 @@
+import atexit
 import threading
+import time
 
 from backend.core.background_task_manager import BackgroundTaskManager
+from backend.core.handlers.serial_bus_manager import SERIAL_BUSES
+from backend.core.metrics import METRICS
+from backend.core.runner_pool import RunnerPool
 from backend.repository import BaseRepository
 from backend.repository.sqlite_repository import SQLiteRepository
 from backend.core.runner import Runner
+from utils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+RUNNER_DRAIN_TIMEOUT = 10  # Seconds the runners have to finish their sessions when the backend shuts down
 
 
 class BackendManager:
-    """ Manages multiple backend worker threads """
+    """ Manages multiple backend worker threads
+
+    Every run of an item is a thread identified by its run ID, the ID of its execution session, so an item can run
+    several times at once. With workers, the items run in a pool of worker processes instead of in threads of this
+    process.
+    """
 
-    def __init__(self, repository: BaseRepository = None):
+    def __init__(self, repository: BaseRepository = None, workers: int = 0):
         super().__init__()
         self.repository = repository if repository else SQLiteRepository()
-        self.running_threads = {}  # Track active threads
+        self.running_threads = {}  # Track active threads. Key: run ID, Value: runner
         self.running = False
+        self.runner_pool = None
+        if workers:
+            self.runner_pool = RunnerPool(repository=self.repository, workers=workers)
+        # Last resort: the exit handlers of multiprocessing may terminate the workers first, see 'backend.main.run':
+        atexit.register(self.shutdown)
 
         # Setup background task manager:
         self.background_task_manager = BackgroundTaskManager()
@@ -24,44 +45,166 @@ class BackendManager:
     def running(self):
         return bool(self.get_running_threads())
 
-    def get_running_threads(self):
-        running_threads = {}
-        for item, value in self.running_threads.items():
-            if value.is_alive():
-                running_threads[item] = value
-        self.running_threads = running_threads
-        return list(self.running_threads.keys())
-
-    def start(self, item_id):
-        """ Starts a new thread for a given item_id """
-        if item_id in self.running_threads:
-            raise ValueError(f"Item ID {item_id} is already running.")
-
-        print(f"Starting process for Item ID {item_id}")
-
-        thread = Runner(repository=self.repository, item_id=item_id, daemon=True)
-
-        self.running_threads[item_id] = thread
+    def get_runners(self) -> list[Runner]:
+        """Runners alive, forgetting the finished ones."""
+        for run_id, thread in list(self.running_threads.items()):
+            if not thread.is_alive():
+                self._remove_thread(run_id)
+        return list(self.running_threads.values())
+
+    def get_running_threads(self) -> list:
+        """Items with runs alive, stopping or not."""
+        if self.runner_pool:
+            return self.runner_pool.get_running_items()
+        return sorted({thread.item.item_id for thread in self.get_runners()})
+
+    def get_stopping_threads(self) -> list:
+        """Items asked to stop whose runs are still finishing."""
+        if self.runner_pool:
+            return self.runner_pool.get_stopping_items()
+        runners = self.get_runners()
+        running_items = {thread.item.item_id for thread in runners if not thread.stopping}
+        return sorted({thread.item.item_id for thread in runners} - running_items)
+
+    def get_runs(self) -> list[dict]:
+        """Runs alive, with their run ID, item, state, run options overridden and poll rate."""
+        if self.runner_pool:
+            return self.runner_pool.get_runs()
+        return [thread.get_run() for thread in self.get_runners()]
+
+    def get_live_state(self, run_id: int) -> dict | None:
+        """Live counters of a run, see 'Runner.get_live_state'. None when the run is not alive."""
+        if self.runner_pool:
+            return self.runner_pool.get_live_state(run_id)
+
+        thread = self.running_threads.get(run_id)
+        if thread is None or not thread.is_alive():
+            return None
+        return thread.get_live_state()
+
+    def get_run_last_result_tree(self, run_id: int):
+        """Execution session of a run with its last result tree and, while the run is alive, its live counters, as
+        the runner only writes its state with the stored results or when its heartbeat is due."""
+        with self.repository.unit_of_work():
+            execution_session = self.repository.get_execution_session_result_tree(run_id)
+        # Read after the tree, so the counters are not older than it:
+        live_state = self.get_live_state(run_id)
+        if execution_session is None or live_state is None:
+            return execution_session
+
+        for key in ("elapsed_time", "iterations", "total_ok", "total_failed"):
+            setattr(execution_session, key, live_state[key])
+        results = [execution_session.results] if getattr(execution_session, "results", None) else []
+        while results:
+            result = results.pop()
+            for key, value in live_state["collection_results"].get(result.item_id, {}).items():
+                setattr(result, key, value)
+            results += [child for child in result.children if child.item_handler == "CollectionResult"]
+        return execution_session
+
+    def get_latency_histograms(self) -> dict:
+        """Live latency histograms of the runs, by run ID."""
+        if self.runner_pool:
+            return {run_id: histograms for status in self.runner_pool.get_status()
+                    for run_id, histograms in status["latency"].items()}
+        return {run_id: thread.latency_histograms.to_dict() for run_id, thread in list(self.running_threads.items())
+                if thread.is_alive()}
+
+    def get_serial_buses(self) -> dict:
+        """Utilization and slave turnaround of the serial buses, by port."""
+        if self.runner_pool:
+            return {port: bus for status in self.runner_pool.get_status() for port, bus in status["serial_buses"].items()}
+        return SERIAL_BUSES.get_status()
+
+    def get_metrics(self) -> str:
+        """Metrics in the Prometheus text format. Runner and database gauges are computed when they are scraped.
+
+        The metrics of the runner workers, summaries included, are labelled by worker.
+        """
+        if self.runner_pool:
+            statuses = self.runner_pool.get_status()
+            runs = [run for status in statuses for run in status["runs"]]
+        else:
+            runs = self.get_runs()
+        extra_metrics = {
+            "commsman_runners": {(): len(runs)},
+            "commsman_runner_poll_rate": {(("item_id", str(run["item_id"])), ("run_id", str(run["run_id"]))): run["poll_rate"]
+                                          for run in runs},
+            "commsman_database_size_bytes": {(): self.repository.get_database_size()},
+        }
+        if self.runner_pool:
+            for worker_index, status in enumerate(statuses):
+                for name, metric in status["metrics"].items():
+                    extra_metrics.setdefault(name, {}).update({labels + (("worker", str(worker_index)),): value
+                                                               for labels, value in metric.items()})
+        return METRICS.render(extra_metrics=extra_metrics)
+
+    def start(self, item_id, run_options: dict = None) -> int:
+        """ Starts a new run of a given item_id, with the run options given overriding its own. Returns the run ID. """
+        if self.runner_pool:
+            return self.runner_pool.start(item_id, run_options)
+
+        thread = Runner(repository=self.repository, item_id=item_id, run_options=run_options, daemon=True)
+        # The execution session is created first, its ID is the run ID:
+        thread.create_execution_session()
+        logger.info("Starting run %s of Item ID %s", thread.run_id, item_id, extra={"item_id": item_id})
+
+        self.running_threads[thread.run_id] = thread
         thread.start()
+        return thread.run_id
 
     def stop(self, item_id: int = None):
-        """Stops a specific worker thread gracefully."""
-        def stop_thread(item_id):
-            self.running_threads[item_id].stop()  # Set running flag to False
-            self.running_threads[item_id].join()  # Wait for completion
-            self._remove_thread(item_id)
-            print(f"Stopped process for Item ID {item_id}")
-
-        if item_id in self.running_threads:
-            stop_thread(item_id)
-        if item_id == 0:
-            items_id = list(self.running_threads.keys())
-            [stop_thread(item_id) for item_id in items_id]
-
-    def _remove_thread(self, item_id):
+        """Stops the runs of an item, or all of them with item ID 0, without waiting for them.
+
+        The runners wake up from their waits, cancel their requests in progress and finish their sessions in the
+        background, so all of them stop at the same time.
+        """
+        if self.runner_pool:
+            return self.runner_pool.stop(item_id)
+
+        for run_id, thread in list(self.running_threads.items()):
+            if item_id == 0 or thread.item.item_id == item_id:
+                self.stop_run(run_id)
+
+    def stop_run(self, run_id: int) -> bool:
+        """Stops a run without waiting for it. Returns False when the run is not alive."""
+        if self.runner_pool:
+            return self.runner_pool.stop_run(run_id)
+
+        thread = self.running_threads.get(run_id)
+        if thread is None or not thread.is_alive():
+            return False
+        if not thread.stopping:
+            thread.stop()
+            logger.info("Stopping run %s of Item ID %s", run_id, thread.item.item_id,
+                        extra={"item_id": thread.item.item_id})
+        return True
+
+    def shutdown(self, timeout: float = RUNNER_DRAIN_TIMEOUT):
+        """Stop all the worker threads and wait for them to finish their sessions, until the deadline.
+
+        With workers, the workers drain their runners and finish. Calling it again does nothing.
+        """
+        if self.runner_pool:
+            self.runner_pool.close(timeout)
+            return
+        self.stop(0)
+        deadline = time.monotonic() + timeout
+        for run_id, thread in list(self.running_threads.items()):
+            item_id = thread.item.item_id
+            thread.join(max(deadline - time.monotonic(), 0))
+            if thread.is_alive():
+                logger.warning("Run %s of Item ID %s did not stop in %s seconds", run_id, item_id, timeout,
+                               extra={"item_id": item_id})
+            else:
+                logger.info("Stopped run %s of Item ID %s", run_id, item_id, extra={"item_id": item_id})
+        self.get_runners()
+
+    def _remove_thread(self, run_id):
         """Removes the finished thread from the tracking dictionary."""
-        if item_id in self.running_threads:
-            self.running_threads.pop(item_id)
+        thread = self.running_threads.pop(run_id, None)
+        if thread is not None:
+            METRICS.remove("commsman_db_write_queue_depth", item_id=thread.item.item_id, run_id=run_id)
 
     @running.setter
     def running(self, value):
@@ -72,4 +215,4 @@ if __name__ == "__main__":
     backend_manager = BackendManager()
     backend_manager.repository.set_selected_item(item_id=1)
     backend_manager.start(item_id=1)  # Start first request
-    # backend_manager.start(item_id=2)  # Start another request (independent)
+    # backend_manager.start(item_id=1, run_options={"polling_interval": 10})  # Start another run of the same request
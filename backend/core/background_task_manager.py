@@ -2,6 +2,11 @@ import threading
 import time
 from typing import Callable, List
 
+from utils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
 
 class BackgroundTaskManager:
     """Manages background tasks that can be executed periodically or once."""
@@ -34,7 +39,7 @@ class BackgroundTaskManager:
         try:
             task()  # Run the task
         except Exception as e:
-            print(f"Error executing task: {e}")
+            logger.exception("Error executing task: %s", e)
 
     def add_task(self, task: Callable):
         """Add a task to be executed in the background."""
@@ -48,7 +53,7 @@ class BackgroundTaskManager:
                 try:
                     task()
                 except Exception as e:
-                    print(f"Exception in background task {task}: {e}")
+                    logger.exception("Exception in background task %s: %s", task, e)
                 time.sleep(interval_seconds)
 
         self.add_task(periodic_task)
@@ -0,0 +1,73 @@
+def min_max_downsample(points: list[tuple[float, float]], buckets: int) -> list[tuple[float, float]]:
+    """Reduce a series sorted by x to the minimum and maximum point of each of the given x buckets.
+
+    Peaks are never lost, so it is suited to spot outliers. Up to two points are returned per bucket, in x order.
+    """
+    if buckets <= 0 or len(points) <= 2 * buckets:
+        return list(points)
+
+    x_start = points[0][0]
+    bucket_width = (points[-1][0] - x_start) / buckets or 1
+
+    downsampled = []
+    bucket_index = 0
+    bucket_min = bucket_max = None
+    for point in points:
+        index = min(int((point[0] - x_start) / bucket_width), buckets - 1)
+        if index != bucket_index and bucket_min is not None:
+            downsampled.extend(sorted({bucket_min, bucket_max}))
+            bucket_min = bucket_max = None
+        bucket_index = index
+        if bucket_min is None or point[1] < bucket_min[1]:
+            bucket_min = point
+        if bucket_max is None or point[1] > bucket_max[1]:
+            bucket_max = point
+    if bucket_min is not None:
+        downsampled.extend(sorted({bucket_min, bucket_max}))
+
+    return downsampled
+
+
+def lttb_downsample(points: list[tuple[float, float]], threshold: int) -> list[tuple[float, float]]:
+    """Reduce a series sorted by x to the given number of points with the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are kept, and from each bucket in between the point that forms the largest triangle with
+    the point selected in the previous bucket and the average of the next bucket. It keeps the visual shape of a line.
+    """
+    if threshold < 3 or len(points) <= threshold:
+        return list(points)
+
+    bucket_size = (len(points) - 2) / (threshold - 2)
+
+    downsampled = [points[0]]
+    selected = 0
+    for bucket in range(threshold - 2):
+        # Average point of the next bucket:
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, len(points))
+        next_points = points[next_start:next_end]
+        average_x = sum(point[0] for point in next_points) / len(next_points)
+        average_y = sum(point[1] for point in next_points) / len(next_points)
+
+        # Point of the current bucket with the largest triangle area:
+        selected_x, selected_y = points[selected]
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        max_area = -1
+        for index in range(start, end):
+            area = abs((selected_x - average_x) * (points[index][1] - selected_y) -
+                       (selected_x - points[index][0]) * (average_y - selected_y))
+            if area > max_area:
+                max_area = area
+                selected_candidate = index
+        selected = selected_candidate
+        downsampled.append(points[selected])
+
+    downsampled.append(points[-1])
+    return downsampled
+
+
+DOWNSAMPLING_METHODS = {
+    "minmax": lambda points, size: min_max_downsample(points, size // 2),
+    "lttb": lttb_downsample,
+}
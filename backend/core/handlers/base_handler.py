@@ -17,5 +17,9 @@ class BaseHandler(ABC):
         """Check if the client is connected."""
         raise NotImplementedError
 
+    def cancel(self):
+        """Cancel the requests in progress, from another thread."""
+        pass
+
     def execute_request(self, **kwargs):
         raise NotImplementedError
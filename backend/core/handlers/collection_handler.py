@@ -1,41 +1,35 @@
-from datetime import datetime
-
-import tzlocal
-
-from backend.models import BaseResult, Collection, CollectionResult
+from backend.core.result_records import ResultRecord, CollectionResultRecord, now
+from backend.models import Collection
 
 
 class CollectionHandler:
     """Handles execution and real-time updates of requests and collections."""
-    def __init__(self, update_items_queue: list):
+    def __init__(self, update_items_queue: dict):
         self.update_items_queue = update_items_queue
 
     @staticmethod
-    def get_collection_result(item: Collection, parent_id: int, execution_session_id: int) -> CollectionResult:
-        return CollectionResult(
+    def get_collection_result(item: Collection, parent_id: int, execution_session_id: int) -> CollectionResultRecord:
+        return CollectionResultRecord(
             name=item.name,
             client_type=item.client_type,
             request_id=item.item_id,
             execution_session_id=execution_session_id,
             parent_id=parent_id,
-            result="OK",
-            elapsed_time=0,
-            timestamp=datetime.now(tzlocal.get_localzone()),
-            error_message=""
+            result="OK"
         )
 
-    def add_request(self, collection_result: CollectionResult, request: BaseResult):
+    def add_request(self, collection_result: CollectionResultRecord, request: ResultRecord):
         """Add a request to a collection and update its status."""
         collection_result.children.append(request)  # Add to the children list
         self.update_collection_result(collection_result)
 
-    def add_collection(self, parent: CollectionResult, collection_result: CollectionResult):
+    def add_collection(self, parent: CollectionResultRecord, collection_result: CollectionResultRecord):
         """Add a collection and update its status."""
         collection_result.parent = parent
         parent.children.append(collection_result)  # Add to the children list
         self.update_collection_result(parent)
 
-    def count_results(self, collection_result: CollectionResult):
+    def count_results(self, collection_result: CollectionResultRecord):
         """Count OK, Failed, and Pending requests in a collection and its collections."""
         total_ok = 0
         total_failed = 0
@@ -64,7 +58,7 @@ class CollectionHandler:
 
         return total_ok, total_failed, total_pending
 
-    def update_collection_result(self, collection_result: CollectionResult):
+    def update_collection_result(self, collection_result: CollectionResultRecord):
         """Update collection status based on its requests and collections."""
         collection_result.total_ok, collection_result.total_failed, collection_result.total_pending = self.count_results(collection_result)
 
@@ -76,10 +70,10 @@ class CollectionHandler:
             collection_result.result = "OK"
 
         # Calculate elapsed time
-        collection_result.elapsed_time = (datetime.now(tzlocal.get_localzone()) - collection_result.timestamp).total_seconds()
+        collection_result.elapsed_time = (now() - collection_result.timestamp).total_seconds()
 
         # Update repository
-        self.update_items_queue.append(collection_result)
+        self.update_items_queue[id(collection_result)] = collection_result
 
         # Propagate status update to parent
         if collection_result.parent:
@@ -1,15 +1,31 @@
+import socket
 import struct
+import threading
 import time
 from abc import abstractmethod
-from datetime import datetime
-import tzlocal
-
+from collections import deque
 from pymodbus import ModbusException
-from pymodbus.client import ModbusTcpClient, ModbusSerialClient
+from pymodbus.client import ModbusTcpClient
 from pymodbus.framer import FramerSocket, FramerRTU
 from pymodbus.pdu import DecodePDU
+from pymodbus.pdu import bit_message, register_message
 from backend.core.handlers.base_handler import BaseHandler
-from backend.models.modbus import ModbusResponse
+from backend.core.handlers.serial_bus_manager import SERIAL_BUSES, SerialBusConnection, BROADCAST_SLAVE
+from backend.core.metrics import METRICS
+from backend.core.profiler import PROFILER
+from backend.core.result_records import ModbusResponseRecord
+
+
+# Registers per value and struct format of the numeric data types:
+NUMERIC_DATA_TYPES = {
+    "16-bit Integer": (1, "h"),
+    "16-bit Unsigned Integer": (1, "H"),
+    "Hexadecimal": (1, "H"),
+    "32-bit Integer": (2, "i"),
+    "32-bit Unsigned Integer": (2, "I"),
+    "Float": (2, "f"),
+    "Double": (4, "d"),
+}
 
 
 class CustomModbusHandler(BaseHandler):
@@ -18,8 +34,20 @@ class CustomModbusHandler(BaseHandler):
         self.client_type = client_type
         self.framer = None
         self.response = None
+        self.connection_name = None
+        self.elapsed_time_ns = 0  # Latency of the last request, measured with a monotonic clock
+        self.connections = 0
+        self.batching = False  # Whether the requests of a collection are executed together with 'execute_requests'
+        self.cancelled = threading.Event()
 
     def connect(self):
+        if self.is_connected():
+            return True
+        if self.cancelled.is_set():
+            return False
+        self.connections += 1
+        if self.connections > 1:
+            METRICS.increment("commsman_connection_reconnects_total", connection=self.connection_name)
         return self.client.connect()
 
     @staticmethod
@@ -60,6 +88,58 @@ class CustomModbusHandler(BaseHandler):
 
         return registers
 
+    @staticmethod
+    def convert_value_after_receiving(data_type: str, address: int, registers: list) -> dict:
+        """Decode the numeric values of the received registers, by address. Non-numeric data types are not decoded."""
+        if data_type not in NUMERIC_DATA_TYPES or not registers:
+            return {}
+
+        size, value_format = NUMERIC_DATA_TYPES[data_type]
+        count = len(registers) // size
+        # Decode all values at once: registers are packed as words and unpacked with the data type format
+        raw_bytes = struct.pack(f">{count * size}H", *registers[:count * size])
+        values = struct.unpack(f">{count}{value_format}", raw_bytes)
+
+        address_values = {}
+        for index, value in enumerate(values):
+            new_address = address + index * size
+            label = f"{new_address}" if size == 1 else f"{new_address}-{new_address + size - 1}"
+            address_values[label] = value
+        return address_values
+
+    def get_request_values(self, data_type: str, function: str, count: int, values: list = None) -> list[int]:
+        """Registers to write or, for read requests, as many empty registers as the data type needs."""
+        if "Write" in function:
+            return self.convert_value_before_sending(data_type, values)
+        return self.convert_value_before_sending(data_type, [0 for _ in range(count)])
+
+    @staticmethod
+    def get_request_pdu(function: str, address: int, count: int, slave: int, values: list = None):
+        """Request PDU of a function, as built by the pymodbus client methods."""
+        match function:
+            case "Read Coils":
+                return bit_message.ReadCoilsRequest(address=address, count=count, dev_id=slave)
+            case "Read Discrete Inputs":
+                return bit_message.ReadDiscreteInputsRequest(address=address, count=count, dev_id=slave)
+            case "Read Holding Registers":
+                return register_message.ReadHoldingRegistersRequest(address=address, count=count, dev_id=slave)
+            case "Read Input Registers":
+                return register_message.ReadInputRegistersRequest(address=address, count=count, dev_id=slave)
+            case "Write Coil":
+                if len(values) > 1:
+                    raise Exception(f"Only one register can be written. Send {len(values)}. Please, ensure data type selected writes 16 bits")
+                return bit_message.WriteSingleCoilRequest(address=address, bits=[values[0]], dev_id=slave)
+            case "Write Coils":
+                return bit_message.WriteMultipleCoilsRequest(address=address, bits=values, dev_id=slave)
+            case "Write Register":
+                if len(values) > 1:
+                    raise Exception(f"Only one register can be written. Send {len(values)}. Please, ensure data type selected writes 16 bits")
+                return register_message.WriteSingleRegisterRequest(address=address, registers=[values[0]], dev_id=slave)
+            case "Write Registers":
+                return register_message.WriteMultipleRegistersRequest(address=address, registers=values, dev_id=slave)
+            case _:
+                raise Exception(f"Function '{function}' not supported")
+
     def execute_modbus_request(self, function: str, address: int, count: int, slave: int, values: list = None):
         match function:
             case "Read Coils":
@@ -87,31 +167,34 @@ class CustomModbusHandler(BaseHandler):
 
     def execute_request(self, name: str, item_id: int, parent_result_id: int, execution_session_id: int, data_type: str, function: str, address: int, count: int, slave: int, values: list = None, **kwargs):
         self.framer.reset_packets()
-        self.initialize_response_dataclass(name=name, request_id=item_id, parent_result_id=parent_result_id, execution_session_id=execution_session_id)
+        self.initialize_response(name=name, request_id=item_id, parent_result_id=parent_result_id, execution_session_id=execution_session_id)
 
-        start_time = time.time()
+        start_time = time.perf_counter_ns()
         self.response.result = "Failed"
         self.response.client_type = self.client_type
 
         try:
-            if "Write" in function:
-                values = self.convert_value_before_sending(data_type, values)
-            else:
-                values = self.convert_value_before_sending(data_type, [0 for _ in range(count)])
-            count = len(values)
+            if self.cancelled.is_set():
+                raise ModbusException("Request cancelled")
+
+            with PROFILER.measure("encode"):
+                values = self.get_request_values(data_type, function, count, values)
+                count = len(values)
 
-            modbus_response = self.execute_modbus_request(function=function,
-                                                          slave=slave,
-                                                          address=address,
-                                                          count=count,
-                                                          values=values)
+            with PROFILER.measure("wire"):
+                modbus_response = self.execute_modbus_request(function=function,
+                                                              slave=slave,
+                                                              address=address,
+                                                              count=count,
+                                                              values=values)
 
-            self.response.raw_packet_send = " ".join(f"0x{byte:02X}" for byte in self.framer.last_packet_send)
-            self.response.raw_packet_recv = " ".join(f"0x{byte:02X}" for byte in self.framer.last_packet_recv)
+            with PROFILER.measure("decode"):
+                self.response.raw_packet_send = " ".join(f"0x{byte:02X}" for byte in self.framer.last_packet_send)
+                self.response.raw_packet_recv = " ".join(f"0x{byte:02X}" for byte in self.framer.last_packet_recv)
 
-            self.process_response_data(modbus_response=modbus_response,
-                                       address=address,
-                                       values=values)
+                self.process_response_data(modbus_response=modbus_response,
+                                           address=address,
+                                           values=values)
 
             if modbus_response.isError():
                 raise ModbusException("Modbus returns error function code")
@@ -123,22 +206,19 @@ class CustomModbusHandler(BaseHandler):
             self.response.error_message = f"Exception received: {e}"
 
         self.response.data_type = data_type
-        end_time = time.time()
-        self.response.elapsed_time = end_time - start_time
+        self.elapsed_time_ns = time.perf_counter_ns() - start_time
+        self.response.elapsed_time = self.elapsed_time_ns / 1e9
 
         return self.response
 
-    def initialize_response_dataclass(self, name: str, request_id: int, parent_result_id: int, execution_session_id: int) -> ModbusResponse:
-        self.response = ModbusResponse(
+    def initialize_response(self, name: str, request_id: int, parent_result_id: int, execution_session_id: int) -> ModbusResponseRecord:
+        self.response = ModbusResponseRecord(
             name=name,
             client_type=self.client_type,
             request_id=request_id,
             parent_id=parent_result_id,
             execution_session_id=execution_session_id,
-            result="Pending",
-            timestamp=datetime.now(tzlocal.get_localzone()),
-            elapsed_time=0,
-            error_message=""
+            result="Pending"
         )
         return self.response
 
@@ -146,6 +226,11 @@ class CustomModbusHandler(BaseHandler):
     def process_response_data(self, modbus_response, address: int, values: list[int]):
         pass
 
+    def cancel(self):
+        """Cancel the requests of the handler, from another thread. The request in progress fails as soon as possible
+        and the next ones fail without being sent."""
+        self.cancelled.set()
+
     def disconnect(self):
         if self.client:
             self.client.close()
@@ -176,8 +261,27 @@ class CustomSocketFramer(FramerSocket):
         return output
 
 
+class PipelinedTransaction:
+    """A request sent without waiting for the previous responses, matched with its response by transaction ID."""
+
+    __slots__ = ("request", "response", "values", "transaction_id", "packet_send", "packet_recv", "modbus_response",
+                 "start_time", "end_time")
+
+    def __init__(self, request: dict, response: ModbusResponseRecord):
+        self.request = request
+        self.response = response
+        self.values = None
+        self.transaction_id = None
+        self.packet_send = b''
+        self.packet_recv = b''
+        self.modbus_response = None
+        self.start_time = None
+        self.end_time = None
+
+
 class CustomModbusTcpClient(CustomModbusHandler):
-    def __init__(self, host: str, port: int, timeout: int, retries: int, client_type: str, **kwargs):
+    def __init__(self, host: str, port: int, timeout: int, retries: int, client_type: str, pipelining: bool = False,
+                 max_in_flight: int = 8, **kwargs):
         super().__init__(client_type)
         self.client = ModbusTcpClient(host=host,
                                       port=port,
@@ -185,6 +289,140 @@ class CustomModbusTcpClient(CustomModbusHandler):
                                       retries=retries)
         self.framer = CustomSocketFramer()
         self.client.transaction.framer = self.framer
+        self.connection_name = f"{host}:{port}"
+
+        self.timeout = timeout
+        self.batching = pipelining
+        self.max_in_flight = max(max_in_flight or 1, 1)
+        self.pipeline_framer = FramerSocket(DecodePDU(False))
+        self.transaction_id = 0
+
+    def cancel(self):
+        super().cancel()
+        # Shutting down the socket wakes up the thread waiting for a response:
+        sock = self.client.socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def get_next_transaction_id(self) -> int:
+        self.transaction_id = self.transaction_id % 0xFFFF + 1
+        return self.transaction_id
+
+    def execute_requests(self, requests: list[dict], parent_result_id: int, execution_session_id: int) -> list[ModbusResponseRecord]:
+        """Execute several requests pipelined: up to 'max_in_flight' requests are sent before waiting for a response.
+
+        Responses are matched by transaction ID, so the device can answer in any order. The elapsed time of every
+        request goes from its sending to its response. Requests are not retried: when a response times out, the
+        requests in flight fail and the connection is opened again for the rest.
+        """
+        transactions = []
+        for request in requests:
+            response = self.initialize_response(name=request["name"],
+                                                request_id=request["item_id"],
+                                                parent_result_id=parent_result_id,
+                                                execution_session_id=execution_session_id)
+            response.result = "Failed"
+            response.data_type = request["data_type"]
+            transaction = PipelinedTransaction(request, response)
+            transactions.append(transaction)
+            try:
+                with PROFILER.measure("encode"):
+                    transaction.values = self.get_request_values(request["data_type"], request["function"],
+                                                                 request["count"], request.get("values"))
+                    pdu = self.get_request_pdu(function=request["function"],
+                                               address=request["address"],
+                                               count=len(transaction.values),
+                                               slave=request["slave"],
+                                               values=transaction.values)
+                    pdu.transaction_id = transaction.transaction_id = self.get_next_transaction_id()
+                    transaction.packet_send = self.pipeline_framer.buildFrame(pdu)
+            except Exception as e:
+                response.error_message = f"Exception received: {e}"
+
+        with PROFILER.measure("wire"):
+            self.exchange([transaction for transaction in transactions if transaction.packet_send])
+
+        for transaction in transactions:
+            self.complete_transaction(transaction)
+        return [transaction.response for transaction in transactions]
+
+    def exchange(self, transactions: list[PipelinedTransaction]):
+        """Send the transactions keeping up to 'max_in_flight' without response, and receive their responses."""
+        pending = deque(transactions)
+        in_flight = {}  # Key: transaction ID, Value: transaction
+        buffer = b''
+        while pending or in_flight:
+            try:
+                self.client.socket.settimeout(self.timeout)
+                while pending and len(in_flight) < self.max_in_flight:
+                    transaction = pending.popleft()
+                    transaction.start_time = time.perf_counter_ns()
+                    # In flight before sending, so a failed send sets its error too:
+                    in_flight[transaction.transaction_id] = transaction
+                    self.client.socket.sendall(transaction.packet_send)
+
+                # The oldest request in flight decides the timeout:
+                waited_time = (time.perf_counter_ns() - min(transaction.start_time for transaction in in_flight.values())) / 1e9
+                if waited_time >= self.timeout:
+                    raise TimeoutError(f"No response received in {self.timeout} seconds")
+                self.client.socket.settimeout(self.timeout - waited_time)
+                data = self.client.socket.recv(4096)
+                if not data:
+                    raise ConnectionError("Connection closed by the device")
+
+                buffer += data
+                while True:
+                    used_length, modbus_response = self.pipeline_framer.processIncomingFrame(buffer)
+                    if not used_length:
+                        break
+                    packet_recv, buffer = buffer[:used_length], buffer[used_length:]
+                    transaction = in_flight.pop(modbus_response.transaction_id, None) if modbus_response else None
+                    if transaction:
+                        transaction.end_time = time.perf_counter_ns()
+                        transaction.packet_recv = packet_recv
+                        transaction.modbus_response = modbus_response
+            except (OSError, AttributeError, ModbusException) as e:
+                # The socket is closed, so late responses do not match the next requests:
+                for transaction in in_flight.values():
+                    transaction.response.error_message = f"Modbus Client returns exception:\n\n{e}"
+                in_flight = {}
+                buffer = b''
+                self.client.close()
+                if pending and not self.connect():
+                    for transaction in pending:
+                        transaction.response.error_message = f"Modbus Client returns exception:\n\nConnection to {self.connection_name} failed"
+                    return
+
+    def complete_transaction(self, transaction: PipelinedTransaction):
+        """Fill the response of a transaction, as done by 'execute_request' for a single request."""
+        self.response = transaction.response
+        if transaction.end_time:
+            self.elapsed_time_ns = transaction.end_time - transaction.start_time
+            self.response.elapsed_time = self.elapsed_time_ns / 1e9
+        if transaction.modbus_response is None:
+            return
+
+        try:
+            with PROFILER.measure("decode"):
+                self.framer.last_packet_send = transaction.packet_send
+                self.framer.last_packet_recv = transaction.packet_recv
+                self.response.raw_packet_send = " ".join(f"0x{byte:02X}" for byte in transaction.packet_send)
+                self.response.raw_packet_recv = " ".join(f"0x{byte:02X}" for byte in transaction.packet_recv)
+                self.process_response_data(modbus_response=transaction.modbus_response,
+                                           address=transaction.request["address"],
+                                           values=transaction.values)
+
+            if transaction.modbus_response.isError():
+                raise ModbusException("Modbus returns error function code")
+            else:
+                self.response.result = "OK"
+        except ModbusException as e:
+            self.response.error_message = f"Modbus Client returns exception:\n\n{e}"
+        except Exception as e:
+            self.response.error_message = f"Exception received: {e}"
 
     def process_response_data(self, modbus_response, address: int, values: list[int]):
         self.response.slave = self.framer.last_packet_recv[6]
@@ -219,23 +457,76 @@ class CustomRtuFramer(FramerRTU):
 
 
 class CustomModbusRtuClient(CustomModbusHandler):
-    def __init__(self, com_port: str, baudrate: int, parity: str, stopbits: int, bytesize: int, timeout: int, retries: int, client_type: str, **kwargs):
+    """Client of a slave, or of several, on a serial bus.
+
+    Requests go through the bus manager of the port, which is shared by all the clients of the port. With request
+    scheduling, the requests of a collection are executed together in the order chosen by the bus.
+    """
+
+    def __init__(self, com_port: str, baudrate: int, parity: str, stopbits: int, bytesize: int, timeout: int, retries: int, client_type: str,
+                 broadcast_delay: int = 100, schedule_requests: bool = False, **kwargs):
         super().__init__(client_type)
         parity = "N" if parity == "None" else parity
         parity = "E" if parity == "Even" else parity
         parity = "O" if parity == "Odd" else parity
 
-        self.client = ModbusSerialClient(port=com_port,
-                                         baudrate=baudrate,
-                                         parity=parity,
-                                         stopbits=stopbits,
-                                         bytesize=bytesize,
-                                         timeout=timeout,
-                                         retries=retries)
+        self.client = SerialBusConnection(bus=SERIAL_BUSES.get_bus(com_port),
+                                          baudrate=baudrate,
+                                          parity=parity,
+                                          stopbits=stopbits,
+                                          bytesize=bytesize,
+                                          timeout=timeout,
+                                          retries=retries,
+                                          broadcast_delay=broadcast_delay / 1000)
         self.framer = CustomRtuFramer()
-        self.client.transaction.framer = self.framer
+        self.connection_name = com_port
+        self.batching = schedule_requests
+        self.cancelled = self.client.cancelled
+
+    def execute_modbus_request(self, function: str, address: int, count: int, slave: int, values: list = None):
+        if slave == BROADCAST_SLAVE and "Write" not in function:
+            raise Exception("Only write functions can be broadcast")
+        pdu = self.get_request_pdu(function=function, address=address, count=count, slave=slave, values=values)
+        modbus_response, self.framer.last_packet_send, self.framer.last_packet_recv = self.client.execute(pdu)
+        return modbus_response
+
+    def execute_requests(self, requests: list[dict], parent_result_id: int, execution_session_id: int) -> list[ModbusResponseRecord]:
+        """Execute the requests in the order scheduled by the bus. Results are returned in the order of the requests.
+
+        Once a slave times out, its next requests of the batch fail without being sent.
+        """
+        results = [None] * len(requests)
+        timed_out_slaves = set()
+        for index in self.client.bus.schedule(requests, self.client.timeout):
+            request = requests[index]
+            if request["slave"] in timed_out_slaves:
+                response = self.initialize_response(name=request["name"],
+                                                    request_id=request["item_id"],
+                                                    parent_result_id=parent_result_id,
+                                                    execution_session_id=execution_session_id)
+                response.result = "Failed"
+                response.data_type = request["data_type"]
+                response.error_message = f"Not sent: slave {request['slave']} did not answer a previous request"
+                results[index] = response
+                continue
+
+            results[index] = self.execute_request(**request,
+                                                  parent_result_id=parent_result_id,
+                                                  execution_session_id=execution_session_id)
+            if self.client.bus.get_slave(request["slave"]).timed_out:
+                timed_out_slaves.add(request["slave"])
+        return results
 
     def process_response_data(self, modbus_response, address: int, values: list[int]):
+        if not self.framer.last_packet_recv:
+            # Broadcasts are not answered:
+            self.response.slave = BROADCAST_SLAVE
+            self.response.function_code = self.framer.last_packet_send[1]
+            self.response.byte_count = 0
+            self.response.address = address
+            self.response.registers = values
+            return
+
         self.response.slave = self.framer.last_packet_recv[0]
         self.response.function_code = self.framer.last_packet_recv[1]
         self.response.byte_count = len(self.framer.last_packet_recv)
@@ -1,36 +1,52 @@
 from dataclasses import asdict
-from datetime import datetime
-
-import tzlocal
 
 from backend.core.handlers.base_handler import BaseHandler
 from backend.core.handlers.custom_modbus_handler import CustomModbusTcpClient, CustomModbusRtuClient
-from backend.models import BaseRequest, ModbusResponse
+from backend.core.result_records import ModbusResponseRecord
+from backend.models import BaseRequest
 
 
 class ProtocolClientManager:
     def __init__(self, repository):
         self.repository = repository
         self.handlers: dict[str, BaseHandler] = {}  # Key: handler ID, Value: handler
+        self.item_handlers = {}  # Key: request ID, Value: handler or error message, resolved once per run
+
+    def find_item_client(self, item: BaseRequest, base_item: BaseRequest = None):
+        """Get the client of the item, inherited from its parents if needed, or an error message."""
+        base_item = base_item or item
+        if item.client_type == "No connection":
+            return "Current request does not have client"
+        elif item.client_type == "Inherit from parent":
+            parent = self.repository.get_item_request(item.parent_id)
+            return self.find_item_client(parent, base_item)
+        elif item.client:
+            if item.client.item_type == base_item.item_type:
+                return item.client
+            else:
+                return f"Current request client protocol is not correct: expected {base_item.item_type} - found {item.item_type}"
+        else:
+            return f"FATAL ERROR - Could not resolve item client: {item.client} - {item}"
+
+    def get_connection_name(self, item: BaseRequest) -> str | None:
+        """Name of the device connection of the item: host and port for TCP clients and port for RTU clients."""
+        item_client = self.find_item_client(item=item)
+        if isinstance(item_client, str):
+            return None
+        if item_client.item_handler == "ModbusTcpClient":
+            return f"{item_client.host}:{item_client.port}"
+        return getattr(item_client, "com_port", None)
 
     def get_client_handler(self, item: BaseRequest) -> BaseHandler | str:
-        """Get or create a handler for the specified protocol."""
-
-        def find_item_client(item, base_item):
-            if item.client_type == "No connection":
-                return "Current request does not have client"
-            elif item.client_type == "Inherit from parent":
-                parent = self.repository.get_item_request(item.parent_id)
-                return find_item_client(parent, base_item)
-            elif item.client:
-                if item.client.item_type == base_item.item_type:
-                    return item.client
-                else:
-                    return f"Current request client protocol is not correct: expected {base_item.item_type} - found {item.item_type}"
-            else:
-                return f"FATAL ERROR - Could not resolve item client: {item.client} - {item}"
+        """Get or create a handler for the specified protocol. The handler of a request is resolved once, the requests
+        of a runner do not change while it runs."""
+        item_handler = self.item_handlers.get(item.item_id)
+        if item_handler is None:
+            item_handler = self.item_handlers[item.item_id] = self.resolve_client_handler(item)
+        return item_handler
 
-        item_client = find_item_client(item=item, base_item=item)
+    def resolve_client_handler(self, item: BaseRequest) -> BaseHandler | str:
+        item_client = self.find_item_client(item=item, base_item=item)
 
         # Client not found:
         if isinstance(item_client, str):
@@ -50,15 +66,13 @@ class ProtocolClientManager:
 
     def get_request_failed_result(self, item: BaseRequest, parent_id: int, execution_session_id: int, error_message: str):
         if item.item_response_handler == "ModbusResponse":
-            response = ModbusResponse(
+            response = ModbusResponseRecord(
                 name=item.name,
                 client_type=item.client_type,
                 request_id=item.item_id,
                 execution_session_id=execution_session_id,
                 parent_id=parent_id,
                 result="Failed",
-                elapsed_time=0,
-                timestamp=datetime.now(tzlocal.get_localzone()),
                 error_message=error_message
             )
         else:
@@ -72,6 +86,12 @@ class ProtocolClientManager:
         if handler_id in self.handlers:
             self.handlers[handler_id].disconnect()
             del self.handlers[handler_id]
+            self.item_handlers.clear()
+
+    def cancel_all_handlers(self):
+        """Cancel the requests of all the handlers, from another thread."""
+        for handler_client in list(self.handlers.values()):
+            handler_client.cancel()
 
     def close_all_handlers(self):
         """Close a handler for the specified protocol."""
@@ -98,4 +118,5 @@ class ProtocolClientManager:
         if handler_id in self.handlers:
             self.handlers[handler_id].disconnect()
             del self.handlers[handler_id]
+            self.item_handlers.clear()
         return self.get_handler(**kwargs)
@@ -0,0 +1,317 @@
+import threading
+import time
+
+import serial
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+from pymodbus.framer import FramerRTU
+from pymodbus.pdu import DecodePDU
+
+from backend.core.latency_histogram import LatencyHistogram
+from backend.core.metrics import METRICS
+from utils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+BROADCAST_SLAVE = 0
+UTILIZATION_WINDOW = 10  # Seconds of the bus utilization gauge
+EXPECTED_TIME_WEIGHT = 0.2  # Weight of the last transaction in the expected transaction time of a slave
+CANCEL_CHECK_INTERVAL = 0.1  # Maximum seconds a cancelled request keeps waiting for its response
+
+
+def get_character_time(baudrate: int, bytesize: int, parity: str, stopbits: float) -> float:
+    """Transmission time of a character in seconds: start bit, data bits, parity bit and stop bits."""
+    bits = 1 + bytesize + (0 if parity == "N" else 1) + stopbits
+    return bits / baudrate
+
+
+def get_inter_frame_silence(baudrate: int, character_time: float) -> float:
+    """Minimum silence between frames in seconds: 3.5 characters, fixed to 1.75 ms above 19200 bauds."""
+    return 0.00175 if baudrate > 19200 else 3.5 * character_time
+
+
+class SlaveStatistics:
+    __slots__ = ("responses", "turnaround", "expected_time_ns", "timed_out", "timeouts")
+
+    def __init__(self):
+        self.responses = 0
+        self.turnaround = LatencyHistogram()  # Only of the responses whose turnaround could be measured
+        self.expected_time_ns = 0  # Moving average of the transaction time, from sending to the end of the response
+        self.timed_out = False  # Whether the last request of the slave timed out
+        self.timeouts = 0
+
+
+class SerialBus:
+    """RS-485 line of a serial port, shared by all the clients of the port in the process.
+
+    The bus owns the port, which is open while any client is connected, and executes one transaction at a time. Before
+    sending, it waits only the rest of the inter-frame silence since the last frame on the line, computed from the
+    settings of the transaction, and after a broadcast it waits the turnaround delay of the slaves. Every transaction
+    measures the turnaround of the slave, from the end of the request to the start of the response, and the time the
+    line is busy with frames.
+    """
+
+    def __init__(self, port: str):
+        self.port = port
+        self.lock = threading.Lock()
+        self.serial = None
+        self.settings = None
+        self.connections = set()
+        self.framer = FramerRTU(DecodePDU(False))
+        self.last_frame_end = 0  # Monotonic time in nanoseconds when the line is free for the next frame
+        self.slaves = {}  # Key: slave, Value: statistics
+        self.busy_time_ns = 0
+        self.window_start = time.perf_counter_ns()
+        self.window_busy_time_ns = 0
+        self.utilization = 0.0
+
+    def open(self, connection) -> bool:
+        with self.lock:
+            if self.serial is None:
+                try:
+                    self.serial = serial.serial_for_url(self.port, exclusive=True, **connection.get_serial_settings())
+                    self.settings = connection.get_serial_settings()
+                    self.last_frame_end = 0
+                except Exception as e:
+                    logger.error("Serial port %s could not be opened: %s", self.port, e)
+                    return False
+            self.connections.add(connection)
+            return True
+
+    def close(self, connection):
+        """Release the bus for the connection. The port is closed when no connection uses it."""
+        with self.lock:
+            self.connections.discard(connection)
+            if not self.connections and self.serial is not None:
+                self.serial.close()
+                self.serial = None
+
+    def is_open(self, connection) -> bool:
+        return self.serial is not None and connection in self.connections
+
+    def apply_settings(self, connection):
+        """Use the serial settings of the connection, when different clients of the port have different ones."""
+        settings = connection.get_serial_settings()
+        if settings != self.settings:
+            self.serial.apply_settings(settings)
+            self.settings = settings
+
+    def get_slave(self, slave: int) -> SlaveStatistics:
+        if slave not in self.slaves:
+            self.slaves[slave] = SlaveStatistics()
+        return self.slaves[slave]
+
+    def get_expected_time(self, slave: int, timeout: float) -> int:
+        """Expected transaction time in nanoseconds. Slaves whose last request timed out are expected to time out."""
+        statistics = self.slaves.get(slave)
+        if statistics is None:
+            return 0
+        return round(timeout * 1e9) if statistics.timed_out else statistics.expected_time_ns
+
+    def schedule(self, requests: list[dict], timeout: float) -> list[int]:
+        """Execution order of the requests of a batch, as indexes.
+
+        Broadcasts keep their position, as they change every slave. Between them, the requests are grouped by slave
+        keeping their order, and the slaves expected to answer sooner go first, so the slaves that do not answer delay
+        the rest as little as possible.
+        """
+        order = []
+        segment = {}  # Key: slave, Value: request indexes
+
+        def add_segment():
+            for slave in sorted(segment, key=lambda slave: self.get_expected_time(slave, timeout)):
+                order.extend(segment[slave])
+            segment.clear()
+
+        for index, request in enumerate(requests):
+            if request["slave"] == BROADCAST_SLAVE:
+                add_segment()
+                order.append(index)
+            else:
+                segment.setdefault(request["slave"], []).append(index)
+        add_segment()
+        return order
+
+    def wait_silence(self):
+        wait_time_ns = self.last_frame_end - time.perf_counter_ns()
+        if wait_time_ns > 0:
+            time.sleep(wait_time_ns / 1e9)
+
+    def send(self, packet: bytes, character_time_ns: int) -> int:
+        """Send a frame and return when it ends on the line."""
+        # Late responses of previous requests must not be taken as the response:
+        if self.serial.in_waiting:
+            self.serial.read(self.serial.in_waiting)
+        send_start = time.perf_counter_ns()
+        self.serial.write(packet)
+        self.serial.flush()
+        return max(time.perf_counter_ns(), send_start + len(packet) * character_time_ns)
+
+    def receive(self, deadline: int, cancelled: threading.Event) -> tuple:
+        """Receive a response frame until the deadline, in monotonic nanoseconds, or until the request is cancelled.
+        Returns the frame and its PDU."""
+        buffer = b''
+        while True:
+            remaining_time = (deadline - time.perf_counter_ns()) / 1e9
+            if remaining_time <= 0 or cancelled.is_set():
+                return buffer, None
+            # Reads return as soon as data arrives, the interval only bounds the wait of cancelled requests:
+            self.serial.timeout = min(remaining_time, CANCEL_CHECK_INTERVAL)
+            buffer += self.serial.read(max(self.serial.in_waiting, 1))
+            if buffer:
+                used_length, pdu = self.framer.processIncomingFrame(buffer)
+                if used_length and pdu:
+                    return buffer[:used_length], pdu
+                buffer = buffer[used_length:]  # Discard the invalid frames
+
+    def execute(self, connection, pdu) -> tuple:
+        """Execute a request, retried when it times out. Returns the response PDU and the sent and received frames.
+
+        Broadcasts are not answered, so the request PDU is returned as the response after the turnaround delay.
+        """
+        with self.lock:
+            if self.serial is None:
+                raise ConnectionException(f"Serial port {self.port} is not open")
+            self.apply_settings(connection)
+            character_time_ns = round(connection.character_time * 1e9)
+            packet_send = self.framer.buildFrame(pdu)
+
+            for _ in range(connection.retries + 1):
+                if connection.cancelled.is_set():
+                    raise ModbusIOException("Request cancelled")
+                self.wait_silence()
+                send_start = time.perf_counter_ns()
+                send_end = self.send(packet_send, character_time_ns)
+                if pdu.dev_id == BROADCAST_SLAVE:
+                    self.last_frame_end = send_end + round(connection.broadcast_delay * 1e9)
+                    self.add_busy_time(len(packet_send) * character_time_ns)
+                    return pdu, packet_send, b''
+                statistics = self.get_slave(pdu.dev_id)
+
+                packet_recv, modbus_response = self.receive(send_end + round(connection.timeout * 1e9),
+                                                            connection.cancelled)
+                receive_end = time.perf_counter_ns()
+                self.last_frame_end = receive_end + connection.silence_ns
+                self.add_busy_time((len(packet_send) + len(packet_recv)) * character_time_ns)
+                if modbus_response is not None:
+                    # The time of the response frame is estimated from the baud rate: when the estimate exceeds the
+                    # measured interval, the turnaround is unknown instead of zero:
+                    turnaround_ns = receive_end - send_end - len(packet_recv) * character_time_ns
+                    self.record_transaction(pdu.dev_id, statistics, receive_end - send_start, turnaround_ns)
+                    return modbus_response, packet_send, packet_recv
+                if connection.cancelled.is_set():
+                    raise ModbusIOException("Request cancelled")
+
+                statistics.timed_out = True
+                statistics.timeouts += 1
+                METRICS.increment("commsman_serial_timeouts_total", port=self.port, slave=pdu.dev_id)
+
+            raise ModbusIOException(f"No response received from slave {pdu.dev_id} in {connection.timeout} seconds")
+
+    def record_transaction(self, slave: int, statistics: SlaveStatistics, transaction_time_ns: int, turnaround_ns: int):
+        """Update the statistics of the slave with an answered transaction. Negative turnarounds are not recorded."""
+        statistics.responses += 1
+        if turnaround_ns >= 0:
+            statistics.turnaround.record(turnaround_ns)
+            METRICS.observe("commsman_serial_turnaround_seconds", turnaround_ns, port=self.port, slave=slave)
+        statistics.timed_out = False
+        if statistics.expected_time_ns:
+            statistics.expected_time_ns += round(EXPECTED_TIME_WEIGHT * (transaction_time_ns - statistics.expected_time_ns))
+        else:
+            statistics.expected_time_ns = transaction_time_ns
+
+    def add_busy_time(self, busy_time_ns: int):
+        self.busy_time_ns += busy_time_ns
+        self.window_busy_time_ns += busy_time_ns
+        METRICS.increment("commsman_serial_bus_busy_seconds_total", busy_time_ns / 1e9, port=self.port)
+
+        window_time_ns = time.perf_counter_ns() - self.window_start
+        if window_time_ns >= UTILIZATION_WINDOW * 1e9:
+            self.utilization = min(self.window_busy_time_ns / window_time_ns, 1.0)
+            self.window_start += window_time_ns
+            self.window_busy_time_ns = 0
+            METRICS.set("commsman_serial_bus_utilization", self.utilization, port=self.port)
+
+    def get_status(self) -> dict:
+        """Utilization of the bus and turnaround of every slave, in milliseconds."""
+        with self.lock:
+            slaves = {}
+            for slave, statistics in sorted(self.slaves.items()):
+                turnaround = statistics.turnaround
+                slaves[slave] = {
+                    "requests": statistics.responses,
+                    "timeouts": statistics.timeouts,
+                    "turnaround_p50_ms": turnaround.get_percentile(50) / 1e6 if turnaround.count else None,
+                    "turnaround_p99_ms": turnaround.get_percentile(99) / 1e6 if turnaround.count else None,
+                }
+            return {
+                "open": self.serial is not None,
+                "connections": len(self.connections),
+                "utilization": self.utilization,
+                "busy_time": self.busy_time_ns / 1e9,
+                "slaves": slaves,
+            }
+
+
+class SerialBusConnection:
+    """Client of a serial bus, with its serial settings and request timing.
+
+    It has the connection methods of the pymodbus clients, so the handlers use it as their client.
+    """
+
+    def __init__(self, bus: SerialBus, baudrate: int, parity: str, stopbits: float, bytesize: int, timeout: float,
+                 retries: int, broadcast_delay: float):
+        self.bus = bus
+        self.baudrate = baudrate
+        self.parity = parity
+        self.stopbits = stopbits
+        self.bytesize = bytesize
+        self.timeout = timeout
+        self.retries = retries
+        self.broadcast_delay = broadcast_delay  # Seconds the slaves need to process a broadcast
+        self.character_time = get_character_time(baudrate, bytesize, parity, stopbits)
+        self.silence_ns = round(get_inter_frame_silence(baudrate, self.character_time) * 1e9)
+        self.cancelled = threading.Event()  # Set to abort the requests of the client, e.g. when its runner stops
+
+    def get_serial_settings(self) -> dict:
+        return {"baudrate": self.baudrate, "parity": self.parity, "stopbits": self.stopbits,
+                "bytesize": self.bytesize}
+
+    def connect(self) -> bool:
+        return self.bus.open(self)
+
+    def close(self):
+        self.bus.close(self)
+
+    def is_socket_open(self) -> bool:
+        return self.bus.is_open(self)
+
+    def execute(self, pdu) -> tuple:
+        return self.bus.execute(self, pdu)
+
+
+class SerialBusManager:
+    """Serial buses of the process, by port."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buses = {}  # Key: port, Value: bus
+
+    def get_bus(self, port: str) -> SerialBus:
+        with self.lock:
+            if port not in self.buses:
+                self.buses[port] = SerialBus(port)
+            return self.buses[port]
+
+    def get_status(self) -> dict:
+        """Status of the buses used by the process, by port."""
+        with self.lock:
+            buses = list(self.buses.values())
+        return {bus.port: bus.get_status() for bus in buses}
+
+
+SERIAL_BUSES = SerialBusManager()
+METRICS.describe("commsman_serial_bus_busy_seconds_total", "counter", "Time a serial bus carried frames, by port.")
+METRICS.describe("commsman_serial_bus_utilization", "gauge", f"Fraction of the last {UTILIZATION_WINDOW} seconds a serial bus carried frames, by port.")
+METRICS.describe("commsman_serial_turnaround_seconds", "summary", "Time from the end of a request to the start of the response, by serial port and slave.")
+METRICS.describe("commsman_serial_timeouts_total", "counter", "Serial requests without response, by port and slave.")
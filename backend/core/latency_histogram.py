@@ -0,0 +1,121 @@
+class LatencyHistogram:
+    """Streaming histogram of latencies in nanoseconds, with log-linear buckets like an HDR histogram.
+
+    Values are grouped by their most significant bits, so every bucket has the same relative width (below 1% with the
+    default precision) whatever the magnitude, and memory only grows with the number of distinct magnitudes.
+    """
+
+    def __init__(self, precision_bits: int = 8):
+        self.precision_bits = precision_bits
+        self.buckets = {}  # Key: bucket index, Value: count
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def get_bucket_index(self, value: int) -> int:
+        shift = max(value.bit_length() - self.precision_bits, 0)
+        return (shift << self.precision_bits) + (value >> shift)
+
+    def get_bucket_value(self, index: int) -> int:
+        """Return the middle value of a bucket."""
+        shift = index >> self.precision_bits
+        mantissa = index & ((1 << self.precision_bits) - 1)
+        return (mantissa << shift) + ((1 << shift) >> 1)
+
+    def record(self, value: int):
+        value = max(int(value), 0)
+        index = self.get_bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def subtract(self, other: "LatencyHistogram"):
+        """Remove the values of an earlier snapshot of this histogram, e.g. to keep the values of a time window.
+
+        The exact extremes of the remaining values are unknown, so they are bounded by their buckets.
+        """
+        for index, count in other.buckets.items():
+            remaining = self.buckets.get(index, 0) - count
+            if remaining > 0:
+                self.buckets[index] = remaining
+            else:
+                self.buckets.pop(index, None)
+        self.count = max(self.count - other.count, 0)
+        self.total = max(self.total - other.total, 0)
+        if not self.buckets:
+            self.min = self.max = None
+            return
+        lowest, highest = min(self.buckets), max(self.buckets)
+        self.min = max(self.min, (lowest & ((1 << self.precision_bits) - 1)) << (lowest >> self.precision_bits))
+        self.max = min(self.max, (((highest & ((1 << self.precision_bits) - 1)) + 1)
+                                  << (highest >> self.precision_bits)) - 1)
+
+    def get_percentile(self, percentile: float) -> int | None:
+        if not self.count:
+            return None
+
+        rank = max(1, round(percentile / 100 * self.count))
+        accumulated = 0
+        for index in sorted(self.buckets):
+            accumulated += self.buckets[index]
+            if accumulated >= rank:
+                # Bucket values are approximations, so they are bounded by the exact extremes:
+                return min(max(self.get_bucket_value(index), self.min), self.max)
+        return self.max
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        """Rebuild a histogram from 'to_dict', e.g. to merge the histograms returned by the API."""
+        histogram = cls()
+        histogram.buckets = {int(index): count for index, count in data["buckets"].items()}
+        histogram.count = data["count"]
+        histogram.total = round(data["mean"] * data["count"]) if data["count"] else 0
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.get_percentile(50),
+            "p95": self.get_percentile(95),
+            "p99": self.get_percentile(99),
+            "buckets": {str(index): count for index, count in sorted(self.buckets.items())},
+        }
+
+
+class LatencyHistograms:
+    """Latency histograms of an execution session, by scope: the session itself, each request and each connection."""
+
+    def __init__(self):
+        self.session = LatencyHistogram()
+        self.requests = {}  # Key: request ID, Value: histogram
+        self.connections = {}  # Key: connection name, Value: histogram
+
+    def record(self, value: int, request_id: int, connection: str = None):
+        self.session.record(value)
+        self.requests.setdefault(request_id, LatencyHistogram()).record(value)
+        if connection:
+            self.connections.setdefault(connection, LatencyHistogram()).record(value)
+
+    def to_dict(self) -> dict:
+        return {
+            "session": self.session.to_dict(),
+            "requests": {str(request_id): histogram.to_dict() for request_id, histogram in self.requests.items()},
+            "connections": {connection: histogram.to_dict() for connection, histogram in self.connections.items()},
+        }
@@ -0,0 +1,110 @@
+import threading
+
+from backend.core.latency_histogram import LatencyHistogram
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and latency summaries, rendered in the Prometheus text exposition format.
+
+    Updating a metric is a dictionary update under a lock, so it can be done from the runner and the API threads on
+    every request. Latencies are recorded in nanoseconds and exposed in seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.descriptions = {}  # Key: metric name, Value: (type, help)
+        self.values = {}  # Key: metric name, Value: {labels: value}
+
+    def describe(self, name: str, metric_type: str, description: str):
+        self.descriptions[name] = (metric_type, description)
+
+    @staticmethod
+    def get_labels_key(labels: dict) -> tuple:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = self.get_labels_key(labels)
+        with self.lock:
+            metric = self.values.setdefault(name, {})
+            metric[key] = metric.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = self.get_labels_key(labels)
+        with self.lock:
+            self.values.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value_ns: int, **labels):
+        key = self.get_labels_key(labels)
+        with self.lock:
+            metric = self.values.setdefault(name, {})
+            if key not in metric:
+                metric[key] = LatencyHistogram()
+            metric[key].record(value_ns)
+
+    def remove(self, name: str, **labels):
+        with self.lock:
+            self.values.get(name, {}).pop(self.get_labels_key(labels), None)
+
+    @staticmethod
+    def get_summary_statistics(histogram: LatencyHistogram) -> tuple:
+        """Statistics of a summary as rendered: p50, p95, p99, sum and count."""
+        return (histogram.get_percentile(50), histogram.get_percentile(95), histogram.get_percentile(99),
+                histogram.total, histogram.count)
+
+    def snapshot(self) -> dict:
+        """Copy of all the metrics, with the statistics of the summaries, also to be rendered by another process:
+        {name: {labels key: value}}."""
+        with self.lock:
+            values = {}
+            for name, metric in self.values.items():
+                if self.descriptions.get(name, (None,))[0] == "summary":
+                    # Only the exposed statistics are copied, the histograms keep recording:
+                    values[name] = {labels: self.get_summary_statistics(histogram)
+                                    for labels, histogram in metric.items()}
+                else:
+                    values[name] = dict(metric)
+            return values
+
+    @staticmethod
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def format_labels(self, labels: tuple, **extra_labels) -> str:
+        labels = labels + tuple(extra_labels.items())
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{self.escape(value)}"' for key, value in labels) + "}"
+
+    def render(self, extra_metrics: dict = None) -> str:
+        """Render all metrics. Extra metrics are computed at scrape time and merged: {name: {labels key: value}}."""
+        values = self.snapshot()
+        for name, metric in (extra_metrics or {}).items():
+            values.setdefault(name, {}).update(metric)
+
+        lines = []
+        for name in sorted(values):
+            metric_type, description = self.descriptions.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in values[name].items():
+                if metric_type == "summary":
+                    *percentiles, total, count = value
+                    for quantile, percentile in zip(("0.5", "0.95", "0.99"), percentiles):
+                        lines.append(f"{name}{self.format_labels(labels, quantile=quantile)} {percentile / 1e9}")
+                    lines.append(f"{name}_sum{self.format_labels(labels)} {total / 1e9}")
+                    lines.append(f"{name}_count{self.format_labels(labels)} {count}")
+                else:
+                    lines.append(f"{name}{self.format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+METRICS.describe("commsman_runners", "gauge", "Number of running items.")
+METRICS.describe("commsman_runner_poll_rate", "gauge", "Requests executed per second in the current execution session.")
+METRICS.describe("commsman_requests_total", "counter", "Requests executed, by running item and result.")
+METRICS.describe("commsman_db_write_seconds", "summary", "Latency of the database commits.")
+METRICS.describe("commsman_results_not_stored_total", "counter", "Request results not stored by the persistence policy of the request.")
+METRICS.describe("commsman_db_write_queue_depth", "gauge", "Items queued to be written in the last runner cycle.")
+METRICS.describe("commsman_connection_reconnects_total", "counter", "Reconnections of a client connection after the first one.")
+METRICS.describe("commsman_http_request_seconds", "summary", "Latency of the API handlers, by route.")
+METRICS.describe("commsman_database_size_bytes", "gauge", "Size of the SQLite database file, including its write-ahead log.")
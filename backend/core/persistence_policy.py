@@ -0,0 +1,75 @@
+import math
+import time
+
+from backend.core.handlers.custom_modbus_handler import CustomModbusHandler
+from backend.core.result_records import ResultRecord
+from backend.models import BaseRequest
+
+
+PERSISTENCE_MODES = ("Every poll", "On change")
+PERSISTENCE_OPTIONS = ("persistence", "deadband_absolute", "deadband_percent", "heartbeat_interval")
+
+
+class PersistencePolicy:
+    """Report by exception: decides which results of the requests of a runner are stored.
+
+    Requests whose run options persist 'On change' only store a result when it fails, when the last stored one failed,
+    when a decoded value moves beyond the deadband from the last stored value, or when the heartbeat interval has passed
+    since the last stored result. The rest of the results still count in the live totals. Requests with 'Every poll'
+    store all their results.
+
+    The persistence options overridden by a run apply to all its requests, over the run options of each request.
+    """
+
+    def __init__(self, overrides: dict = None):
+        self.overrides = {key: value for key, value in (overrides or {}).items() if key in PERSISTENCE_OPTIONS}
+        self.last_stored = {}  # Key: request ID, Value: (result, values, monotonic time) of the last stored result
+
+    def get_option(self, item: BaseRequest, key: str):
+        if key in self.overrides:
+            return self.overrides[key]
+        return getattr(item.run_options, key) if item.run_options is not None else None
+
+    @staticmethod
+    def get_values(result: ResultRecord) -> dict:
+        """Values of a result to compare: decoded values by address or, when they are not numeric, the raw registers."""
+        if result.item_handler == "ModbusResponse":
+            registers = result.registers or []
+            values = CustomModbusHandler.convert_value_after_receiving(result.data_type, result.address or 0, registers)
+            return values or {"registers": tuple(registers)}
+        return {}
+
+    @staticmethod
+    def is_outside_deadband(value, last_value, deadband_absolute: float, deadband_percent: float) -> bool:
+        if not isinstance(value, (int, float)) or not isinstance(last_value, (int, float)):
+            return value != last_value
+        if math.isnan(value) or math.isnan(last_value):
+            return math.isnan(value) != math.isnan(last_value)
+        deadband = max(deadband_absolute or 0, abs(last_value) * (deadband_percent or 0) / 100)
+        return abs(value - last_value) > deadband
+
+    def is_changed(self, values: dict, last_values: dict, deadband_absolute: float, deadband_percent: float) -> bool:
+        if values.keys() != last_values.keys():
+            return True
+        return any(self.is_outside_deadband(value, last_values[key], deadband_absolute, deadband_percent)
+                   for key, value in values.items())
+
+    def should_store(self, item: BaseRequest, result: ResultRecord) -> bool:
+        """Whether the result of the request is stored. Stored results are the reference of the next ones."""
+        if self.get_option(item, "persistence") != "On change":
+            return True
+
+        now = time.monotonic()
+        values = self.get_values(result) if result.result == "OK" else {}
+        last_stored = self.last_stored.get(item.item_id)
+        if last_stored is not None and result.result == "OK":
+            last_result, last_values, last_time = last_stored
+            heartbeat_interval = self.get_option(item, "heartbeat_interval") or 0
+            if (last_result == "OK"
+                    and not (heartbeat_interval and now - last_time >= heartbeat_interval)
+                    and not self.is_changed(values, last_values, self.get_option(item, "deadband_absolute"),
+                                            self.get_option(item, "deadband_percent"))):
+                return False
+
+        self.last_stored[item.item_id] = (result.result, values, now)
+        return True
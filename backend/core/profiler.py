@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+from backend.core.latency_histogram import LatencyHistogram
+
+
+MAX_SAMPLING_SECONDS = 60
+_DISABLED = nullcontext()
+
+
+class PhaseTimer:
+    __slots__ = ("profiler", "item_id", "phase", "start_time")
+
+    def __init__(self, profiler: "Profiler", item_id: int, phase: str):
+        self.profiler = profiler
+        self.item_id = item_id
+        self.phase = phase
+
+    def __enter__(self):
+        self.start_time = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.phase, time.perf_counter_ns() - self.start_time, item_id=self.item_id)
+
+
+class Profiler:
+    """Optional timings of the phases of the runner cycles, by running item.
+
+    Every runner thread sets the item it runs, so the handlers can measure their phases without knowing it. When the
+    profiler is disabled, measuring a phase only costs an attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.timings = {}  # Key: item ID, Value: {phase: histogram}
+        self.local = threading.local()
+
+    def set_item(self, item_id: int):
+        """Set the item whose phases are measured in the current thread."""
+        self.local.item_id = item_id
+
+    def measure(self, phase: str):
+        if not self.enabled:
+            return _DISABLED
+        return PhaseTimer(self, getattr(self.local, "item_id", None), phase)
+
+    def record(self, phase: str, value_ns: int, item_id: int = None):
+        if not self.enabled:
+            return
+        item_id = item_id if item_id is not None else getattr(self.local, "item_id", None)
+        with self.lock:
+            phases = self.timings.setdefault(item_id, {})
+            if phase not in phases:
+                phases[phase] = LatencyHistogram()
+            phases[phase].record(value_ns)
+
+    def reset(self):
+        with self.lock:
+            self.timings = {}
+
+    def to_dict(self) -> dict:
+        """Phase breakdown by item ID. Times are in nanoseconds."""
+        with self.lock:
+            items = {}
+            for item_id, phases in self.timings.items():
+                items[str(item_id)] = {}
+                for phase, histogram in phases.items():
+                    statistics = histogram.to_dict()
+                    statistics.pop("buckets")
+                    statistics["total"] = histogram.total
+                    items[str(item_id)][phase] = statistics
+        return {"enabled": self.enabled, "items": items}
+
+
+def get_frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def capture_sampling_profile(seconds: float, interval: float = 0.005, top: int = 50) -> dict:
+    """Sample the stacks of all the other threads of the process during the given seconds.
+
+    Returns the functions with the most samples, on top of the stack (self) and anywhere in it (total), and the
+    collapsed stacks ('thread;outer;...;inner': samples), which can be rendered as a flame graph.
+    """
+    if not 0 < seconds <= MAX_SAMPLING_SECONDS:
+        raise ValueError(f"Sampling seconds must be between 0 and {MAX_SAMPLING_SECONDS}")
+    if interval <= 0:
+        raise ValueError("Sampling interval must be positive")
+
+    current_thread_id = threading.get_ident()
+    self_samples = Counter()
+    total_samples = Counter()
+    stacks = Counter()
+    samples = 0
+
+    end_time = time.perf_counter() + seconds
+    while time.perf_counter() < end_time:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == current_thread_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(get_frame_name(frame))
+                frame = frame.f_back
+            self_samples[stack[0]] += 1
+            total_samples.update(set(stack))
+            stacks[";".join([thread_names.get(thread_id, str(thread_id))] + stack[::-1])] += 1
+        samples += 1
+        time.sleep(interval)
+
+    return {
+        "seconds": seconds,
+        "interval": interval,
+        "samples": samples,
+        "top": [{"function": function, "self": count, "total": total_samples[function]}
+                for function, count in self_samples.most_common(top)],
+        "stacks": dict(stacks.most_common()),
+    }
+
+
+PROFILER = Profiler()
@@ -0,0 +1,194 @@
+from datetime import datetime
+
+import tzlocal
+
+
+LOCAL_TIMEZONE = tzlocal.get_localzone()
+
+
+def now() -> datetime:
+    """Current time in the local timezone, looked up once."""
+    return datetime.now(LOCAL_TIMEZONE)
+
+
+class Record:
+    """Row of a table built by the runner, with the attributes of its model but without the instrumentation of the
+    models, which is paid on every attribute set.
+
+    Records are converted to column values only when they are stored, all the records of a runner cycle at once, see
+    'SQLiteRepository.save_records'. The handler is the class name of the model, as 'item_handler' of the models.
+    """
+    __slots__ = ()
+
+    table_name = None
+    item_handler = None
+    columns = ()  # Columns of the table: attributes of the record or of its class
+
+    def to_values(self) -> dict:
+        return {column: getattr(self, column) for column in self.columns}
+
+    def get_references(self) -> tuple:
+        """Records whose item ID is a column of this record, so they are stored first."""
+        return ()
+
+
+class ItemRecord(Record):
+    """Record of the tables of the models derived from 'BaseItem'."""
+    __slots__ = ("item_id", "name", "created_at", "updated_at", "parent", "children")
+
+    modified_by = "Ordillan"  # As set by 'BaseItem'
+    columns = ("item_id", "name", "item_handler", "created_at", "updated_at", "modified_by")
+
+    def __init__(self, name: str, timestamp: datetime):
+        self.item_id = None
+        self.name = name
+        self.created_at = timestamp
+        self.updated_at = timestamp
+        self.parent = None
+        self.children = []
+
+    def to_values(self) -> dict:
+        self.updated_at = now()
+        return super().to_values()
+
+
+class ExecutionSessionRecord(ItemRecord):
+    __slots__ = ("request_id", "elapsed_time", "timestamp", "result", "iterations", "total_ok", "total_failed")
+
+    table_name = "execution_session"
+    item_handler = "ExecutionSession"
+    item_type = "ExecutionSession"
+    columns = ItemRecord.columns + ("request_id", "item_type", "elapsed_time", "timestamp", "result")
+
+    def __init__(self, name: str, request_id: int, timestamp: datetime):
+        super().__init__(name=name, timestamp=timestamp)
+        self.request_id = request_id
+        self.elapsed_time = 0
+        self.timestamp = timestamp
+        self.result = "Running"
+        # Counters of the runner, not stored:
+        self.iterations = 0
+        self.total_ok = 0
+        self.total_failed = 0
+
+
+class ResultRecord(ItemRecord):
+    """Record of the tables of the models derived from 'BaseResult'."""
+    __slots__ = ("execution_session_id", "parent_id", "request_id", "client_type", "result", "elapsed_time",
+                 "timestamp", "error_message")
+
+    columns = ItemRecord.columns + ("execution_session_id", "parent_id", "request_id", "client_type", "result",
+                                    "elapsed_time", "timestamp", "error_message", "item_type")
+
+    def __init__(self, name: str, client_type: str, request_id: int, execution_session_id: int, parent_id: int,
+                 result: str, timestamp: datetime = None, elapsed_time: float = 0, error_message: str = ""):
+        timestamp = timestamp or now()
+        super().__init__(name=name, timestamp=timestamp)
+        self.execution_session_id = execution_session_id
+        self.parent_id = parent_id
+        self.request_id = request_id
+        self.client_type = client_type
+        self.result = result
+        self.elapsed_time = elapsed_time
+        self.timestamp = timestamp
+        self.error_message = error_message
+
+
+class ModbusResponseRecord(ResultRecord):
+    __slots__ = ("slave", "transaction_id", "protocol_id", "function_code", "address", "registers", "crc",
+                 "raw_packet_recv", "raw_packet_send", "data_type", "byte_count")
+
+    table_name = "modbus_response"
+    item_handler = "ModbusResponse"
+    item_type = "Modbus"
+    columns = ResultRecord.columns + ("slave", "transaction_id", "protocol_id", "function_code", "address",
+                                      "registers", "crc", "raw_packet_recv", "raw_packet_send", "data_type",
+                                      "byte_count")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slave = None
+        self.transaction_id = None
+        self.protocol_id = None
+        self.function_code = None
+        self.address = None
+        self.registers = None
+        self.crc = None
+        self.raw_packet_recv = ""
+        self.raw_packet_send = ""
+        self.data_type = "16-bit Integer"
+        self.byte_count = None
+
+
+class CollectionResultRecord(ResultRecord):
+    __slots__ = ("total_ok", "total_failed", "total_pending")
+
+    table_name = "collection_result"
+    item_handler = "CollectionResult"
+    item_type = "Collection"
+    columns = ResultRecord.columns + ("total_ok", "total_failed", "total_pending")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.total_ok = 0
+        self.total_failed = 0
+        self.total_pending = 0
+
+
+class LastResultRecord(Record):
+    """Last result snapshot of a request in an execution session, see 'LastResult'."""
+    __slots__ = ("request_id", "execution_session_id", "result_handler", "result_id", "iterations", "total_ok",
+                 "total_failed")
+
+    table_name = "last_result"
+    columns = __slots__
+
+    def __init__(self, request_id: int, execution_session_id: int):
+        self.request_id = request_id
+        self.execution_session_id = execution_session_id
+        self.result_handler = None
+        self.result_id = None
+        self.iterations = 0
+        self.total_ok = 0
+        self.total_failed = 0
+
+
+class AlarmEventRecord(Record):
+    """Alarm raised or cleared by a rule, see 'AlarmEvent'. The result that changed the alarm may not be stored yet:
+    its ID is taken when the event is stored."""
+    __slots__ = ("item_id", "execution_session_id", "rule_id", "rule_name", "request_id", "result", "timestamp",
+                 "state", "label", "value", "severity")
+
+    table_name = "alarm_event"
+    columns = ("item_id", "execution_session_id", "rule_id", "request_id", "result_id", "timestamp", "state", "label",
+               "value", "severity", "message")
+
+    def __init__(self, execution_session_id: int, rule_id: int, rule_name: str, request_id: int, result: ResultRecord,
+                 state: str, label: str, value: float, severity: str):
+        self.item_id = None
+        self.execution_session_id = execution_session_id
+        self.rule_id = rule_id
+        self.rule_name = rule_name
+        self.request_id = request_id
+        self.result = result
+        self.timestamp = result.timestamp
+        self.state = state
+        self.label = label
+        self.value = value
+        self.severity = severity
+
+    @staticmethod
+    def get_message(rule_name: str, label: str, value: float) -> str:
+        """Description of an alarm, also used in the error message of the results in alarm."""
+        return f"{rule_name}: {label} = {value:g}"
+
+    @property
+    def result_id(self) -> int:
+        return self.result.item_id
+
+    @property
+    def message(self) -> str:
+        return self.get_message(self.rule_name, self.label, self.value)
+
+    def get_references(self) -> tuple:
+        return (self.result,)
@@ -1,64 +1,221 @@
 import threading
 import time
-from dataclasses import asdict
-from datetime import datetime
+from typing import Callable
 
-import tzlocal
-from PyQt6.QtCore import QThread
+from sqlalchemy import inspect
+
+from backend.core.alarm_engine import AlarmEngine
 from backend.core.handlers.collection_handler import CollectionHandler
-from backend.models.execution_session import ExecutionSession
+from backend.core.latency_histogram import LatencyHistograms
+from backend.core.metrics import METRICS
+from backend.core.persistence_policy import PersistencePolicy, PERSISTENCE_MODES
+from backend.core.profiler import PROFILER
+from backend.core.result_records import ExecutionSessionRecord, LastResultRecord, now
 from backend.repository import *
 from backend.core.handlers.protocol_client_manager import ProtocolClientManager
 from backend.repository.sqlite_repository import SQLiteRepository
+from utils.logger import get_logger, open_session_log, close_session_log
+
+
+logger = get_logger(__name__)
+
+# Run options that a run can override, see 'Runner.override_run_options':
+RUN_OPTIONS_OVERRIDES = {
+    "polling_interval": float,
+    "delayed_start": float,
+    "continuous_monitoring": bool,
+    "persistence": str,
+    "deadband_absolute": float,
+    "deadband_percent": float,
+    "heartbeat_interval": float,
+}
+STATE_HEARTBEAT_INTERVAL = 5  # Seconds between writes of the state of a run whose results are not stored
 
 
 class Runner(threading.Thread):
-    """ Worker that runs the requests in a separate Python thread """
+    """ Worker that runs the requests in a separate Python thread
+
+    By default, the run options of the item decide whether it runs once or continuously. A number of iterations
+    overrides them, and the run options given override those of the item for this run only. The result callback is
+    called with every result once it is stored.
 
-    def __init__(self, repository: BaseRepository, item_id: int, *args, **kwargs):
+    Every run is an execution session, whose ID identifies the run: an item can run several times at once, e.g. with a
+    fast and a slow polling interval.
+
+    Results are plain records, see 'Record', which the repository converts to rows when they are stored. The state of
+    the run, i.e. the execution session, the collection results and the last result snapshots, is updated in memory on
+    every poll and written with the stored results, or when its heartbeat is due, see 'save_result'. Meanwhile, the live
+    state is served by 'get_live_state'.
+
+    Stopping is immediate: the waits of the runner wake up and the requests in progress are cancelled, then the runner
+    finishes its execution session. Requests failed by the cancellation are not recorded.
+    """
+
+    def __init__(self, repository: BaseRepository, item_id: int, iterations: int = None,
+                 result_callback: Callable = None, run_options: dict = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.repository = repository
-        self.update_items_queue = []
+        self.iterations = iterations
+        self.result_callback = result_callback
+        self.update_items_queue = {}  # Key: id of the record, Value: record updated and not written yet
         self.collection_handler = CollectionHandler(self.update_items_queue)
         self.protocol_client_manager = ProtocolClientManager(self.repository)
-        self.running = True  # Control flag for stopping
-        self.item = self.repository.get_item_request(item_id=item_id)
+        self.stop_event = threading.Event()
+        with self.repository.unit_of_work():
+            self.item = self.repository.get_item_request(item_id=item_id)
+        self.run_options_overrides = self.override_run_options(run_options or {})
         self.execution_session = None
+        self.last_results = {}  # Key: request ID, Value: last result snapshot of the current execution session
+        self.updated_last_results = {}  # Key: request ID, Value: last result snapshot not written yet
+        self.state_written_at = 0  # Monotonic time of the last write of the state of the run
+        self.request_fields = {}  # Key: request ID, Value: column values of the request, passed to its handler
+        self.latency_histograms = LatencyHistograms()
+        self.persistence_policy = PersistencePolicy(self.run_options_overrides)
+        self.alarm_engine = AlarmEngine()
+        self.alarm_events = []  # Alarm events of the result being saved
+
+    @property
+    def running(self) -> bool:
+        return not self.stop_event.is_set()
+
+    @property
+    def run_id(self) -> int | None:
+        return self.execution_session.item_id if self.execution_session else None
+
+    def override_run_options(self, run_options: dict) -> dict:
+        """Override the run options of the item, which is detached from the database, so they are not saved."""
+        unknown = set(run_options) - set(RUN_OPTIONS_OVERRIDES)
+        if unknown:
+            raise ValueError(f"Unknown run options: {', '.join(sorted(unknown))}")
+        if self.item.run_options is None:
+            raise ValueError(f"Item '{self.item.name}' has no run options.")
+        overrides = {}
+        for key, value in run_options.items():
+            try:
+                overrides[key] = RUN_OPTIONS_OVERRIDES[key](value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid value of run option '{key}': {value}")
+        if overrides.get("persistence", PERSISTENCE_MODES[0]) not in PERSISTENCE_MODES:
+            raise ValueError(f"Invalid persistence mode: {overrides['persistence']}")
+        for key, value in overrides.items():
+            setattr(self.item.run_options, key, value)
+        return overrides
+
+    def get_run(self) -> dict:
+        """Run ID, item, state and run options overridden of the run."""
+        return {"run_id": self.run_id,
+                "item_id": self.item.item_id,
+                "name": self.item.name,
+                "state": "stopping" if self.stopping else "running",
+                "run_options": self.run_options_overrides,
+                "poll_rate": self.get_poll_rate()}
 
     def create_execution_session(self):
-        self.execution_session = ExecutionSession(
+        self.execution_session = ExecutionSessionRecord(
             name=self.item.name,
             request_id=self.item.item_id,
-            timestamp=datetime.now(tzlocal.get_localzone())
+            timestamp=now()
         )
-        self.repository.add_item_from_dataclass(item=self.execution_session)
+        self.repository.save_records([self.execution_session])
+
+        open_session_log(self.execution_session.item_id)
+        logger.info("Execution session of '%s' started", self.item.name, extra=self.get_log_fields())
+
+    def get_log_fields(self) -> dict:
+        return {"execution_session_id": self.execution_session.item_id, "item_id": self.item.item_id}
 
     def finish_execution_session(self):
         if self.execution_session.total_failed > 0:
             self.execution_session.result = "Failed"
         else:
             self.execution_session.result = "OK"
-        self.repository.add_item_from_dataclass(item=self.execution_session)
+        with self.repository.unit_of_work():
+            self.update_items_queue[id(self.execution_session)] = self.execution_session
+            self.write_state()
+            self.write_last_results()
+            # The snapshots of the previous sessions are no longer the last ones:
+            self.repository.delete_finished_last_results(list(self.last_results))
+            self.repository.add_latency_histograms(execution_session_id=self.execution_session.item_id,
+                                                   histograms=self.latency_histograms.to_dict())
 
-    def run_requests(self, item, parent_result_item=None, main_result=None):
-        """ Recursively processes requests """
-        # Stop signal:
-        if not self.running:
-            return
+        logger.info("Execution session of '%s' finished: %s", self.item.name, self.execution_session.result,
+                    extra={**self.get_log_fields(),
+                           "iterations": self.execution_session.iterations,
+                           "total_ok": self.execution_session.total_ok,
+                           "total_failed": self.execution_session.total_failed})
+        close_session_log(self.execution_session.item_id)
+
+    def get_poll_rate(self) -> float:
+        """Requests executed per second in the current execution session."""
+        if self.execution_session is None or not float(self.execution_session.elapsed_time):
+            return 0.0
+        requests = self.execution_session.total_ok + self.execution_session.total_failed
+        return requests / float(self.execution_session.elapsed_time)
 
+    def get_live_state(self) -> dict:
+        """Counters of the run, which may not be written yet: those of the execution session, as in the last result
+        snapshot of the item, and those of the collection results updated, by result ID."""
+        last_result = self.last_results.get(self.item.item_id)
+        return {
+            "elapsed_time": self.execution_session.elapsed_time,
+            "iterations": last_result.iterations if last_result else 0,
+            "total_ok": last_result.total_ok if last_result else 0,
+            "total_failed": last_result.total_failed if last_result else 0,
+            "collection_results": {record.item_id: {"result": record.result,
+                                                    "elapsed_time": record.elapsed_time,
+                                                    "total_ok": record.total_ok,
+                                                    "total_failed": record.total_failed,
+                                                    "total_pending": record.total_pending}
+                                   for record in list(self.update_items_queue.values())
+                                   if record.item_handler == "CollectionResult" and record.item_id is not None},
+        }
+
+    def update_last_results(self, item, result, parent_result_item=None):
+        """Update the last result snapshots of the item and, for requests, the totals of its parent collections."""
+        last_result = self.last_results.get(item.item_id)
+        if last_result is None:
+            last_result = LastResultRecord(request_id=item.item_id, execution_session_id=self.execution_session.item_id)
+            self.last_results[item.item_id] = last_result
+        # Results that are not stored keep the last stored one:
+        if result.item_id is not None:
+            last_result.result_handler = result.item_handler
+            last_result.result_id = result.item_id
+        last_result.iterations += 1
+
+        last_results = [last_result]
+        if item.item_handler != "Collection":
+            collection_result = parent_result_item
+            while collection_result:
+                last_results.append(self.last_results[collection_result.request_id])
+                collection_result = collection_result.parent
+
+            for last_result in last_results:
+                if result.result == "OK":
+                    last_result.total_ok += 1
+                else:
+                    last_result.total_failed += 1
+
+        for last_result in last_results:
+            self.updated_last_results[last_result.request_id] = last_result
+
+    def execute_item(self, item, parent_result_item=None, protocol_client=None):
+        """ Executes a request or opens the result of a collection """
         if item.item_handler == "Collection":
-            result = self.collection_handler.get_collection_result(
-                item=item,
-                parent_id=getattr(parent_result_item, "item_id", None),
-                execution_session_id=self.execution_session.item_id
-            )
-
-            # Update collections tree:
-            if parent_result_item:
-                self.collection_handler.add_collection(parent_result_item, result)
+            with PROFILER.measure("collection_aggregation"):
+                result = self.collection_handler.get_collection_result(
+                    item=item,
+                    parent_id=getattr(parent_result_item, "item_id", None),
+                    execution_session_id=self.execution_session.item_id
+                )
+
+                # Update collections tree:
+                if parent_result_item:
+                    self.collection_handler.add_collection(parent_result_item, result)
         else:
             # Get client:
-            protocol_client = self.protocol_client_manager.get_client_handler(item=item)
+            if protocol_client is None:
+                with PROFILER.measure("client_resolution"):
+                    protocol_client = self.protocol_client_manager.get_client_handler(item=item)
 
             # Error
             if isinstance(protocol_client, str):
@@ -70,63 +227,238 @@ class Runner(threading.Thread):
                 )
             # Do request:
             else:
-                protocol_client.connect()
+                with PROFILER.measure("connect"):
+                    protocol_client.connect()
                 result = protocol_client.execute_request(
-                    **asdict(item),
+                    **self.get_request_fields(item),
                     parent_result_id=getattr(parent_result_item, "item_id", None),
                     execution_session_id = self.execution_session.item_id,
                 )
+                if self.is_cancelled(result):
+                    return None
 
-            # Update session:
-            if result.result == "OK":
-                self.execution_session.total_ok += 1
-            else:
-                self.execution_session.total_failed += 1
+            self.record_request_result(item, result, protocol_client, parent_result_item)
 
-            # Update collections tree:
-            if parent_result_item:
-                self.collection_handler.add_request(parent_result_item, result)
+        return result
 
-            # Wait polling interval:
-            if self.item.run_options.polling_interval < 0.1:
-                time.sleep(0.1)
-            else:
-                time.sleep(self.item.run_options.polling_interval)
+    def get_request_fields(self, item) -> dict:
+        """Column values of a request, read once per run instead of copying the whole item on every poll."""
+        request_fields = self.request_fields.get(item.item_id)
+        if request_fields is None:
+            request_fields = {attribute.key: getattr(item, attribute.key) for attribute in inspect(item).mapper.column_attrs}
+            self.request_fields[item.item_id] = request_fields
+        return request_fields
+
+    def is_cancelled(self, result) -> bool:
+        """Whether the request failed because the runner is stopping."""
+        return not self.running and result.result != "OK"
+
+    def record_request_result(self, item, result, protocol_client, parent_result_item=None):
+        """Update the latency histograms, the session totals and the parent collection results with a request result."""
+        # Only answered requests are measured, so timeouts and refused connections do not hide the latency:
+        if result.result == "OK":
+            self.latency_histograms.record(value=round(result.elapsed_time * 1e9),
+                                           request_id=item.item_id,
+                                           connection=protocol_client.connection_name)
 
-        # Update view:
-        if not main_result:
-            main_result = result
+        # Alarms mark the result before it counts in the totals:
+        if item.item_id in self.alarm_engine.requests:
+            with PROFILER.measure("alarm_evaluation"):
+                self.alarm_events = self.alarm_engine.evaluate(item, result)
 
         # Update session:
-        self.execution_session.elapsed_time = (datetime.now(tzlocal.get_localzone()) - self.execution_session.timestamp).total_seconds()
+        if result.result == "OK":
+            self.execution_session.total_ok += 1
+        else:
+            self.execution_session.total_failed += 1
+        METRICS.increment("commsman_requests_total", item_id=self.item.item_id, result=result.result)
+        if result.result == "OK":
+            logger.debug("Request '%s' OK", item.name, extra={**self.get_log_fields(), "request_id": item.item_id})
+        else:
+            logger.warning("Request '%s' failed: %s", item.name, result.error_message,
+                           extra={**self.get_log_fields(), "request_id": item.item_id})
+
+        # Update collections tree:
+        if parent_result_item:
+            with PROFILER.measure("collection_aggregation"):
+                self.collection_handler.add_request(parent_result_item, result)
+
+    def save_result(self, item, result, parent_result_item=None):
+        """Save the result, if the persistence policy stores it, and the state of the run, in the unit of work of the
+        caller. The state is only written with a stored result or when its heartbeat is due, so the polls whose results
+        are not stored do not write."""
+        # Update session:
+        self.execution_session.elapsed_time = (now() - self.execution_session.timestamp).total_seconds()
+
+        # Results that raise or clear alarms are always stored, as the events refer to them:
+        store = (item.item_handler == "Collection" or self.persistence_policy.should_store(item, result)
+                 or bool(self.alarm_events))
+        if store:
+            self.update_items_queue[id(result)] = result
+            for event in self.alarm_events:
+                self.update_items_queue[id(event)] = event
+            self.alarm_events = []
+        else:
+            METRICS.increment("commsman_results_not_stored_total", item_id=self.item.item_id)
+        write = store or time.monotonic() - self.state_written_at >= STATE_HEARTBEAT_INTERVAL
 
         # Save in database:
-        self.update_items_queue.append(self.execution_session)
-        self.update_items_queue.append(result)
-        while self.update_items_queue:
-            result = self.update_items_queue.pop(0)
-            self.repository.add_item_from_dataclass(item=result)
+        if write:
+            self.update_items_queue[id(self.execution_session)] = self.execution_session
+            self.write_state()
+
+        # Update last result snapshots, which refer to the stored results:
+        self.update_last_results(item, result, parent_result_item)
+        if write:
+            self.write_last_results()
+        METRICS.set("commsman_db_write_queue_depth", len(self.update_items_queue), item_id=self.item.item_id,
+                    run_id=self.run_id)
+
+    def write_state(self):
+        """Write the records updated since the last write. Collection results are updated once per child, but written
+        once."""
+        records = list(self.update_items_queue.values())
+        self.update_items_queue.clear()
+        self.repository.save_records(records)
+        self.state_written_at = time.monotonic()
+
+    def write_last_results(self):
+        last_results = list(self.updated_last_results.values())
+        self.updated_last_results.clear()
+        if last_results:
+            self.repository.update_item_last_results(last_results)
+
+    def wait_polling_interval(self):
+        """Wait the polling interval, or until the runner is stopped."""
+        with PROFILER.measure("polling_wait"):
+            self.stop_event.wait(max(self.item.run_options.polling_interval, 0.1))
+
+    def run_requests(self, item, parent_result_item=None, main_result=None, protocol_client=None):
+        """ Recursively processes requests """
+        # Stop signal:
+        if not self.running:
+            return
+
+        # Every cycle reads and writes through a single session and commits once:
+        with self.repository.unit_of_work():
+            result = self.execute_item(item=item, parent_result_item=parent_result_item, protocol_client=protocol_client)
+            if result is None:
+                return
+
+            # Update view:
+            if not main_result:
+                main_result = result
+
+            # The phase ends after the commit of the unit of work:
+            db_write_start = time.perf_counter_ns()
+            self.save_result(item, result, parent_result_item)
+        PROFILER.record("db_write", time.perf_counter_ns() - db_write_start)
+
+        if self.result_callback:
+            self.result_callback(result)
 
-        # Iterate over children in case of collections:
         if item.item_handler == "Collection":
-            for child in item.children:
-                self.run_requests(child, result, main_result)
+            # Iterate over children in case of collections:
+            self.run_children(item, result, main_result)
+        else:
+            # Wait polling interval:
+            self.wait_polling_interval()
+
+    def run_children(self, item, result, main_result):
+        """Run the children of a collection. Consecutive requests of a batching client are executed together."""
+        batch = []
+        batch_client = None
+        for child in item.children + [None]:
+            protocol_client = None
+            if child is not None and child.item_handler != "Collection":
+                with PROFILER.measure("client_resolution"):
+                    protocol_client = self.protocol_client_manager.get_client_handler(item=child)
+            if batch and protocol_client is batch_client:
+                batch.append(child)
+                continue
+
+            # Run the previous batch:
+            if len(batch) > 1:
+                self.run_batched_requests(batch, batch_client, result)
+            elif batch:
+                self.run_requests(batch[0], result, main_result, protocol_client=batch_client)
+            batch = []
+            batch_client = None
+
+            if child is None:
+                break
+            if getattr(protocol_client, "batching", False):
+                batch = [child]
+                batch_client = protocol_client
+            else:
+                self.run_requests(child, result, main_result, protocol_client=protocol_client)
+
+    def run_batched_requests(self, items: list, protocol_client, parent_result_item):
+        """Execute the requests together, e.g. pipelined, and save their results at once. The polling interval is waited once."""
+        # Stop signal:
+        if not self.running:
+            return
+
+        with PROFILER.measure("connect"):
+            protocol_client.connect()
+        results = protocol_client.execute_requests(
+            [self.get_request_fields(item) for item in items],
+            parent_result_id=parent_result_item.item_id,
+            execution_session_id=self.execution_session.item_id,
+        )
+        completed = [(item, result) for item, result in zip(items, results) if not self.is_cancelled(result)]
+
+        with self.repository.unit_of_work():
+            db_write_start = time.perf_counter_ns()
+            for item, result in completed:
+                self.record_request_result(item, result, protocol_client, parent_result_item)
+                self.save_result(item, result, parent_result_item)
+        PROFILER.record("db_write", time.perf_counter_ns() - db_write_start)
+
+        if self.result_callback:
+            for _, result in completed:
+                self.result_callback(result)
+
+        self.wait_polling_interval()
+
+    @staticmethod
+    def get_request_ids(item) -> list[int]:
+        """IDs of the item and all the items below it."""
+        request_ids = [item.item_id]
+        for child in item.children:
+            request_ids += Runner.get_request_ids(child)
+        return request_ids
 
     def run(self):
         """Main execution function."""
-        self.create_execution_session()
+        PROFILER.set_item(self.item.item_id)
+        # The session is created before the runner starts when the run ID is needed at once:
+        if self.execution_session is None:
+            self.create_execution_session()
 
         # Get requests tree:
-        requests_tree = self.repository.get_items_request_tree(self.item)[0]
+        with PROFILER.measure("tree_loading"), self.repository.unit_of_work():
+            requests_tree = self.repository.get_items_request_tree(self.item)[0]
+            # The run options of the run. The persistence overrides also apply to the requests of a collection, see
+            # 'PersistencePolicy':
+            requests_tree.run_options = self.item.run_options
+            self.alarm_engine.compile(requests_tree, self.repository.get_alarm_rules(self.get_request_ids(requests_tree)))
 
-        time.sleep(self.item.run_options.delayed_start)
+        self.stop_event.wait(self.item.run_options.delayed_start)
 
-        if self.item.run_options.continuous_monitoring:
+        if self.iterations is not None:
+            while self.running and self.execution_session.iterations < self.iterations:
+                with PROFILER.measure("cycle"):
+                    self.run_requests(item=requests_tree)
+                self.execution_session.iterations += 1
+        elif self.item.run_options.continuous_monitoring:
             while self.running:
-                self.run_requests(item=requests_tree)
+                with PROFILER.measure("cycle"):
+                    self.run_requests(item=requests_tree)
                 self.execution_session.iterations += 1
         else:
-            self.run_requests(item=requests_tree)
+            with PROFILER.measure("cycle"):
+                self.run_requests(item=requests_tree)
             self.execution_session.iterations += 1
 
         self.finish_execution_session()
@@ -136,8 +468,13 @@ class Runner(threading.Thread):
         return
 
     def stop(self):
-        """Gracefully stop the thread."""
-        self.running = False
+        """Stop the runner from another thread. It returns at once: the runner finishes its session in the background."""
+        self.stop_event.set()
+        self.protocol_client_manager.cancel_all_handlers()
+
+    @property
+    def stopping(self) -> bool:
+        return self.stop_event.is_set() and self.is_alive()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,316 @@
+import multiprocessing
+import multiprocessing.connection
+import threading
+import zlib
+
+from backend.core.handlers.protocol_client_manager import ProtocolClientManager
+from backend.core.profiler import PROFILER
+from backend.repository import BaseRepository
+from backend.repository.remote_writer_repository import RemoteWriterRepository
+from config import load_app_config
+from utils.logger import setup_logging, get_logger
+
+
+logger = get_logger(__name__)
+
+WRITER_BATCH_MESSAGES = 1000  # Maximum writes of a group commit
+WORKER_SHUTDOWN_TIMEOUT = 15  # Seconds to wait for a worker after its runners are drained
+
+
+def run_worker(worker_index: int, database_url: str, control_connection, writer_connection):
+    """Main function of a runner worker process: runs the items it receives through the control pipe in threads."""
+    config = load_app_config(find_port=False)
+    setup_logging(f"runner_worker_{worker_index}", **config.get("logging", {}))
+    PROFILER.enabled = config.get("profiling", {}).get("enabled", False)
+
+    # Imported here, the backend manager imports the pool:
+    from backend.core.backend_manager import BackendManager
+    from backend.core.metrics import METRICS
+    from backend.core.handlers.serial_bus_manager import SERIAL_BUSES
+    backend_manager = BackendManager(repository=RemoteWriterRepository(database_url=database_url,
+                                                                       connection=writer_connection))
+    logger.info("Runner worker %s started", worker_index)
+
+    while True:
+        try:
+            command, args = control_connection.recv()
+        except (EOFError, OSError):
+            command, args = "shutdown", ()
+
+        try:
+            result = None
+            if command == "start":
+                result = backend_manager.start(*args)
+            elif command == "stop":
+                backend_manager.stop(*args)
+            elif command == "stop_run":
+                result = backend_manager.stop_run(*args)
+            elif command == "runs":
+                result = backend_manager.get_runs()
+            elif command == "live_state":
+                result = backend_manager.get_live_state(*args)
+            elif command == "running":
+                result = backend_manager.get_running_threads()
+            elif command == "stopping":
+                result = backend_manager.get_stopping_threads()
+            elif command == "status":
+                result = {
+                    "running": backend_manager.get_running_threads(),
+                    "runs": backend_manager.get_runs(),
+                    "latency": backend_manager.get_latency_histograms(),
+                    "metrics": METRICS.snapshot(),
+                    "serial_buses": SERIAL_BUSES.get_status(),
+                }
+            elif command == "shutdown":
+                backend_manager.shutdown(*args)
+            else:
+                raise ValueError(f"Unknown runner worker command: {command}")
+            reply = ("ok", result)
+        except Exception as error:
+            reply = ("error", (type(error).__name__, str(error)))
+
+        try:
+            control_connection.send(reply)
+        except (EOFError, OSError):
+            pass
+        if command == "shutdown":
+            break
+
+    logger.info("Runner worker %s finished", worker_index)
+
+
+class RepositoryWriter(threading.Thread):
+    """Single database writer of the runner workers.
+
+    Writes are received through the writer pipes of the workers. The writes of a unit of work of a worker are executed
+    in a savepoint, opened on its first write and released on its commit request, so a failed write, or a unit of work
+    rolled back by the worker, only discards the writes of that unit of work. Savepoints cannot interleave: the units
+    of work of a worker are sent one at a time, see 'RemoteWriterRepository', and the writer reads only from that
+    worker until its unit of work ends. The complete units of work are committed together, once all the writes already
+    received are done, so the commits of the workers are grouped. Commit requests are answered after the commit.
+    """
+
+    WRITE_METHODS = ("save_item_values", "save_items_values", "delete_finished_last_results", "add_latency_histograms")
+
+    def __init__(self, repository: BaseRepository, connections: list):
+        super().__init__(name="repository-writer", daemon=True)
+        self.repository = repository
+        self.connections = connections
+
+    def execute(self, method: str, args: tuple):
+        if method in self.WRITE_METHODS:
+            return getattr(self.repository, method)(*args)
+        raise ValueError(f"Unknown database writer method: {method}")
+
+    @staticmethod
+    def send(connection, reply):
+        try:
+            connection.send(reply)
+        except (EOFError, OSError):
+            pass  # The worker is gone, its unit of work is rolled back on the next receive
+
+    def receive_unit_of_work(self, session, connection, committing: list) -> int:
+        """Execute the messages of a worker until its unit of work ends. Returns the number of messages received."""
+        savepoint = None
+        messages = 0
+        while True:
+            try:
+                method, args = connection.recv()
+            except (EOFError, OSError):
+                self.connections.remove(connection)
+                if savepoint is not None:
+                    savepoint.rollback()
+                return messages
+            messages += 1
+
+            if method == "commit":
+                committing.append(connection)
+                if savepoint is not None:
+                    savepoint.commit()
+                return messages
+            if method == "rollback":
+                if savepoint is not None:
+                    savepoint.rollback()
+                self.send(connection, ("ok", None))
+                return messages
+
+            if savepoint is None:
+                savepoint = session.begin_nested()
+            try:
+                reply = ("ok", self.execute(method, args))
+            except Exception as error:
+                logger.error("Database writer error in '%s': %s", method, error, exc_info=True)
+                # The unit of work ends with its failed write, the worker drops it:
+                savepoint.rollback()
+                savepoint = None
+                reply = ("error", str(error))
+            self.send(connection, reply)
+            if savepoint is None:
+                return messages
+
+    def run(self):
+        while self.connections:
+            ready = multiprocessing.connection.wait(self.connections)
+            committing = []
+            reply = ("ok", None)
+            try:
+                with self.repository.unit_of_work() as session:
+                    # The driver begins the transaction on the first write: a savepoint that began it would be
+                    # committed when released.
+                    session.connection().exec_driver_sql("BEGIN")
+                    messages = 0
+                    while ready and messages < WRITER_BATCH_MESSAGES:
+                        for connection in ready:
+                            messages += self.receive_unit_of_work(session, connection, committing)
+                        ready = multiprocessing.connection.wait(self.connections, timeout=0)
+            except Exception as error:
+                logger.error("Database writer commit error: %s", error, exc_info=True)
+                reply = ("error", str(error))
+
+            for connection in committing:
+                self.send(connection, reply)
+
+
+class RunnerPool:
+    """Runs the items in a pool of worker processes, instead of in threads of the API process.
+
+    Items are sharded by connection, so all the items of a device, and all the runs of an item, run in the same worker
+    and share its client. Workers
+    are started with the first item, controlled through a pipe each, and write to the database through the single
+    writer of this process.
+    """
+
+    def __init__(self, repository: BaseRepository, workers: int):
+        self.repository = repository
+        self.workers = workers
+        self.context = multiprocessing.get_context("spawn")
+        self.processes = []
+        self.control_connections = []
+        self.control_locks = []
+        self.writer = None
+        self.assignments = {}  # Key: run ID, Value: worker index
+        self.lock = threading.Lock()
+
+    def ensure_started(self):
+        with self.lock:
+            if self.processes:
+                return
+
+            database_url = self.repository.engine.url.render_as_string(hide_password=False)
+            writer_connections = []
+            for worker_index in range(self.workers):
+                control_connection, worker_control_connection = self.context.Pipe()
+                writer_connection, worker_writer_connection = self.context.Pipe()
+                process = self.context.Process(target=run_worker,
+                                               args=(worker_index, database_url, worker_control_connection,
+                                                     worker_writer_connection),
+                                               name=f"runner-worker-{worker_index}",
+                                               daemon=True)
+                process.start()
+                worker_control_connection.close()
+                worker_writer_connection.close()
+
+                self.processes.append(process)
+                self.control_connections.append(control_connection)
+                self.control_locks.append(threading.Lock())
+                writer_connections.append(writer_connection)
+
+            self.writer = RepositoryWriter(self.repository, writer_connections)
+            self.writer.start()
+
+    def call(self, worker_index: int, command: str, *args):
+        with self.control_locks[worker_index]:
+            self.control_connections[worker_index].send((command, args))
+            status, result = self.control_connections[worker_index].recv()
+        if status == "error":
+            error_type, message = result
+            raise ValueError(message) if error_type == "ValueError" else RuntimeError(message)
+        return result
+
+    def get_shard_key(self, item_id: int) -> str:
+        """Connection of the item or, for collections, of their first request with a connection."""
+        protocol_client_manager = ProtocolClientManager(self.repository)
+        with self.repository.unit_of_work():
+            item = self.repository.get_item_request(item_id=item_id)
+            items = [item] if item else []
+            if item and item.item_handler == "Collection":
+                items = self.repository.get_items_request_tree(item)
+            while items:
+                item = items.pop(0)
+                if item.item_handler == "Collection":
+                    items = list(item.children or []) + items
+                    continue
+                connection_name = protocol_client_manager.get_connection_name(item)
+                if connection_name:
+                    return connection_name
+        return f"item {item_id}"
+
+    def get_worker_index(self, item_id: int) -> int:
+        return zlib.crc32(self.get_shard_key(item_id).encode()) % self.workers
+
+    def start(self, item_id: int, run_options: dict = None) -> int:
+        self.ensure_started()
+        worker_index = self.get_worker_index(item_id)
+        run_id = self.call(worker_index, "start", item_id, run_options)
+        self.assignments[run_id] = worker_index
+        logger.info("Run %s of Item ID %s started in runner worker %s", run_id, item_id, worker_index,
+                    extra={"item_id": item_id})
+        return run_id
+
+    def stop(self, item_id: int = None):
+        if not self.processes:
+            return
+        # The workers stop their runs of the item without waiting for them:
+        for worker_index in range(self.workers):
+            self.call(worker_index, "stop", item_id)
+
+    def stop_run(self, run_id: int) -> bool:
+        if run_id not in self.assignments:
+            return False
+        return self.call(self.assignments[run_id], "stop_run", run_id)
+
+    def get_runs(self) -> list[dict]:
+        if not self.processes:
+            return []
+        assigned_run_ids = set(self.assignments)
+        runs = [run for worker_index in range(self.workers) for run in self.call(worker_index, "runs")]
+        # Forget the finished runs. Runs started meanwhile are not known yet:
+        for run_id in assigned_run_ids - {run["run_id"] for run in runs}:
+            self.assignments.pop(run_id, None)
+        return runs
+
+    def get_live_state(self, run_id: int) -> dict | None:
+        if run_id not in self.assignments:
+            return None
+        return self.call(self.assignments[run_id], "live_state", run_id)
+
+    def get_running_items(self) -> list:
+        if not self.processes:
+            return []
+        return [item_id for worker_index in range(self.workers) for item_id in self.call(worker_index, "running")]
+
+    def get_stopping_items(self) -> list:
+        if not self.processes:
+            return []
+        return [item_id for worker_index in range(self.workers) for item_id in self.call(worker_index, "stopping")]
+
+    def get_status(self) -> list[dict]:
+        """Running items, runs, latency histograms, metrics and serial buses of every worker."""
+        if not self.processes:
+            return []
+        return [self.call(worker_index, "status") for worker_index in range(self.workers)]
+
+    def close(self, timeout: float = None):
+        """Stop the running items and the workers. The workers drain their runners at the same time."""
+        def shutdown(worker_index):
+            try:
+                self.call(worker_index, "shutdown", *([] if timeout is None else [timeout]))
+            except (EOFError, OSError, RuntimeError) as error:
+                logger.warning("Runner worker %s shutdown error: %s", worker_index, error)
+
+        threads = [threading.Thread(target=shutdown, args=(worker_index,)) for worker_index in range(len(self.processes))]
+        [thread.start() for thread in threads]
+        [thread.join() for thread in threads]
+        for process in self.processes:
+            process.join(WORKER_SHUTDOWN_TIMEOUT)
+        self.processes = []
@@ -1,30 +1,61 @@
 import argparse
+import signal
+import sys
 
 from flask import Flask
+from werkzeug.serving import make_server
 from backend.repository.sqlite_repository import SQLiteRepository
 from backend.core.backend_manager import BackendManager
 from backend.api import register_routes
+from backend.core.profiler import PROFILER
 from config import load_app_config
+from utils.logger import setup_logging, get_logger
 
 
+logger = get_logger(__name__)
 
-def create_app(database_url):
+
+
+def create_app(database_url, runner_workers: int = 0):
     app = Flask(__name__)
 
     repository_manager = SQLiteRepository(database_url=database_url)
-    backend_manager = BackendManager(repository=repository_manager)
+    backend_manager = BackendManager(repository=repository_manager, workers=runner_workers)
 
     register_routes(app, repository_manager, backend_manager)
+    app.extensions["backend_manager"] = backend_manager
 
     return app
 
 
-def run(host: str, port: int, debug: bool, database_url: str):
+def run(host: str, port: int, debug: bool, database_url: str, ready_connection=None, runner_workers: int = None):
+    """Run the API server. If a pipe connection is given, True is sent through it once the server is listening.
+
+    Runner workers are read from the configuration unless they are given. When the process is terminated, the runners
+    are stopped and finish their sessions before it exits.
+    """
+    config = load_app_config(find_port=False)
+    setup_logging("backend", **config.get("logging", {}))
+    PROFILER.enabled = config.get("profiling", {}).get("enabled", False)
     try:
-        app = create_app(database_url=database_url)
-        app.run(debug=debug, host=host, port=port)
+        if runner_workers is None:
+            runner_workers = config.get("runner", {}).get("workers", 0)
+        app = create_app(database_url=database_url, runner_workers=runner_workers)
+        try:
+            if ready_connection is None:
+                app.run(debug=debug, host=host, port=port)
+            else:
+                server = make_server(host, port, app, threaded=True)
+                # Exit normally on terminate, so the runners are drained below:
+                signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+                ready_connection.send(True)
+                ready_connection.close()
+                server.serve_forever()
+        finally:
+            # Before the exit handlers, as the one of multiprocessing terminates the runner workers:
+            app.extensions["backend_manager"].shutdown()
     except Exception as error:
-        print(f"Backend critical error: {error}")
+        logger.critical("Backend critical error: %s", error, exc_info=True)
 
 
 if __name__ == "__main__":
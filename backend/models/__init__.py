@@ -1,5 +1,8 @@
 from backend.models.base import Base, BaseItem, BaseRequest, BaseResult
+from backend.models.alarm import AlarmRule, AlarmEvent
 from backend.models.execution_session import ExecutionSession
+from backend.models.last_result import LastResult
+from backend.models.latency_histogram import LatencyHistogram
 from backend.models.request import Request
 from backend.models.client import Client
 from backend.models.collection import Collection, CollectionResult
@@ -0,0 +1,49 @@
+from backend.models.base import *
+
+
+@dataclass
+class AlarmRule(Base):
+    """Alarm rule of a request or, for all the requests below it, of a collection. See 'AlarmEngine'.
+
+    The rule checks the decoded value at 'address', or all the values of the response without address:
+    - Threshold: the value compared with 'limit' by 'operator' (>, >=, < or <=).
+    - Range: the value out of 'low' to 'high'.
+    - Rate of change: the change of the value per second above 'limit', in absolute value.
+    - Expected value: the value differs from 'limit' more than 'tolerance'.
+    An alarm is cleared when the value is back 'hysteresis' beyond the limit that raised it.
+    """
+    __tablename__ = "alarm_rule"
+
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, init=False)
+    request_id: Mapped[int] = mapped_column(Integer, ForeignKey("request.item_id", ondelete="CASCADE"), nullable=False)
+
+    name: Mapped[str] = mapped_column(String, default="Alarm")
+    rule_type: Mapped[str] = mapped_column(String, default="Threshold")
+    address: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
+    operator: Mapped[str] = mapped_column(String, default=">")
+    limit: Mapped[float] = mapped_column(Float, default=0)
+    low: Mapped[float] = mapped_column(Float, default=0)
+    high: Mapped[float] = mapped_column(Float, default=0)
+    tolerance: Mapped[float] = mapped_column(Float, default=0)
+    hysteresis: Mapped[float] = mapped_column(Float, default=0)
+    severity: Mapped[str] = mapped_column(String, default="Warning")
+    enabled: Mapped[bool] = mapped_column(Boolean, default=True)
+
+
+@dataclass
+class AlarmEvent(Base):
+    """Alarm raised or cleared by a rule on a value of a request, with the result that changed it."""
+    __tablename__ = "alarm_event"
+
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, init=False)
+    execution_session_id: Mapped[int] = mapped_column(Integer, ForeignKey("execution_session.item_id", ondelete="CASCADE"), nullable=False)
+    rule_id: Mapped[int] = mapped_column(Integer, ForeignKey("alarm_rule.item_id", ondelete="SET NULL"), nullable=True, default=None)
+    request_id: Mapped[int] = mapped_column(Integer, ForeignKey("request.item_id", ondelete="SET NULL"), nullable=True, default=None)
+    result_id: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
+
+    timestamp: Mapped[datetime] = mapped_column(String, nullable=False, default=None)
+    state: Mapped[str] = mapped_column(String, default="Raised")
+    label: Mapped[str] = mapped_column(String, nullable=True, default=None)
+    value: Mapped[float] = mapped_column(Float, nullable=True, default=None)
+    severity: Mapped[str] = mapped_column(String, default="Warning")
+    message: Mapped[str] = mapped_column(String, nullable=True, default=None)
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 
 import tzlocal
-from sqlalchemy import Integer, String, ForeignKey, Column, Boolean, JSON, DateTime, UniqueConstraint
+from sqlalchemy import Integer, String, Float, ForeignKey, Column, Boolean, JSON, DateTime, UniqueConstraint
 from sqlalchemy.orm import Mapped, MappedAsDataclass, DeclarativeBase, mapped_column
 
 
@@ -0,0 +1,22 @@
+from backend.models.base import *
+
+
+@dataclass
+class LastResult(Base):
+    """Denormalized snapshot of the latest result of a request and the running totals of its execution session.
+
+    There is a snapshot per execution session, so the runs of an item running at the same time keep their own. When a
+    session finishes, the snapshots of the older finished sessions of its requests are deleted, see
+    'SQLiteRepository.delete_finished_last_results'.
+    """
+    __tablename__ = "last_result"
+
+    request_id: Mapped[int] = mapped_column(Integer, ForeignKey("request.item_id", ondelete="CASCADE"), primary_key=True)
+    execution_session_id: Mapped[int] = mapped_column(Integer, ForeignKey("execution_session.item_id", ondelete="CASCADE"), primary_key=True)
+
+    result_handler: Mapped[str] = mapped_column(String, nullable=True, default=None)
+    result_id: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
+
+    iterations: Mapped[int] = mapped_column(Integer, default=0)
+    total_ok: Mapped[int] = mapped_column(Integer, default=0)
+    total_failed: Mapped[int] = mapped_column(Integer, default=0)
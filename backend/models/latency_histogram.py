@@ -0,0 +1,26 @@
+from backend.models.base import *
+
+
+@dataclass
+class LatencyHistogram(Base):
+    """Latency histogram of an execution session, stored when the session finishes.
+
+    The scope is the session itself, a request or a connection. Latencies are in nanoseconds and the buckets are the
+    non-empty buckets of the log-linear histogram, so percentiles can be recomputed or histograms merged later.
+    """
+    __tablename__ = "latency_histogram"
+
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, init=False)
+    execution_session_id: Mapped[int] = mapped_column(Integer, ForeignKey("execution_session.item_id", ondelete="CASCADE"), nullable=False)
+    scope: Mapped[str] = mapped_column(String, nullable=False)
+    request_id: Mapped[int] = mapped_column(Integer, ForeignKey("request.item_id", ondelete="SET NULL"), nullable=True, default=None)
+    connection: Mapped[str] = mapped_column(String, nullable=True, default=None)
+
+    count: Mapped[int] = mapped_column(Integer, default=0)
+    min: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
+    max: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
+    mean: Mapped[float] = mapped_column(Float, nullable=True, default=None)
+    p50: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
+    p95: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
+    p99: Mapped[int] = mapped_column(Integer, nullable=True, default=None)
+    buckets: Mapped[dict] = mapped_column(JSON, nullable=True, default=None)
@@ -13,6 +13,8 @@ class ModbusTcpClient(BaseItem):
     port: Mapped[int] = mapped_column(Integer, default=502)
     timeout: Mapped[int] = mapped_column(Integer, default=3)
     retries: Mapped[int] = mapped_column(Integer, default=3)
+    pipelining: Mapped[bool] = mapped_column(Boolean, default=False)
+    max_in_flight: Mapped[int] = mapped_column(Integer, default=8)
 
 
 @dataclass
@@ -30,6 +32,8 @@ class ModbusRtuClient(BaseItem):
     bytesize: Mapped[int] = mapped_column(Integer, default=8)
     timeout: Mapped[int] = mapped_column(Integer, default=3)
     retries: Mapped[int] = mapped_column(Integer, default=3)
+    broadcast_delay: Mapped[int] = mapped_column(Integer, default=100)  # Milliseconds the slaves need to process a broadcast
+    schedule_requests: Mapped[bool] = mapped_column(Boolean, default=False)
 
 
 @dataclass
@@ -10,3 +10,8 @@ class RunOptions(BaseItem):
     polling_interval: Mapped[int] = mapped_column(Integer, default=1)
     delayed_start: Mapped[int] = mapped_column(Integer, default=0)
     continuous_monitoring: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Results of requests stored on every poll or only on change, see 'PersistencePolicy':
+    persistence: Mapped[str] = mapped_column(String, default="Every poll")
+    deadband_absolute: Mapped[float] = mapped_column(Float, default=0)
+    deadband_percent: Mapped[float] = mapped_column(Float, default=0)
+    heartbeat_interval: Mapped[int] = mapped_column(Integer, default=60)  # Seconds, 0 disables the heartbeat
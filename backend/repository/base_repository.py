@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 
 from backend.models import DATACLASS_REGISTRY, BaseItem, BaseRequest
 
@@ -16,6 +17,11 @@ class BaseRepository(ABC):
             raise ValueError(f"Unknown item handler: {item_handler}")
         return cls
 
+    @contextmanager
+    def unit_of_work(self):
+        """Group the repository calls of the current thread in a single transaction."""
+        yield
+
     def set_selected_item(self, item_id: int):
         self.selected_item = item_id
 
@@ -37,10 +43,18 @@ class BaseRepository(ABC):
     def create_item_request_from_handler(self, item_name: str, item_handler: str, parent_item_id: int):
         raise NotImplementedError
 
+    @abstractmethod
+    def get_database_size(self) -> int:
+        raise NotImplementedError
+
     @abstractmethod
     def add_item_from_dataclass(self, item: BaseItem):
         raise NotImplementedError
 
+    @abstractmethod
+    def save_item_values(self, table_name: str, values: dict) -> int:
+        raise NotImplementedError
+
     @abstractmethod
     def create_client_item(self, item_name: str, item_handler: str, parent_item_id: int):
         raise NotImplementedError
@@ -49,6 +63,14 @@ class BaseRepository(ABC):
     def create_run_options_item(self, item_name: str, item_handler: str, parent_item_id: int):
         raise NotImplementedError
 
+    @abstractmethod
+    def search_items(self, pattern: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_items_request(self, name: str):
+        raise NotImplementedError
+
     @abstractmethod
     def get_item_request(self, item_id: int):
         raise NotImplementedError
@@ -58,7 +80,64 @@ class BaseRepository(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def get_item_results_history(self, item_id: int):
+    def save_records(self, records: list):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_execution_session_result_tree(self, execution_session_id: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_item_last_results(self, last_results: list):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_finished_last_results(self, request_ids: list[int]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_latency_histograms(self, execution_session_id: int, histograms: dict):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_item_latency_histograms(self, item_id: int, execution_session_id: int = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_alarm_rules(self, request_ids: list[int]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_alarm_rule(self, item_id: int, **kwargs):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_alarm_rule(self, rule_id: int, **kwargs):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_alarm_rule(self, rule_id: int):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_item_alarm_events(self, item_id: int, execution_session_id: int = None, limit: int = 100):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_item_results_history(self, item_id: int, since_id: int = None, before_id: int = None, limit: int = 10):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_item_trend(self, item_id: int, time_from=None, time_to=None, since_id: int = None, points: int = None,
+                       method: str = "lttb"):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_item_series(self, item_id: int, time_from=None, time_to=None, bucket: int = 60, aggregations: list[str] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_items_children(self, parent_id: int = None, offset: int = 0, limit: int = None):
         raise NotImplementedError
 
     @abstractmethod
@@ -69,6 +148,14 @@ class BaseRepository(ABC):
     def update_item_from_handler(self, item_id: int, item_handler: str, **kwargs):
         raise NotImplementedError
 
+    @abstractmethod
+    def update_items_positions(self, positions: list[dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def move_item(self, item_id: int, parent_id: int | None, position: int):
+        raise NotImplementedError
+
     @abstractmethod
     def delete_item(self, item_id: int):
         raise NotImplementedError
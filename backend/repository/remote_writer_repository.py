@@ -0,0 +1,93 @@
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy.orm import Session
+
+from backend.models import *
+from backend.repository.sqlite_repository import SQLiteRepository
+
+
+class RemoteWriterRepository(SQLiteRepository):
+    """Repository of the runner worker processes.
+
+    Reads go to the database as usual, but the writes of the runners are sent through a pipe to the database writer of
+    the main process, so a single process writes to SQLite. Writes made in a unit of work are committed by the writer
+    when the outermost unit of work ends, or rolled back if it fails. The writer keeps the writes of a unit of work in a
+    savepoint, so the units of work of the runner threads are sent one at a time, from their first write to their end.
+    """
+
+    def __init__(self, database_url: str, connection):
+        super().__init__(database_url=database_url)
+        self.connection = connection
+        self.lock = threading.Lock()  # The runner threads of the worker share the pipe
+        self.unit_of_work_lock = threading.Lock()  # Held by the unit of work being written
+
+    def call(self, method: str, *args):
+        with self.lock:
+            self.connection.send((method, args))
+            status, result = self.connection.recv()
+        if status == "error":
+            raise RuntimeError(f"Database writer error: {result}")
+        return result
+
+    def write(self, method: str, *args):
+        if not getattr(self._local, "depth", 0):
+            with self.unit_of_work_lock:
+                result = self.call(method, *args)
+                self.call("commit")
+            return result
+
+        if not self._local.remote_dirty:
+            self.unit_of_work_lock.acquire()
+            self._local.remote_dirty = True
+        try:
+            return self.call(method, *args)
+        except Exception:
+            # The writer has rolled back the unit of work:
+            self._local.remote_dirty = False
+            self.unit_of_work_lock.release()
+            raise
+
+    def end_unit_of_work(self, method: str):
+        """Commit or roll back the writes of the unit of work of the current thread."""
+        self._local.remote_dirty = False
+        try:
+            self.call(method)
+        finally:
+            self.unit_of_work_lock.release()
+
+    @contextmanager
+    def unit_of_work(self):
+        depth = getattr(self._local, "depth", 0)
+        if depth == 0:
+            self._local.remote_dirty = False
+        self._local.depth = depth + 1
+        try:
+            with super().unit_of_work() as session:
+                yield session
+        except:
+            if depth == 0 and self._local.remote_dirty:
+                self.end_unit_of_work("rollback")
+            raise
+        finally:
+            self._local.depth = depth
+        if depth == 0 and self._local.remote_dirty:
+            self.end_unit_of_work("commit")
+
+    @staticmethod
+    def get_item_values(item: BaseItem) -> dict:
+        return {column.key: getattr(item, column.key) for column in item.__table__.columns}
+
+    def add_item_from_dataclass(self, item: BaseItem, session: Session = None):
+        primary_key = item.__table__.primary_key.columns.values()[0].key
+        setattr(item, primary_key, self.write("save_item_values", item.__tablename__, self.get_item_values(item)))
+        return item
+
+    def save_items_values(self, items_values: list[tuple[str, dict]], session: Session = None) -> list:
+        return self.write("save_items_values", items_values)
+
+    def delete_finished_last_results(self, request_ids: list[int], session: Session = None):
+        self.write("delete_finished_last_results", request_ids)
+
+    def add_latency_histograms(self, execution_session_id: int, histograms: dict, session: Session = None):
+        self.write("add_latency_histograms", execution_session_id, histograms)
@@ -1,14 +1,51 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from collections import defaultdict
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine, event, func, desc, over
-from sqlalchemy.orm import sessionmaker, declarative_base, aliased
+import sqlalchemy
+from sqlalchemy import create_engine, event, func, desc, over, update, or_, select, union_all, text, bindparam, literal_column
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import sessionmaker, declarative_base, aliased, Session
 
+from backend.core.alarm_engine import RULE_TYPES, OPERATORS, SEVERITIES
+from backend.core.downsampling import DOWNSAMPLING_METHODS
+from backend.core.metrics import METRICS
+from backend.core.result_records import Record, LastResultRecord
+from backend.core.handlers.custom_modbus_handler import CustomModbusHandler, NUMERIC_DATA_TYPES
 from backend.models import *
 from backend.repository.base_repository import BaseRepository
 from config import SQLALCHEMY_URL
 
 Base = declarative_base()
 
+SERIES_AGGREGATIONS = ["min", "max", "avg", "count", "fail_rate"]
+
+# Timestamps are stored as text with the UTC offset of the host when stored, which changes with DST, so time windows
+# are filtered in milliseconds since epoch instead of comparing the text:
+TIMESTAMP_MS_SQL = "CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def to_timestamp_ms(value: datetime) -> int:
+    """Milliseconds since epoch of a datetime, local time if it has no timezone, as 'TIMESTAMP_MS_SQL'."""
+    return round(value.timestamp() * 1000)
+
+# Decoding of the register values in SQL, from the 'json_each' row of the first register of each value:
+_WORD = "register.value"
+_NEXT_WORD = "json_extract(registers, '$[' || (register.key + 1) || ']')"
+REGISTER_VALUE_SQL = {
+    "16-bit Integer": f"(CASE WHEN {_WORD} >= 32768 THEN {_WORD} - 65536 ELSE {_WORD} END)",
+    "16-bit Unsigned Integer": _WORD,
+    "Hexadecimal": _WORD,
+    "32-bit Integer": f"({_WORD} * 65536 + {_NEXT_WORD} - CASE WHEN {_WORD} >= 32768 THEN 4294967296 ELSE 0 END)",
+    "32-bit Unsigned Integer": f"({_WORD} * 65536 + {_NEXT_WORD})",
+}
+
 
 class SQLiteRepository(BaseRepository):
     def __init__(self, database_url: str = SQLALCHEMY_URL):
@@ -16,6 +53,8 @@ class SQLiteRepository(BaseRepository):
 
         self.engine = create_engine(database_url)
         self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self._local = threading.local()  # Unit of work of the current thread
+        self.bulk_statements = {}  # Key: statement type, table name and columns, Value: statement of 'save_items_values'
 
         @event.listens_for(self.engine, "connect")
         def enable_foreign_keys(dbapi_connection, connection_record):
@@ -24,33 +63,83 @@ class SQLiteRepository(BaseRepository):
             cursor.close()
 
     @contextmanager
-    def session_scope(self):
-        """Provide a transactional scope around a series of operations."""
+    def unit_of_work(self):
+        """Share a single session between all the repository calls of the current thread.
+
+        The transaction is committed once at the end, and only if any of the calls wrote to the database. Nested units
+        of work join the outer one.
+        """
+        if getattr(self._local, "session", None) is not None:
+            yield self._local.session
+            return
+
         session = self.Session()
+        self._local.session = session
+        self._local.dirty = False
         try:
             yield session
-            session.commit()
+            if self._local.dirty:
+                self.commit(session)
         except:
             session.rollback()
             raise
         finally:
+            self._local.session = None
             session.close()
 
+    @contextmanager
+    def session_scope(self, session: Session = None, read_only: bool = False):
+        """Provide a transactional scope around a series of operations.
+
+        The given session, or the one of the current unit of work, is reused: the owner of the session commits.
+        """
+        session = session or getattr(self._local, "session", None)
+        if session is not None:
+            if not read_only:
+                self._local.dirty = True
+            yield session
+            return
+
+        session = self.Session()
+        try:
+            yield session
+            if not read_only:
+                self.commit(session)
+        except:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    @staticmethod
+    def commit(session: Session):
+        start_time = time.perf_counter_ns()
+        session.commit()
+        METRICS.observe("commsman_db_write_seconds", time.perf_counter_ns() - start_time)
+
+    def get_database_size(self) -> int:
+        """Size in bytes of the database file and its journal files. In-memory databases have no size."""
+        database = self.engine.url.database
+        if not database or database == ":memory:":
+            return 0
+        return sum(os.path.getsize(path) for path in (database, f"{database}-wal", f"{database}-journal")
+                   if os.path.exists(path))
+
     def load(self):
         pass
 
     def save(self):
         pass
 
-    def delete_item(self, item_id: int):
-        with self.session_scope() as session:
+    def delete_item(self, item_id: int, session: Session = None):
+        with self.session_scope(session) as session:
             request = (
                 session.query(Request)
                     .filter(Request.item_id == item_id)
                     .first()
             )
 
-            item = self._get_item_request(item_id=request.item_id)
+            item = self._get_item_request(item_id=request.item_id, session=session)
 
             session.delete(request)
 
@@ -69,8 +158,8 @@ class SQLiteRepository(BaseRepository):
                 )
                 session.delete(run_options)
 
-    def delete_old_results(self, maintain_last_results: int = 10000):
-        with self.session_scope() as session:
+    def delete_old_results(self, maintain_last_results: int = 10000, session: Session = None):
+        with self.session_scope(session) as session:
             def delete_by_table(table_handler):
                 # Define a window function to partition by `request_id` and order by `timestamp` desc
                 window = over(
@@ -119,38 +208,247 @@ class SQLiteRepository(BaseRepository):
             delete_by_table(CollectionResult)
             delete_by_table(ModbusResponse)
 
-    def update_item_from_handler(self, item_id: int, item_handler: str, **kwargs):
-        with self.session_scope() as session:
-            item = self._get_item_from_handler(item_handler=item_handler, item_id=item_id)
+    def update_item_from_handler(self, item_id: int, item_handler: str, session: Session = None, **kwargs):
+        with self.session_scope(session) as session:
+            item = self._get_item_from_handler(item_handler=item_handler, item_id=item_id, session=session)
             for key, value in kwargs.items():
                 setattr(item, key, value)
             session.add(item)
             return item
 
-    def add_item_from_dataclass(self, item: BaseItem):
+    def update_items_positions(self, positions: list[dict], session: Session = None):
+        """Update the position of several items with one statement per item handler, in a single transaction."""
+        with self.session_scope(session) as session:
+            positions_by_handler = defaultdict(list)
+            for item_position in positions:
+                positions_by_handler[item_position["item_handler"]].append({
+                    "item_id": item_position["item_id"],
+                    "position": item_position["position"],
+                })
+
+            for item_handler, handler_positions in positions_by_handler.items():
+                item_class_handler = self.get_class_handler(item_handler)
+                session.execute(update(item_class_handler), handler_positions)
+            return positions
+
+    def move_item(self, item_id: int, parent_id: int | None, position: int, session: Session = None) -> dict:
+        """Move an item to the given parent and position, shifting the positions of its old and new siblings.
+
+        Return the moved item and the siblings whose position was affected, ordered by parent and position.
+        """
+        with self.session_scope(session) as session:
+            if session.get(Request, item_id) is None:
+                raise ValueError(f"Item {item_id} not found")
+            item = self._get_item(item_id, session=session)
+
+            # Validate the destination:
+            if parent_id is None:
+                if item.item_handler != "Collection":
+                    raise ValueError("Items cannot be moved to the root level")
+            else:
+                ancestor = session.get(Collection, parent_id)
+                if ancestor is None:
+                    raise ValueError(f"Parent item {parent_id} is not a collection")
+                while ancestor is not None:
+                    if ancestor.item_id == item_id:
+                        raise ValueError("An item cannot be moved into itself or one of its descendants")
+                    ancestor = session.get(Collection, ancestor.parent_id) if ancestor.parent_id else None
+
+            # Siblings are split in one table per request handler:
+            request_class_handlers = BaseRequest.__subclasses__()
+
+            old_parent_id, old_position = item.parent_id, item.position
+            siblings_count = sum(
+                session.query(func.count(request_class_handler.item_id))
+                    .filter(request_class_handler.parent_id == parent_id)
+                    .filter(request_class_handler.item_id != item_id)
+                    .scalar()
+                for request_class_handler in request_class_handlers
+            )
+            position = max(0, min(position, siblings_count))
+
+            for request_class_handler in request_class_handlers:
+                # Close the gap left in the old parent:
+                if old_position is not None:
+                    session.execute(
+                        update(request_class_handler)
+                            .where(request_class_handler.parent_id == old_parent_id)
+                            .where(request_class_handler.position > old_position)
+                            .where(request_class_handler.item_id != item_id)
+                            .values(position=request_class_handler.position - 1)
+                            .execution_options(synchronize_session=False)
+                    )
+                # Open a gap in the new parent:
+                session.execute(
+                    update(request_class_handler)
+                        .where(request_class_handler.parent_id == parent_id)
+                        .where(request_class_handler.position >= position)
+                        .where(request_class_handler.item_id != item_id)
+                        .values(position=request_class_handler.position + 1)
+                        .execution_options(synchronize_session=False)
+                )
+
+            item.parent_id = parent_id
+            item.position = position
+            session.add(item)
+            session.flush()
+
+            siblings = []
+            for request_class_handler in request_class_handlers:
+                siblings.extend(
+                    {"item_id": sibling_id, "item_handler": request_class_handler.__name__,
+                     "parent_id": sibling_parent_id, "position": sibling_position}
+                    for sibling_id, sibling_parent_id, sibling_position in (
+                        session.query(request_class_handler.item_id,
+                                      request_class_handler.parent_id,
+                                      request_class_handler.position)
+                            .filter(or_(request_class_handler.parent_id == old_parent_id,
+                                        request_class_handler.parent_id == parent_id))
+                            .all()
+                    )
+                )
+            siblings.sort(key=lambda x: (x["parent_id"] or 0, x["position"] or 0))
+
+            return {"item": item, "siblings": siblings}
+
+    def add_item_from_dataclass(self, item: BaseItem, session: Session = None):
         """Crea un nuevo ítem y lo guarda en la base de datos."""
-        with self.session_scope() as session:
+        with self.session_scope(session) as session:
             session.add(item)
+            session.flush()
             return item
 
-    def create_item_request_from_handler(self, item_name: str, item_handler: str, parent_item_id: int = None):
-        """Crea un nuevo ítem y lo guarda en la base de datos."""
-        with self.session_scope() as session:
+    def save_item_values(self, table_name: str, values: dict, session: Session = None) -> int:
+        """Insert or update the row of a table from its column values, and return its primary key.
+
+        Rows without primary key are inserted. Used by the database writer of the runner workers, which send the column
+        values of the items instead of the items.
+        """
+        with self.session_scope(session) as session:
+            table = BaseItem.metadata.tables[table_name]
+            primary_keys = table.primary_key.columns.values()
+            primary_key = primary_keys[0]
+            if values.get(primary_key.key) is None:
+                values = {key: value for key, value in values.items() if key != primary_key.key}
+                return session.execute(insert(table).values(**values)).inserted_primary_key[0]
+
+            session.execute(insert(table).values(**values).on_conflict_do_update(
+                index_elements=primary_keys,
+                set_={key: value for key, value in values.items() if key not in table.primary_key.columns}
+            ))
+            return values[primary_key.key]
+
+    def save_items_values(self, items_values: list[tuple[str, dict]], session: Session = None) -> list:
+        """Insert or update rows from their table name and column values, in bulk, and return their primary keys.
+
+        Rows without primary key are inserted and the rest are inserted or updated, as in 'save_item_values', but the
+        rows of a table with the same columns are written with a single statement. Rows with primary key are updated
+        first and upserted only if any of them is missing: unlike the upserts of SQLite, the inserts and updates are
+        compiled once and then taken from the statement cache.
+        """
+        with self.session_scope(session) as session:
+            primary_keys = [None] * len(items_values)
+            inserts = {}  # Key: table name and columns, Value: list of (index, values)
+            upserts = {}  # Key: table name and columns, Value: list of values
+            for index, (table_name, values) in enumerate(items_values):
+                primary_key = BaseItem.metadata.tables[table_name].primary_key.columns.values()[0].key
+                if values.get(primary_key) is None:
+                    values = {key: value for key, value in values.items() if key != primary_key}
+                    inserts.setdefault((table_name, tuple(values)), []).append((index, values))
+                else:
+                    upserts.setdefault((table_name, tuple(values)), []).append(values)
+                    primary_keys[index] = values[primary_key]
+
+            # New rows first, so the updated ones can refer to them:
+            for (table_name, columns), rows in inserts.items():
+                statement = self.bulk_statements.get(("insert", table_name, columns))
+                if statement is None:
+                    table = BaseItem.metadata.tables[table_name]
+                    statement = sqlalchemy.insert(table).returning(table.primary_key.columns.values()[0],
+                                                                   sort_by_parameter_order=True)
+                    self.bulk_statements[("insert", table_name, columns)] = statement
+                inserted_keys = session.execute(statement, [values for _, values in rows]).scalars().all()
+                for (index, _), inserted_key in zip(rows, inserted_keys):
+                    primary_keys[index] = inserted_key
+
+            for (table_name, columns), rows in upserts.items():
+                table = BaseItem.metadata.tables[table_name]
+                primary_key_columns = table.primary_key.columns
+                statement = self.bulk_statements.get(("update", table_name, columns))
+                if statement is None:
+                    # The bound parameters of the keys cannot take the names of the columns, which are also set:
+                    statement = (update(table)
+                                 .where(*[column == bindparam(f"key_{column.key}") for column in primary_key_columns])
+                                 .values({column: bindparam(column) for column in columns
+                                          if column not in primary_key_columns}))
+                    self.bulk_statements[("update", table_name, columns)] = statement
+                parameters = [{**values, **{f"key_{column.key}": values[column.key] for column in primary_key_columns}}
+                              for values in rows]
+                if session.execute(statement, parameters).rowcount == len(rows):
+                    continue
+
+                statement = insert(table)
+                statement = statement.on_conflict_do_update(
+                    index_elements=primary_key_columns.values(),
+                    set_={column: statement.excluded[column] for column in columns
+                          if column not in primary_key_columns}
+                )
+                session.execute(statement, rows)
+            return primary_keys
+
+    def save_records(self, records: list[Record], session: Session = None):
+        """Store the records built by a runner, in bulk. New records get their item ID.
+
+        Records that refer to new records, e.g. the alarm events to their result, are stored in a second bulk, once
+        the records they refer to have their item ID.
+        """
+        referring = [record for record in records
+                     if any(reference.item_id is None for reference in record.get_references())]
+        if referring:
+            referring_ids = {id(record) for record in referring}
+            records = [record for record in records if id(record) not in referring_ids]
+
+        for batch in (records, referring):
+            if not batch:
+                continue
+            primary_keys = self.save_items_values([(record.table_name, record.to_values()) for record in batch],
+                                                  session=session)
+            for record, primary_key in zip(batch, primary_keys):
+                if "item_id" in record.columns and record.item_id is None:
+                    record.item_id = primary_key
+
+    def create_item_request_from_handler(self, item_name: str, item_handler: str, parent_item_id: int = None, session: Session = None):
+        """Crea un nuevo ítem y lo guarda en la base de datos.
+
+        The item is placed after its siblings, so it is loaded last with the pages of children of its parent.
+        """
+        with self.session_scope(session) as session:
             base_request_item = DATACLASS_REGISTRY["Request"](name=item_name, request_type_handler=item_handler)
             session.add(base_request_item)
             session.flush()
 
-            item = DATACLASS_REGISTRY.get(item_handler)(item_id=base_request_item.item_id, name=item_name, parent_id=parent_item_id)
+            # Siblings are split in one table per request handler:
+            last_positions = [
+                session.query(func.max(func.coalesce(request_class_handler.position, 0)))
+                    .filter(request_class_handler.parent_id == parent_item_id)
+                    .scalar()
+                for request_class_handler in BaseRequest.__subclasses__()
+            ]
+            last_positions = [last_position for last_position in last_positions if last_position is not None]
+            position = max(last_positions) + 1 if last_positions else 0
+
+            item = DATACLASS_REGISTRY.get(item_handler)(item_id=base_request_item.item_id, name=item_name,
+                                                        parent_id=parent_item_id, position=position)
             session.add(item)
             return item
 
-    def create_client_item(self, item_name: str, item_handler: str, parent_item_id: int):
+    def create_client_item(self, item_name: str, item_handler: str, parent_item_id: int, session: Session = None):
         """Crea un nuevo ítem y lo guarda en la base de datos."""
-        with self.session_scope() as session:
+        with self.session_scope(session) as session:
             item = DATACLASS_REGISTRY.get(item_handler)(name=item_name)
             base_client_item = DATACLASS_REGISTRY["Client"](name=item_name, client_type_handler=item.item_handler)
 
-            parent_item = self._get_item(parent_item_id)
+            parent_item = self._get_item(parent_item_id, session=session)
 
             session.add(base_client_item)
             session.flush()
@@ -158,33 +456,34 @@ class SQLiteRepository(BaseRepository):
             session.add(item)
             parent_item.client_id = base_client_item.item_id
             session.add(parent_item)
+            session.flush()
             return item
 
-    def create_run_options_item(self, item_name: str, item_handler: str, parent_item_id: int):
+    def create_run_options_item(self, item_name: str, item_handler: str, parent_item_id: int, session: Session = None):
         """Crea un nuevo ítem y lo guarda en la base de datos."""
-        with self.session_scope() as session:
+        with self.session_scope(session) as session:
             item = DATACLASS_REGISTRY.get(item_handler)(name=item_name)
             session.add(item)
             session.flush()
 
-            parent_item = self._get_item(parent_item_id)
+            parent_item = self._get_item(parent_item_id, session=session)
 
             parent_item.run_options_id = item.item_id
             session.add(parent_item)
         return item
 
-    def _get_item(self, item_id: int):
-        with self.session_scope() as session:
+    def _get_item(self, item_id: int, session: Session = None):
+        with self.session_scope(session, read_only=True) as session:
             base_item = (
                 session.query(Request)
                     .filter(Request.item_id == item_id)
                     .first()
             )
-            item = self._get_item_from_handler(item_handler=base_item.request_type_handler, item_id=base_item.item_id)
+            item = self._get_item_from_handler(item_handler=base_item.request_type_handler, item_id=base_item.item_id, session=session)
             return item
 
-    def _get_item_from_handler(self, item_handler: str, item_id: int):
-        with self.session_scope() as session:
+    def _get_item_from_handler(self, item_handler: str, item_id: int, session: Session = None):
+        with self.session_scope(session, read_only=True) as session:
             item_class_handler = self.get_class_handler(item_handler)
 
             item = (
@@ -194,19 +493,19 @@ class SQLiteRepository(BaseRepository):
             )
             return item
 
-    def _get_item_request(self, item_id: int):
-        with self.session_scope() as session:
+    def _get_item_request(self, item_id: int, session: Session = None):
+        with self.session_scope(session, read_only=True) as session:
             base_request = (
                 session.query(Request)
                     .filter(Request.item_id == item_id)
                     .first()
             )
 
-            item = self._get_item_from_handler(item_handler=base_request.request_type_handler, item_id=item_id)
+            item = self._get_item_from_handler(item_handler=base_request.request_type_handler, item_id=item_id, session=session)
             return item
 
-    def _get_item_client(self, item: BaseRequest) -> Client:
-        with self.session_scope() as session:
+    def _get_item_client(self, item: BaseRequest, session: Session = None) -> Client:
+        with self.session_scope(session, read_only=True) as session:
             base_client = (
                 session.query(Client)
                     .filter(Client.item_id == item.client_id)
@@ -224,8 +523,8 @@ class SQLiteRepository(BaseRepository):
             else:
                 return None
 
-    def _get_item_run_options(self, item: BaseRequest) -> RunOptions:
-        with self.session_scope() as session:
+    def _get_item_run_options(self, item: BaseRequest, session: Session = None) -> RunOptions:
+        with self.session_scope(session, read_only=True) as session:
             run_options = (
                 session.query(RunOptions)
                     .filter(RunOptions.item_id == item.run_options_id)
@@ -233,105 +532,460 @@ class SQLiteRepository(BaseRepository):
                 )
             return run_options
 
-    def get_item_last_result_tree(self, item_id: int) -> BaseResult | None:
+    def get_item_last_result_tree(self, item_id: int, session: Session = None) -> BaseResult | None:
+        """Execution session of the last run of the item, with its last result tree."""
+        with self.session_scope(session, read_only=True) as session:
+            # The runner keeps a snapshot of the last result, so the session length does not matter:
+            last_result = (
+                session.query(LastResult)
+                    .filter(LastResult.request_id == item_id)
+                    .order_by(LastResult.execution_session_id.desc())
+                    .first()
+            )
+            return self._get_last_result_tree(last_result, session=session)
+
+    def get_execution_session_result_tree(self, execution_session_id: int, session: Session = None) -> BaseResult | None:
+        """Execution session with its last result tree, e.g. of a run of an item running several times at once."""
+        with self.session_scope(session, read_only=True) as session:
+            execution_session = session.get(ExecutionSession, execution_session_id)
+            if not execution_session:
+                return None
+            last_result = session.get(LastResult, (execution_session.request_id, execution_session_id))
+            return self._get_last_result_tree(last_result, session=session)
+
+    def _get_last_result_tree(self, last_result: LastResult | None, session: Session) -> BaseResult | None:
         def get_result_with_children(item_handler, item_id):
-            result_item = self._get_item_result(item_handler=item_handler, item_id=item_id)
+            result_item = self._get_item_result(item_handler=item_handler, item_id=item_id, session=session)
+            # Results are returned detached, so the runner can keep saving its own instances in the same session:
+            session.expunge(result_item)
             for index, child_data in enumerate(result_item.children):
                 result_item.children[index] = get_result_with_children(**child_data)
+            if result_item.item_handler == "CollectionResult":
+                # Requests stored on change are missing from the cycles where they did not change, so their last stored
+                # result is shown instead:
+                request_ids = {child.request_id for child in result_item.children}
+                result_item.children += [get_result_with_children(item_handler="ModbusResponse", item_id=result_id)
+                                         for result_id, request_id in stored_results.get(result_item.request_id, [])
+                                         if request_id not in request_ids]
             # Sort items at each level based on 'position':
             result_item.children.sort(key=lambda x: x.timestamp)
             return result_item
 
-        execution_session = None
-        with self.session_scope() as session:
-
-            item = self._get_item(item_id)
-            response_class_handler = self.get_class_handler(item.item_response_handler)
-
-            # Step 1: Get max execution_session_id for this item
-            last_execution_session_id = (
-                session.query(func.max(response_class_handler.execution_session_id))
-                .filter(response_class_handler.request_id == item.item_id)
-                .first()
+        if not last_result:
+            return None
+
+        execution_session = session.get(ExecutionSession, last_result.execution_session_id)
+        if not execution_session:
+            return None
+
+        # Counters are filled per request: detach the session so other items of the unit of work do not share it
+        session.expunge(execution_session)
+        execution_session.iterations = last_result.iterations
+        execution_session.total_ok = last_result.total_ok
+        execution_session.total_failed = last_result.total_failed
+
+        # Last stored result of every request of the session, by the request ID of its parent collection:
+        stored_results = defaultdict(list)
+        if last_result.result_handler == "CollectionResult":
+            rows = (
+                session.query(ModbusResponse.item_id, ModbusResponse.request_id, CollectionResult.request_id)
+                    .join(LastResult, LastResult.result_id == ModbusResponse.item_id)
+                    .join(CollectionResult, CollectionResult.item_id == ModbusResponse.parent_id)
+                    .filter(LastResult.execution_session_id == execution_session.item_id,
+                            LastResult.result_handler == "ModbusResponse")
+                    .all()
             )
-            if not last_execution_session_id:
-                return None
-
-            # Step 2: Get all results linked to last execution id
-            results = (
-                session.query(response_class_handler)
-                .filter(response_class_handler.request_id == item.item_id)
-                .filter(response_class_handler.execution_session_id == last_execution_session_id[0])
-                .order_by(response_class_handler.timestamp.desc())
-                .all()
+            for result_id, request_id, collection_id in rows:
+                stored_results[collection_id].append((result_id, request_id))
+
+        # Resolve the possible nested results in collections:
+        if last_result.result_id:
+            execution_session.results = get_result_with_children(item_handler=last_result.result_handler,
+                                                                 item_id=last_result.result_id)
+
+        return execution_session
+
+    def update_item_last_results(self, last_results: list[LastResultRecord], session: Session = None):
+        """Upsert the last result snapshots updated by the runner in a single statement."""
+        self.save_records(last_results, session=session)
+
+    def delete_finished_last_results(self, request_ids: list[int], session: Session = None):
+        """Delete the last result snapshots of the requests in their finished execution sessions, except in the latest
+        session of each request, so only the snapshots of the running sessions and of the last one are kept."""
+        with self.session_scope(session) as session:
+            latest_result = aliased(LastResult)
+            latest_session_id = (
+                select(func.max(latest_result.execution_session_id))
+                    .where(latest_result.request_id == LastResult.request_id)
+                    .scalar_subquery()
+            )
+            finished_session_ids = select(ExecutionSession.item_id).where(ExecutionSession.result != "Running")
+            (
+                session.query(LastResult)
+                    .filter(LastResult.request_id.in_(request_ids),
+                            LastResult.execution_session_id.in_(finished_session_ids),
+                            LastResult.execution_session_id < latest_session_id)
+                    .delete(synchronize_session=False)
             )
 
-            if results:
-                last_result = results[0]
-
-                # Get item last execution session:
-                execution_session = (
-                    session.query(ExecutionSession)
-                    .filter(ExecutionSession.item_id == last_result.execution_session_id)
-                    .order_by(ExecutionSession.timestamp.desc())
-                    .first()
-                )
-
-                if execution_session:
-
-                    # Resolve the number of total results ok and ko:
-                    execution_session.iterations = len(results)
-                    for result in results:
-                        if result.item_handler == "CollectionResult":
-                            execution_session.total_ok += result.total_ok
-                            execution_session.total_failed += result.total_failed
-                        else:
-                            if result.result == "OK":
-                                execution_session.total_ok += 1
-                            elif result.result == "Failed":
-                                execution_session.total_failed += 1
+    def add_latency_histograms(self, execution_session_id: int, histograms: dict, session: Session = None):
+        """Store the latency histograms of a finished execution session, as returned by 'LatencyHistograms.to_dict'."""
+        with self.session_scope(session) as session:
+            scopes = [("session", None, None, histograms["session"])]
+            scopes += [("request", int(request_id), None, histogram) for request_id, histogram in histograms["requests"].items()]
+            scopes += [("connection", None, connection, histogram) for connection, histogram in histograms["connections"].items()]
+            for scope, request_id, connection, histogram in scopes:
+                session.add(LatencyHistogram(execution_session_id=execution_session_id,
+                                             scope=scope,
+                                             request_id=request_id,
+                                             connection=connection,
+                                             **histogram))
+
+    def get_item_latency_histograms(self, item_id: int, execution_session_id: int = None, session: Session = None) -> list[LatencyHistogram]:
+        """Get the stored latency histograms of a request, newest session first, or only those of the given session."""
+        with self.session_scope(session, read_only=True) as session:
+            query = session.query(LatencyHistogram).filter(LatencyHistogram.request_id == item_id)
+            if execution_session_id is not None:
+                query = query.filter(LatencyHistogram.execution_session_id == execution_session_id)
+            histograms = query.order_by(LatencyHistogram.execution_session_id.desc()).all()
+
+            for histogram in histograms:
+                session.expunge(histogram)
+
+            return histograms
+
+    @staticmethod
+    def validate_alarm_rule(rule: AlarmRule):
+        if rule.rule_type not in RULE_TYPES:
+            raise ValueError(f"Unknown alarm rule type: {rule.rule_type}")
+        if rule.operator not in OPERATORS:
+            raise ValueError(f"Unknown alarm operator: {rule.operator}")
+        if rule.severity not in SEVERITIES:
+            raise ValueError(f"Unknown alarm severity: {rule.severity}")
+        if rule.rule_type == "Range" and rule.low > rule.high:
+            raise ValueError("The low limit of the range is above the high limit")
+
+    def get_alarm_rules(self, request_ids: list[int], session: Session = None) -> list[AlarmRule]:
+        """Get the alarm rules of the requests and collections."""
+        with self.session_scope(session, read_only=True) as session:
+            rules = (
+                session.query(AlarmRule)
+                    .filter(AlarmRule.request_id.in_(request_ids))
+                    .order_by(AlarmRule.item_id)
+                    .all()
+            )
 
-                    # Resolve the possible nested results in collections:
-                    last_result = get_result_with_children(item_handler=last_result.item_handler,
-                                                           item_id=last_result.item_id)
-                    execution_session.results = last_result
+            for rule in rules:
+                session.expunge(rule)
 
-            return execution_session
+            return rules
 
-    def get_item_results_history(self, item_id: int) -> BaseResult:
-        with self.session_scope() as session:
+    def add_alarm_rule(self, item_id: int, session: Session = None, **kwargs) -> AlarmRule:
+        with self.session_scope(session) as session:
+            if session.get(Request, item_id) is None:
+                raise ValueError(f"Item {item_id} not found")
+            rule = AlarmRule(request_id=item_id, **kwargs)
+            self.validate_alarm_rule(rule)
+            session.add(rule)
+            session.flush()
+            return rule
 
-            item = self._get_item(item_id)
+    def update_alarm_rule(self, rule_id: int, session: Session = None, **kwargs) -> AlarmRule:
+        with self.session_scope(session) as session:
+            rule = session.get(AlarmRule, rule_id)
+            if rule is None:
+                raise ValueError(f"Alarm rule {rule_id} not found")
+            for key, value in kwargs.items():
+                if key not in ("item_id", "request_id"):
+                    setattr(rule, key, value)
+            self.validate_alarm_rule(rule)
+            session.flush()
+            return rule
+
+    def delete_alarm_rule(self, rule_id: int, session: Session = None):
+        with self.session_scope(session) as session:
+            rule = session.get(AlarmRule, rule_id)
+            if rule is None:
+                raise ValueError(f"Alarm rule {rule_id} not found")
+            session.delete(rule)
+
+    def get_item_alarm_events(self, item_id: int, execution_session_id: int = None, limit: int = 100,
+                              session: Session = None) -> list[AlarmEvent]:
+        """Get the last alarm events of a request, newest first, or only those of the given session."""
+        with self.session_scope(session, read_only=True) as session:
+            query = session.query(AlarmEvent).filter(AlarmEvent.request_id == item_id)
+            if execution_session_id is not None:
+                query = query.filter(AlarmEvent.execution_session_id == execution_session_id)
+            events = query.order_by(AlarmEvent.item_id.desc()).limit(limit).all()
+
+            for event in events:
+                session.expunge(event)
+
+            return events
+
+    def get_item_results_history(self, item_id: int, since_id: int = None, before_id: int = None, limit: int = 10,
+                                 session: Session = None) -> list[ExecutionSession]:
+        """Get the execution sessions of an item, newest first.
+
+        History is append-only, so it can be read by pages: 'since_id' returns the sessions from the given one onwards
+        (the newest one may be still running), and 'before_id' the older sessions than the given one.
+        """
+        with self.session_scope(session, read_only=True) as session:
+
+            item = self._get_item(item_id, session=session)
             response_class_handler = self.get_class_handler(item.item_response_handler)
 
             # Step 1: Get all distinct execution_session_ids for this item
-            execution_sessions = (
-                session.query(response_class_handler.execution_session_id)
-                .filter(response_class_handler.request_id == item.item_id)
+            execution_session_ids = (
+                select(response_class_handler.execution_session_id)
+                .where(response_class_handler.request_id == item.item_id)
                 .distinct()
-                .all()
             )
 
-            # Flatten the list of tuples to a list of IDs
-            execution_session_ids = [row[0] for row in execution_sessions]
-
-            # Step 2: Get the last 10 ExecutionSession entries for those session IDs
-            results_history = (
+            # Step 2: Get the requested page of ExecutionSession entries for those session IDs
+            query = (
                 session.query(ExecutionSession)
                 .filter(ExecutionSession.item_id.in_(execution_session_ids))
-                .order_by(ExecutionSession.timestamp.desc())
-                .limit(10)
-                .all()
             )
+            if since_id is not None:
+                query = query.filter(ExecutionSession.item_id >= since_id)
+            if before_id is not None:
+                query = query.filter(ExecutionSession.item_id < before_id)
+            query = query.order_by(ExecutionSession.item_id.desc())
+            if limit is not None:
+                query = query.limit(limit)
+            results_history = query.all()
 
             if results_history is None:
                 results_history = []
 
+            for execution_session in results_history:
+                session.expunge(execution_session)
+
             return results_history
 
-    def get_items_request_tree(self, item: BaseItem = None) -> list[Collection]:
+    def get_item_trend(self, item_id: int, time_from: datetime = None, time_to: datetime = None, since_id: int = None,
+                       points: int = None, method: str = "lttb", session: Session = None) -> dict:
+        """Get the decoded register values of the OK responses of a request over time, by address.
+
+        Values are downsampled to the given number of points per series, so the size of the window does not matter.
+        Timestamps are returned in milliseconds since epoch, along with the last response id for live appends.
+        """
+        with self.session_scope(session, read_only=True) as session:
+            # Min/max buckets of a window are aggregated in SQL, without reading the raw responses:
+            if method == "minmax" and points and time_from is not None and since_id is None:
+                window_end = time_to or datetime.now(time_from.tzinfo)
+                bucket = max(1, math.ceil((window_end - time_from).total_seconds() / max(1, points // 2)))
+                item_series = self.get_item_series(item_id, time_from, time_to, bucket, ["min", "max"], session=session)
+                series = {
+                    label: [point for bucket_values in label_series for point in
+                            [(bucket_values["timestamp"], bucket_values["min"]),
+                             (bucket_values["timestamp"] + bucket * 500, bucket_values["max"])]]
+                    for label, label_series in item_series["values"].items()
+                }
+                last_id = (
+                    session.query(func.max(ModbusResponse.item_id))
+                        .filter(ModbusResponse.request_id == item_id)
+                        .scalar()
+                )
+                return {"series": series, "last_id": last_id}
+
+            query = (
+                session.query(ModbusResponse.item_id,
+                              ModbusResponse.timestamp,
+                              ModbusResponse.data_type,
+                              ModbusResponse.address,
+                              ModbusResponse.registers)
+                    .filter(ModbusResponse.request_id == item_id)
+                    .filter(ModbusResponse.result == "OK")
+            )
+            timestamp_ms = literal_column(TIMESTAMP_MS_SQL.format(column="modbus_response.timestamp"))
+            if time_from is not None:
+                query = query.filter(timestamp_ms >= to_timestamp_ms(time_from))
+            if time_to is not None:
+                query = query.filter(timestamp_ms <= to_timestamp_ms(time_to))
+            if since_id is not None:
+                query = query.filter(ModbusResponse.item_id > since_id)
+            rows = query.order_by(ModbusResponse.item_id).all()
+
+            series = defaultdict(list)
+            for _, timestamp, data_type, address, registers in rows:
+                timestamp = datetime.fromisoformat(str(timestamp)).timestamp() * 1000
+                values = CustomModbusHandler.convert_value_after_receiving(data_type, address or 0, registers)
+                for label, value in values.items():
+                    series[label].append((timestamp, value))
+
+            if points:
+                downsample = DOWNSAMPLING_METHODS[method]
+                for label, label_points in series.items():
+                    series[label] = downsample(label_points, points)
+
+            return {"series": dict(series), "last_id": rows[-1].item_id if rows else since_id}
+
+    def get_item_series(self, item_id: int, time_from: datetime = None, time_to: datetime = None, bucket: int = 60,
+                        aggregations: list[str] = None, session: Session = None) -> dict:
+        """Aggregate the results of a request in time buckets of the given seconds.
+
+        Elapsed times and the fail rate are aggregated over all the responses, and the decoded register values, by
+        address, over the OK ones. Aggregations are solved in SQL; only the data types that SQLite cannot decode
+        (floating point) are aggregated in a single pass over the raw registers.
+        """
+        aggregations = aggregations or list(SERIES_AGGREGATIONS)
+        unknown_aggregations = set(aggregations) - set(SERIES_AGGREGATIONS)
+        if unknown_aggregations:
+            raise ValueError(f"Unknown aggregations: {', '.join(sorted(unknown_aggregations))}")
+        if bucket <= 0:
+            raise ValueError("Bucket must be a positive number of seconds")
+
+        with self.session_scope(session, read_only=True) as session:
+            item = self._get_item(item_id, session=session)
+            response_table = self.get_class_handler(item.item_response_handler).__tablename__
+
+            filters = "request_id = :item_id"
+            parameters = {"item_id": item_id, "bucket": bucket}
+            if time_from is not None:
+                filters += f" AND {TIMESTAMP_MS_SQL.format(column='timestamp')} >= :time_from"
+                parameters["time_from"] = to_timestamp_ms(time_from)
+            if time_to is not None:
+                filters += f" AND {TIMESTAMP_MS_SQL.format(column='timestamp')} <= :time_to"
+                parameters["time_to"] = to_timestamp_ms(time_to)
+            bucket_column = "CAST(strftime('%s', timestamp) AS INTEGER) / :bucket * :bucket"
+
+            def to_series_point(row) -> dict:
+                point = {"timestamp": row.bucket * 1000}
+                point.update({aggregation: getattr(row, aggregation) for aggregation in aggregations
+                              if aggregation in row._fields})
+                return point
+
+            # Step 1: elapsed time and fail rate of all the responses
+            rows = session.execute(text(f"""
+                SELECT {bucket_column} AS bucket,
+                       MIN(CAST(elapsed_time AS REAL)) AS min,
+                       MAX(CAST(elapsed_time AS REAL)) AS max,
+                       AVG(CAST(elapsed_time AS REAL)) AS avg,
+                       COUNT(*) AS count,
+                       AVG(CASE WHEN result = 'OK' THEN 0.0 ELSE 1.0 END) AS fail_rate
+                FROM {response_table}
+                WHERE {filters}
+                GROUP BY bucket
+                ORDER BY bucket
+            """), parameters).all()
+            series = {"bucket": bucket, "elapsed_time": [to_series_point(row) for row in rows], "values": {}}
+
+            if item.item_response_handler != "ModbusResponse":
+                return series
+
+            # Step 2: decoded register values of the OK responses, with the data type of the request
+            size, _ = NUMERIC_DATA_TYPES.get(item.data_type, (None, None))
+            if size is None:
+                return series
+            filters += " AND result = 'OK' AND data_type = :data_type"
+            parameters["data_type"] = item.data_type
+
+            def get_label(address: int) -> str:
+                return f"{address}" if size == 1 else f"{address}-{address + size - 1}"
+
+            value_column = REGISTER_VALUE_SQL.get(item.data_type)
+            if value_column:
+                rows = session.execute(text(f"""
+                    SELECT {bucket_column} AS bucket,
+                           COALESCE(address, 0) + register.key AS value_address,
+                           MIN({value_column}) AS min,
+                           MAX({value_column}) AS max,
+                           AVG({value_column}) AS avg,
+                           COUNT(*) AS count
+                    FROM {response_table}, json_each({response_table}.registers) AS register
+                    WHERE {filters} AND register.key % {size} = 0
+                        AND register.key + {size} <= json_array_length({response_table}.registers)
+                    GROUP BY bucket, value_address
+                    ORDER BY bucket
+                """), parameters).all()
+                for row in rows:
+                    series["values"].setdefault(get_label(row.value_address), []).append(to_series_point(row))
+            else:
+                rows = session.execute(text(f"""
+                    SELECT {bucket_column} AS bucket, address, registers
+                    FROM {response_table}
+                    WHERE {filters}
+                    ORDER BY bucket
+                """), parameters).all()
+                buckets = {}
+                for row in rows:
+                    values = CustomModbusHandler.convert_value_after_receiving(item.data_type, row.address or 0, row.registers and json.loads(row.registers))
+                    for label, value in values.items():
+                        buckets.setdefault((label, row.bucket), []).append(value)
+                for (label, bucket_start), values in buckets.items():
+                    point = {"timestamp": bucket_start * 1000, "min": min(values), "max": max(values),
+                             "avg": sum(values) / len(values), "count": len(values)}
+                    series["values"].setdefault(label, []).append(
+                        {key: value for key, value in point.items() if key == "timestamp" or key in aggregations}
+                    )
+
+            return series
+
+    def get_items_children(self, parent_id: int = None, offset: int = 0, limit: int = None, session: Session = None) -> dict:
+        """Get one page of the direct children of an item, or of the root level, without solving their relationships.
+
+        Only the structure is returned (id, name, handler, position and whether the item has children), so the tree
+        can be loaded lazily level by level.
+        """
+        with self.session_scope(session, read_only=True) as session:
+            # Siblings are split in one table per request handler:
+            request_class_handlers = BaseRequest.__subclasses__()
+
+            children_query = union_all(*[
+                select(request_class_handler.item_id,
+                       request_class_handler.name,
+                       request_class_handler.item_handler,
+                       request_class_handler.parent_id,
+                       request_class_handler.position)
+                    .where(request_class_handler.parent_id == parent_id)
+                for request_class_handler in request_class_handlers
+            ]).subquery()
+
+            query = (
+                select(children_query)
+                    .order_by(func.coalesce(children_query.c.position, 0), children_query.c.item_id)
+                    .offset(offset)
+            )
+            if limit is not None:
+                # Ask for one more row to know if there are more pages:
+                query = query.limit(limit + 1)
+            rows = session.execute(query).all()
+
+            has_more = limit is not None and len(rows) > limit
+            if has_more:
+                rows = rows[:limit]
+
+            # Resolve which collections of the page have children, with one query per request table:
+            collection_ids = [row.item_id for row in rows if row.item_handler == "Collection"]
+            parent_ids = set()
+            if collection_ids:
+                for request_class_handler in request_class_handlers:
+                    parent_ids.update(
+                        session.scalars(
+                            select(request_class_handler.parent_id)
+                                .where(request_class_handler.parent_id.in_(collection_ids))
+                                .distinct()
+                        )
+                    )
+
+            children = [
+                {
+                    "item_id": row.item_id,
+                    "name": row.name,
+                    "item_handler": row.item_handler,
+                    "parent_id": row.parent_id,
+                    "position": row.position,
+                    "has_children": row.item_id in parent_ids,
+                }
+                for row in rows
+            ]
+            return {"children": children, "has_more": has_more}
+
+    def get_items_request_tree(self, item: BaseItem = None, session: Session = None) -> list[Collection]:
         def get_item_with_children(item_id):
-            _item = self.get_item_request(item_id=item_id)
+            _item = self.get_item_request(item_id=item_id, session=session)
             # Replace item dict by dataclass:
             for _index, _child_id in enumerate(_item.children):
                 _item.children[_index] = get_item_with_children(_child_id)
@@ -339,7 +993,7 @@ class SQLiteRepository(BaseRepository):
             _item.children.sort(key=lambda x: x.position or 0)
             return _item
 
-        with self.session_scope() as session:
+        with self.session_scope(session, read_only=True) as session:
             if item:
                 items = [item]
             else:
@@ -357,18 +1011,55 @@ class SQLiteRepository(BaseRepository):
 
             return items
 
-    def get_item_request(self, item_id: int):
-        with self.session_scope() as session:
-            request = self._get_item_request(item_id)
+    def search_items(self, pattern: str, session: Session = None) -> dict:
+        """Find the requests and collections whose name matches a regular expression, ignoring case, and the collections
+        that contain them, so a lazily loaded tree can load the branches of the matches before filtering them.
+        """
+        try:
+            regular_expression = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern: {e}")
+
+        with self.session_scope(session, read_only=True) as session:
+            # Siblings are split in one table per request handler:
+            items_query = union_all(*[
+                select(request_class_handler.item_id, request_class_handler.parent_id, request_class_handler.name)
+                for request_class_handler in BaseRequest.__subclasses__()
+            ])
+            parent_ids = {}
+            item_ids = []
+            for item_id, parent_id, name in session.execute(items_query):
+                parent_ids[item_id] = parent_id
+                if regular_expression.search(name or ""):
+                    item_ids.append(item_id)
+
+            ancestor_ids = set()
+            for item_id in item_ids:
+                parent_id = parent_ids.get(item_id)
+                while parent_id is not None and parent_id not in ancestor_ids:
+                    ancestor_ids.add(parent_id)
+                    parent_id = parent_ids.get(parent_id)
+            return {"item_ids": sorted(item_ids), "ancestor_ids": sorted(ancestor_ids)}
+
+    def find_items_request(self, name: str, session: Session = None) -> list[dict]:
+        """Find the requests and collections with the given name."""
+        with self.session_scope(session, read_only=True) as session:
+            items = session.query(Request).filter(Request.name == name).order_by(Request.item_id).all()
+            return [{"item_id": item.item_id, "name": item.name, "item_handler": item.request_type_handler}
+                    for item in items]
+
+    def get_item_request(self, item_id: int, session: Session = None):
+        with self.session_scope(session, read_only=True) as session:
+            request = self._get_item_request(item_id, session=session)
 
             # Solve relationships:
-            item_client = self._get_item_client(request)
+            item_client = self._get_item_client(request, session=session)
             request.client = item_client
-            item_run_options = self._get_item_run_options(request)
+            item_run_options = self._get_item_run_options(request, session=session)
             request.run_options = item_run_options
-            item_last_result = self.get_item_last_result_tree(item_id)
+            item_last_result = self.get_item_last_result_tree(item_id, session=session)
             request.last_result = item_last_result
-            item_results_history = self.get_item_results_history(item_id)
+            item_results_history = self.get_item_results_history(item_id, session=session)
             request.results_history = item_results_history
 
             # Solve children:
@@ -393,9 +1084,9 @@ class SQLiteRepository(BaseRepository):
 
             return request
 
-    def _get_item_result(self, item_handler: str, item_id: int):
-        with self.session_scope() as session:
-            result = self._get_item_from_handler(item_handler=item_handler, item_id=item_id)
+    def _get_item_result(self, item_handler: str, item_id: int, session: Session = None):
+        with self.session_scope(session, read_only=True) as session:
+            result = self._get_item_from_handler(item_handler=item_handler, item_id=item_id, session=session)
 
             # Solve children:
             if result.item_handler == "CollectionResult":
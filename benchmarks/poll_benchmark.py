@@ -0,0 +1,193 @@
+# benchmarks/poll_benchmark.py
+"""Cost of the results of a poll in the runner, with the previous ORM results and with the result records, as JSON.
+
+Every poll builds the response of a request, as the Modbus handler does, and stores it with the execution session in a
+unit of work, against a temporary database. The 'orm' path builds a 'ModbusResponse' from a copy of the request, as the
+runner did before the records; the 'records' path builds a 'ModbusResponseRecord' from the cached request fields. Build
+and store times are measured per poll, and the memory of a built result and the allocations of a whole poll without the
+database.
+
+Usage: python -m benchmarks.poll_benchmark [--polls N] [--registers N] [--output results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from datetime import datetime
+
+import tzlocal
+from sqlalchemy import inspect
+
+from backend.core.result_records import ExecutionSessionRecord, ModbusResponseRecord, now
+from backend.models.execution_session import ExecutionSession
+from backend.models.modbus import ModbusResponse
+
+
+def get_statistics(values: list[float]) -> dict:
+    return {
+        "polls": len(values),
+        "mean_us": statistics.mean(values) * 1e6,
+        "median_us": statistics.median(values) * 1e6,
+    }
+
+
+def fill_response(response, fields: dict, registers: list):
+    """Attributes set by the Modbus handler on an answered request."""
+    response.slave = fields["slave"]
+    response.transaction_id = 1
+    response.protocol_id = 0
+    response.function_code = 3
+    response.address = fields["address"]
+    response.registers = registers
+    response.byte_count = len(registers) * 2
+    response.raw_packet_send = "00 01 00 00 00 06 01 03 00 00 00 0A"
+    response.raw_packet_recv = "00 01 00 00 00 17 01 03 14" + " 00 00" * len(registers)
+    response.elapsed_time = 0.001
+    response.result = "OK"
+
+
+class OrmPath:
+    """Results as the runner built them before the records."""
+
+    def __init__(self, repository, item):
+        self.repository = repository
+        self.item = item
+        self.execution_session = repository.add_item_from_dataclass(
+            ExecutionSession(name=item.name, request_id=item.item_id, timestamp=datetime.now(tzlocal.get_localzone())))
+
+    def build(self, registers: list):
+        fields = asdict(self.item)
+        response = ModbusResponse(name=fields["name"],
+                                  client_type="Modbus TCP",
+                                  request_id=fields["item_id"],
+                                  parent_id=None,
+                                  execution_session_id=self.execution_session.item_id,
+                                  result="Pending",
+                                  timestamp=datetime.now(tzlocal.get_localzone()),
+                                  elapsed_time=0,
+                                  error_message="")
+        fill_response(response, fields, registers)
+        self.execution_session.elapsed_time = (datetime.now(tzlocal.get_localzone()) -
+                                               self.execution_session.timestamp).total_seconds()
+        return response
+
+    def store(self, response):
+        with self.repository.unit_of_work():
+            for queued_item in (self.execution_session, response):
+                self.repository.add_item_from_dataclass(item=queued_item)
+
+
+class RecordsPath:
+    """Results as the runner builds them now."""
+
+    def __init__(self, repository, item):
+        self.repository = repository
+        self.item = item
+        self.fields = None
+        self.execution_session = ExecutionSessionRecord(name=item.name, request_id=item.item_id, timestamp=now())
+        repository.save_records([self.execution_session])
+
+    def build(self, registers: list):
+        if self.fields is None:
+            self.fields = {attribute.key: getattr(self.item, attribute.key)
+                           for attribute in inspect(self.item).mapper.column_attrs}
+        fields = self.fields
+        response = ModbusResponseRecord(name=fields["name"],
+                                        client_type="Modbus TCP",
+                                        request_id=fields["item_id"],
+                                        parent_id=None,
+                                        execution_session_id=self.execution_session.item_id,
+                                        result="Pending")
+        fill_response(response, fields, registers)
+        self.execution_session.elapsed_time = (now() - self.execution_session.timestamp).total_seconds()
+        return response
+
+    def store(self, response):
+        with self.repository.unit_of_work():
+            self.repository.save_records([self.execution_session, response])
+
+
+def measure_path(path, polls: int, registers: list) -> dict:
+    build_times = []
+    store_times = []
+    for _ in range(polls):
+        start_time = time.perf_counter()
+        response = path.build(registers)
+        build_times.append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        path.store(response)
+        store_times.append(time.perf_counter() - start_time)
+
+    # Memory kept by the built results, as the results of a collection are kept until the end of its cycle:
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    responses = [path.build(registers) for _ in range(polls)]
+    result_bytes = (tracemalloc.get_traced_memory()[0] - start_memory) / len(responses)
+    del responses
+
+    # Allocations of a poll, as the memory snapshots of the blocks allocated and not freed, without the database:
+    allocated_blocks = []
+    allocated_bytes = []
+    for _ in range(min(polls, 100)):
+        snapshot = tracemalloc.take_snapshot()
+        response = path.build(registers)
+        statistics_diff = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+        allocated_blocks.append(sum(stat.count_diff for stat in statistics_diff if stat.count_diff > 0))
+        allocated_bytes.append(sum(stat.size_diff for stat in statistics_diff if stat.size_diff > 0))
+        del response
+    tracemalloc.stop()
+
+    return {
+        "build": get_statistics(build_times),
+        "store": get_statistics(store_times),
+        "total_median_us": (statistics.median(build_times) + statistics.median(store_times)) * 1e6,
+        "result_bytes": result_bytes,
+        "build_allocated_blocks": statistics.median(allocated_blocks),
+        "build_allocated_bytes": statistics.median(allocated_bytes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of the results of a poll in the runner.")
+    parser.add_argument("--polls", type=int, default=2000, help="Polls of every path.")
+    parser.add_argument("--registers", type=int, default=10, help="Registers of every response.")
+    parser.add_argument("--output", default=None, help="Write the results to a JSON file instead of stdout.")
+    args = parser.parse_args()
+
+    import start
+    from backend.repository.sqlite_repository import SQLiteRepository
+
+    registers = list(range(args.registers))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        start.run_alembic_migrations(database_url)
+        repository = SQLiteRepository(database_url)
+        request_id = repository.create_item_request_from_handler(item_name="Request", item_handler="ModbusRequest").item_id
+        item = repository.get_item_request(request_id)
+
+        for name, path_class in (("orm", OrmPath), ("records", RecordsPath)):
+            results[name] = measure_path(path_class(repository, item), args.polls, registers)
+        repository.engine.dispose()
+
+    results = {
+        "python": sys.version.split()[0],
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        **results,
+        "speedup": results["orm"]["total_median_us"] / results["records"]["total_median_us"],
+    }
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
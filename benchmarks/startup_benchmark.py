@@ -0,0 +1,101 @@
+# benchmarks/startup_benchmark.py
+"""Startup time of the launcher, the schema check and the backend process, in seconds, as JSON.
+
+Usage: python -m benchmarks.startup_benchmark [--runs N] [--output results.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import PROJECT_PATH, find_free_port
+
+
+def get_statistics(values: list[float]) -> dict:
+    return {
+        "runs": len(values),
+        "min": min(values),
+        "median": statistics.median(values),
+        "max": max(values),
+    }
+
+
+def measure_import(module: str, runs: int) -> dict:
+    """Time to start a new interpreter and import the module."""
+    values = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=PROJECT_PATH, check=True)
+        values.append(time.perf_counter() - start_time)
+    return get_statistics(values)
+
+
+def measure_schema_check(database_file: str, runs: int) -> dict:
+    import start
+
+    values = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        assert start.get_database_revision(database_file) == start.get_head_revision()
+        values.append(time.perf_counter() - start_time)
+    return get_statistics(values)
+
+
+def measure_backend_ready(database_url: str, runs: int) -> dict:
+    """Time from spawning the backend process until it signals that it is listening."""
+    import start
+
+    context = multiprocessing.get_context("spawn")
+    values = []
+    for _ in range(runs):
+        ready_connection, backend_ready_connection = context.Pipe(duplex=False)
+        start_time = time.perf_counter()
+        process = context.Process(target=start.run_backend,
+                                  args=("127.0.0.1", find_free_port(), database_url, backend_ready_connection))
+        process.start()
+        backend_ready_connection.close()
+        ready = ready_connection.poll(start.BACKEND_READY_TIMEOUT) and ready_connection.recv()
+        values.append(time.perf_counter() - start_time)
+        process.terminate()
+        process.join()
+        if not ready:
+            raise RuntimeError("Backend did not start")
+    return get_statistics(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs of every measurement.")
+    parser.add_argument("--output", default=None, help="Write the results to a JSON file instead of stdout.")
+    args = parser.parse_args()
+
+    import start
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_file = os.path.join(directory, "benchmark.db")
+        database_url = f"sqlite:///{database_file}"
+        start.run_alembic_migrations(database_url)
+
+        results = {
+            "python": sys.version.split()[0],
+            "launcher_import": measure_import("start", args.runs),
+            "backend_import": measure_import("backend.main", args.runs),
+            "schema_check": measure_schema_check(database_file, args.runs),
+            "backend_ready": measure_backend_ready(database_url, args.runs),
+        }
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# benchmarks/throughput_benchmark.py
+"""End-to-end throughput of the runners, as JSON.
+
+Starts the backend against a temporary database and the Modbus simulator, creates a project through the API with a
+collection per device, nested collections and requests, runs all the devices and measures the polls and database rows
+per second, the request latency, the latency of the last result tree endpoint under load and the memory of the backend
+processes over time.
+
+Usage: python -m benchmarks.throughput_benchmark [--devices N] [--requests N] [--depth N] [--workers N]
+                                                 [--duration SECONDS] [--output results.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from backend.core.latency_histogram import LatencyHistogram
+from config import find_free_port
+
+
+RESULT_TABLES = ("modbus_response", "collection_result", "execution_session", "latency_histogram")
+
+
+def run_backend(host: str, port: int, database_url: str, workers: int, ready_connection):
+    from backend import main as backend_main
+
+    backend_main.run(debug=False, database_url=database_url, host=host, port=port, ready_connection=ready_connection,
+                     runner_workers=workers)
+
+
+def start_backend(database_url: str, workers: int) -> tuple:
+    import start
+
+    context = multiprocessing.get_context("spawn")
+    port = find_free_port(start_port=15000)
+    ready_connection, backend_ready_connection = context.Pipe(duplex=False)
+    process = context.Process(target=run_backend,
+                              args=("127.0.0.1", port, database_url, workers, backend_ready_connection))
+    process.start()
+    backend_ready_connection.close()
+    if not (ready_connection.poll(start.BACKEND_READY_TIMEOUT) and ready_connection.recv()):
+        process.terminate()
+        raise RuntimeError("Backend did not start")
+    return process, f"http://127.0.0.1:{port}"
+
+
+def get_simulator_config(devices: int, registers: int, latency: float) -> dict:
+    ports = []
+    for _ in range(devices):
+        ports.append(find_free_port(start_port=(ports[-1] + 1) if ports else 16000))
+    return {
+        "host": "127.0.0.1",
+        "devices": [{"name": f"device-{index}",
+                     "port": port,
+                     "latency": {"distribution": "constant", "value": latency},
+                     "registers": {"holding_registers": {"size": registers,
+                                                         "generators": [{"type": "counter", "count": registers}]}}}
+                    for index, port in enumerate(ports)],
+    }
+
+
+class Api:
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def call(self, method: str, endpoint: str, data: dict = None):
+        response = self.session.request(method, f"{self.base_url}/{endpoint}", json=data)
+        response.raise_for_status()
+        return response.json()
+
+    def create_item(self, name: str, item_handler: str, parent_id: int = None, **kwargs) -> int:
+        item_id = self.call("POST", "items/request", {"item_name": name, "item_handler": item_handler,
+                                                      "parent_item_id": parent_id})["item_id"]
+        self.call("POST", "items/run_options", {"item_name": name, "item_handler": "RunOptions",
+                                                "parent_item_id": item_id})
+        if kwargs:
+            self.call("PUT", f"items/{item_id}", {"item_handler": item_handler, "kwargs": kwargs})
+        return item_id
+
+
+def create_project(api: Api, simulator_config: dict, requests_per_device: int, depth: int, registers: int) -> list[int]:
+    """Create a continuously polled collection per device, with the requests nested in 'depth' collections."""
+    device_items = []
+    for device in simulator_config["devices"]:
+        device_id = api.create_item(device["name"], "Collection")
+        client_id = api.call("POST", "items/client", {"item_name": device["name"], "item_handler": "ModbusTcpClient",
+                                                      "parent_item_id": device_id})["item_id"]
+        api.call("PUT", f"items/{client_id}", {"item_handler": "ModbusTcpClient",
+                                               "kwargs": {"host": simulator_config["host"], "port": device["port"],
+                                                          "timeout": 1, "retries": 0}})
+        api.call("PUT", f"items/{device_id}", {"item_handler": "Collection", "kwargs": {"client_type": "Modbus TCP"}})
+        run_options_id = api.call("GET", f"items/{device_id}/request")["run_options"]["item_id"]
+        api.call("PUT", f"items/{run_options_id}", {"item_handler": "RunOptions",
+                                                    "kwargs": {"continuous_monitoring": True, "polling_interval": 0}})
+
+        parent_id = device_id
+        for level in range(depth):
+            parent_id = api.create_item(f"Level {level + 1}", "Collection", parent_id, client_type="Inherit from parent")
+        for index in range(requests_per_device):
+            api.create_item(f"Request {index + 1}", "ModbusRequest", parent_id, slave=1,
+                            address=index % registers, count=min(10, registers - index % registers))
+        device_items.append(device_id)
+    return device_items
+
+
+def count_rows(database_file: str) -> dict:
+    with sqlite3.connect(f"file:{database_file}?mode=ro", uri=True) as connection:
+        return {table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in RESULT_TABLES}
+
+
+def get_rss(pid: int) -> int | None:
+    """Resident memory in bytes of a process and its children. Only available on Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        children = []
+        for thread_id in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{thread_id}/children") as f:
+                children += [int(child) for child in f.read().split()]
+    except (OSError, StopIteration):
+        return None
+    return rss + sum(get_rss(child) or 0 for child in children)
+
+
+def get_latency_statistics(histogram: LatencyHistogram) -> dict:
+    """Latency statistics in milliseconds."""
+    if not histogram.count:
+        return {"count": 0}
+    return {
+        "count": histogram.count,
+        "p50_ms": histogram.get_percentile(50) / 1e6,
+        "p99_ms": histogram.get_percentile(99) / 1e6,
+        "max_ms": histogram.max / 1e6,
+    }
+
+
+class Sampler(threading.Thread):
+    """Run a function every interval until it is stopped."""
+
+    def __init__(self, function, interval: float):
+        super().__init__(daemon=True)
+        self.function = function
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.function()
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+def get_session_latency(api: Api) -> LatencyHistogram:
+    """Request latency of all the running sessions, merged."""
+    latency = LatencyHistogram()
+    for histograms in api.call("GET", "runner/latency")["latency"].values():
+        latency.merge(LatencyHistogram.from_dict(histograms["session"]))
+    return latency
+
+
+def measure(api: Api, backend_pid: int, database_file: str, device_items: list[int], duration: float,
+            api_interval: float) -> dict:
+    api_latency = LatencyHistogram()
+    rss = []
+    start_time = time.perf_counter()
+
+    def get_last_result_tree():
+        item_id = device_items[api_latency.count % len(device_items)]
+        request_start = time.perf_counter_ns()
+        api.call("GET", f"items/{item_id}/last_result_tree")
+        api_latency.record(time.perf_counter_ns() - request_start)
+
+    def sample_rss():
+        rss.append({"time": round(time.perf_counter() - start_time, 3), "rss_bytes": get_rss(backend_pid)})
+
+    # The session histograms count the polls since the runs started, so the window is their difference:
+    rows_start = count_rows(database_file)
+    latency_start = get_session_latency(api)
+    samplers = [Sampler(get_last_result_tree, api_interval), Sampler(sample_rss, 1)]
+    [sampler.start() for sampler in samplers]
+    time.sleep(duration)
+    [sampler.stop() for sampler in samplers]
+    rows_end = count_rows(database_file)
+    elapsed_time = time.perf_counter() - start_time
+
+    request_latency = get_session_latency(api)
+    request_latency.subtract(latency_start)
+
+    rows = {table: rows_end[table] - rows_start[table] for table in RESULT_TABLES}
+    return {
+        "elapsed_time": elapsed_time,
+        "polls_per_second": rows["modbus_response"] / elapsed_time,
+        "db_rows_per_second": sum(rows.values()) / elapsed_time,
+        "rows": rows,
+        "request_latency": get_latency_statistics(request_latency),
+        "api_last_result_tree_latency": get_latency_statistics(api_latency),
+        "rss": rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark.")
+    parser.add_argument("--devices", type=int, default=4, help="Simulated devices, each polled by its own collection.")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per device.")
+    parser.add_argument("--depth", type=int, default=1, help="Nested collections between a device and its requests.")
+    parser.add_argument("--registers", type=int, default=100, help="Holding registers of every device.")
+    parser.add_argument("--device-latency", type=float, default=0.001, help="Response delay of the devices, in seconds.")
+    parser.add_argument("--workers", type=int, default=0, help="Runner worker processes. 0 runs the items in threads.")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of running before measuring.")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of measurement.")
+    parser.add_argument("--api-interval", type=float, default=0.1, help="Seconds between last result tree requests.")
+    parser.add_argument("--output", default=None, help="Write the results to a JSON file instead of stdout.")
+    args = parser.parse_args()
+
+    import start
+    from servers.simulator import SimulatorThread
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_file = os.path.join(directory, "benchmark.db")
+        database_url = f"sqlite:///{database_file}"
+        start.run_alembic_migrations(database_url)
+
+        simulator_config = get_simulator_config(args.devices, args.registers, args.device_latency)
+        simulator = SimulatorThread(simulator_config)
+        simulator.start()
+        backend_process, base_url = start_backend(database_url, args.workers)
+        try:
+            api = Api(base_url)
+            device_items = create_project(api, simulator_config, args.requests, args.depth, args.registers)
+            for item_id in device_items:
+                api.call("PUT", f"runner/start/{item_id}")
+            time.sleep(args.warmup)
+
+            results = measure(api, backend_process.pid, database_file, device_items, args.duration, args.api_interval)
+            api.call("PUT", "runner/stop/0")
+        finally:
+            backend_process.terminate()
+            backend_process.join()
+            simulator.stop()
+
+    results = {
+        "python": sys.version.split()[0],
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        **results,
+    }
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# cli.py
+import argparse
+import json
+import os
+import sys
+
+from config import load_app_config, SQLALCHEMY_URL
+from utils.logger import setup_logging, get_logger
+
+
+logger = get_logger("cli")
+
+
+def result_to_dict(result) -> dict:
+    """Stored columns of a result. Relationships as parent and children are skipped."""
+    return result.to_values()
+
+
+def write_result(result, output: str, stream):
+    if output == "jsonl":
+        stream.write(json.dumps(result_to_dict(result), default=str) + "\n")
+    else:
+        stream.write(f"{result.timestamp}  {result.name}  {result.result}  {float(result.elapsed_time) * 1000:.2f} ms"
+                     + (f"  {result.error_message}" if result.result != "OK" and result.error_message else "") + "\n")
+    stream.flush()
+
+
+def resolve_item_id(repository, item: str) -> int:
+    if item.isdigit():
+        return int(item)
+
+    with repository.unit_of_work():
+        items = repository.find_items_request(item)
+    if not items:
+        raise ValueError(f"Item '{item}' not found")
+    if len(items) > 1:
+        raise ValueError(f"Item name '{item}' is ambiguous, use one of the IDs: {[found['item_id'] for found in items]}")
+    return items[0]["item_id"]
+
+
+def run_item(args) -> int:
+    # Imported here, so parsing the arguments does not load the database and protocol layers:
+    from backend.core.runner import Runner
+    from backend.repository.sqlite_repository import SQLiteRepository
+
+    database_file = args.db.removeprefix("sqlite:///")
+    if not os.path.exists(database_file):
+        logger.error("Database not found: %s. Run 'python start.py --test' to create it.", database_file)
+        return 2
+
+    repository = SQLiteRepository(database_url=args.db)
+    try:
+        item_id = resolve_item_id(repository, args.item)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 2
+
+    stream = open(args.file, "a", encoding="utf-8") if args.file else sys.stdout
+    try:
+        runner = Runner(repository=repository,
+                        item_id=item_id,
+                        iterations=args.iterations,
+                        result_callback=lambda result: write_result(result, args.output, stream),
+                        daemon=True)
+        runner.start()
+        try:
+            # Joined with a timeout, so Ctrl+C stops the runner gracefully and the session is finished:
+            while runner.is_alive():
+                runner.join(0.5)
+        except KeyboardInterrupt:
+            logger.warning("Stopping...")
+            runner.stop()
+            runner.join()
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    execution_session = runner.execution_session
+    if execution_session is None:
+        return 1
+    logger.info("Execution session %s finished: %s (%s OK, %s failed)", execution_session.item_id,
+                execution_session.result, execution_session.total_ok, execution_session.total_failed)
+    return 0 if execution_session.total_failed == 0 else 1
+
+
+def parse_args(argv: list = None):
+    parser = argparse.ArgumentParser(prog="commsman", description="Run Commsman items without the GUI and the API.")
+    parser.add_argument("--db", help="Database URL.", default=SQLALCHEMY_URL)
+    parser.add_argument("--log-level", help="Log level of the messages written to stderr.", default="WARNING")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a request or a collection and stream its results.")
+    run_parser.add_argument("item", help="ID or name of the request or collection.")
+    run_parser.add_argument("--iterations", type=int, default=None,
+                            help="Number of cycles. By default, the run options of the item are used.")
+    run_parser.add_argument("--output", choices=["text", "jsonl"], default="text", help="Results format.")
+    run_parser.add_argument("--file", default=None, help="Append the results to a file instead of stdout.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    args = parse_args(argv)
+    config = load_app_config(find_port=False)
+    setup_logging("cli", level=args.log_level, levels=config.get("logging", {}).get("levels"))
+
+    if args.command == "run":
+        return run_item(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QVBoxLayout, QHeaderView
+
+from frontend.base_detail_widget import BaseRequest
+from frontend.components.components import CustomComboBox
+
+
+RULE_TYPES = ["Threshold", "Range", "Rate of change", "Expected value"]
+OPERATORS = [">", ">=", "<", "<="]
+SEVERITIES = ["Warning", "Critical"]
+
+
+class AlarmsTabWidget(BaseRequest):
+    """Alarm rules of a request or collection. The rules of a collection apply to all the requests below it."""
+
+    # Column, header and, for the combo box columns, the options:
+    columns = [
+        ("name", "Name", None),
+        ("rule_type", "Type", RULE_TYPES),
+        ("address", "Address", None),
+        ("operator", "Operator", OPERATORS),
+        ("limit", "Limit", None),
+        ("low", "Low", None),
+        ("high", "High", None),
+        ("tolerance", "Tolerance", None),
+        ("hysteresis", "Hysteresis", None),
+        ("severity", "Severity", SEVERITIES),
+    ]
+
+    def __init__(self, api_client, item):
+        super().__init__(api_client, item)
+
+        main_layout = QVBoxLayout()
+
+        self.table = QTableWidget(0, len(self.columns) + 1)
+        self.table.setHorizontalHeaderLabels([header for _, header, _ in self.columns] + ["Enabled"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.verticalHeader().setVisible(False)
+        main_layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        self.add_button = QPushButton("Add rule")
+        self.add_button.clicked.connect(self.add_rule)
+        self.delete_button = QPushButton("Delete rule")
+        self.delete_button.clicked.connect(self.delete_rule)
+        buttons_layout.addWidget(self.add_button)
+        buttons_layout.addWidget(self.delete_button)
+        buttons_layout.addStretch()
+        main_layout.addLayout(buttons_layout)
+
+        self.setLayout(main_layout)
+
+        self.rules = []
+        self.table.itemChanged.connect(self.on_item_changed)
+        self.call_api(api_method="get_item_alarm_rules", item_id=self.item["item_id"], callback=self.update_view)
+
+    def add_rule(self):
+        self.call_api(api_method="add_alarm_rule", item_id=self.item["item_id"], callback=self.on_rule_added)
+
+    def on_rule_added(self, rule: dict):
+        self.update_view(self.rules + [rule])
+
+    def delete_rule(self):
+        row = self.table.currentRow()
+        if 0 <= row < len(self.rules):
+            rule = self.rules[row]
+            self.call_api(api_method="delete_alarm_rule", rule_id=rule["item_id"],
+                          callback=lambda _: self.update_view([r for r in self.rules if r is not rule]))
+
+    def update_rule(self, row: int, **kwargs):
+        rule = self.rules[row]
+        self.call_api(api_method="update_alarm_rule", rule_id=rule["item_id"], **kwargs,
+                      callback=lambda data: rule.update(data))
+
+    def on_item_changed(self, table_item: QTableWidgetItem):
+        row, column = table_item.row(), table_item.column()
+        if column == len(self.columns):
+            self.update_rule(row, enabled=table_item.checkState() == Qt.CheckState.Checked)
+            return
+
+        key = self.columns[column][0]
+        text = table_item.text().strip()
+        try:
+            if key == "name":
+                value = text
+            elif key == "address":
+                value = int(text) if text else None
+            else:
+                value = float(text or 0)
+        except ValueError:
+            # Restore the stored value:
+            self.update_view(self.rules)
+            return
+        self.update_rule(row, **{key: value})
+
+    @staticmethod
+    def format_value(value) -> str:
+        if value is None:
+            return ""
+        return f"{value:g}" if isinstance(value, float) else str(value)
+
+    def update_view(self, data: list):
+        self.rules = data or []
+
+        self.table.blockSignals(True)
+        self.table.setRowCount(len(self.rules))
+        for row, rule in enumerate(self.rules):
+            for column, (key, _, options) in enumerate(self.columns):
+                if options:
+                    combo = CustomComboBox()
+                    combo.addItems(options)
+                    combo.setCurrentText(rule[key])
+                    combo.currentTextChanged.connect(lambda value, row=row, key=key: self.update_rule(row, **{key: value}))
+                    self.table.setCellWidget(row, column, combo)
+                else:
+                    self.table.setItem(row, column, QTableWidgetItem(self.format_value(rule[key])))
+            enabled = QTableWidgetItem()
+            enabled.setFlags(Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled)
+            enabled.setCheckState(Qt.CheckState.Checked if rule["enabled"] else Qt.CheckState.Unchecked)
+            self.table.setItem(row, len(self.columns), enabled)
+        self.table.blockSignals(False)
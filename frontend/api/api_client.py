@@ -1,11 +1,12 @@
-import traceback
+import logging
 
 from PyQt6.QtCore import QObject, pyqtSignal, QUrl, QByteArray
 from PyQt6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
 import json
 from typing import Optional, Dict, Any, Union, Callable
+from urllib.parse import urlencode
 
-from utils.logger import CustomLogger
+from utils.logger import get_logger
 
 
 class ApiClient(QObject):
@@ -18,7 +19,7 @@ class ApiClient(QObject):
     def __init__(self, host: str, port: int):
         super().__init__()
 
-        self.logger = CustomLogger(name=__name__)
+        self.logger = get_logger(__name__)
 
         self.base_url = f"http://{host}:{port}"
         self.network_manager = QNetworkAccessManager()
@@ -55,21 +56,10 @@ class ApiClient(QObject):
 
     def _handle_response(self, reply: QNetworkReply):
         """Handle API responses of any type"""
-
-        print("_handle_response")
-
         error_callback = None
         try:
             # Grab details from reply and request
             url = reply.request().url().toString()
-            method = reply.operation()  # QNetworkAccessManager.Operation enum
-            method_str = {
-                QNetworkAccessManager.Operation.GetOperation: "GET",
-                QNetworkAccessManager.Operation.PostOperation: "POST",
-                QNetworkAccessManager.Operation.PutOperation: "PUT",
-                QNetworkAccessManager.Operation.DeleteOperation: "DELETE"
-            }.get(method, "UNKNOWN")
-            error_string = reply.errorString()
             response_data = self._parse_response(reply)
             status_code = response_data.get("status", 500) if isinstance(response_data, dict) else 200
 
@@ -78,16 +68,19 @@ class ApiClient(QObject):
             error_callback = reply_map.get("error_callback")
             request_payload = reply_map.get("payload")
 
-            log_msg = (
-                f"[API LOG]\n"
-                f"→ Method: {method_str}\n"
-                f"→ URL: {url}\n"
-                f"→ Status: {status_code}\n"
-                f"→ Error: {error_string}\n"
-                f"→ Payload: {json.dumps(request_payload, indent=2) if request_payload else 'None'}\n"
-                f"→ Response body:\n{response_data}"
-            )
-            print(log_msg)
+            # Responses arrive several times per second, so they are only logged at debug level. The fields are
+            # formatted by the logging thread, and only if the record is enabled:
+            if self.logger.isEnabledFor(logging.DEBUG):
+                method = reply.operation()  # QNetworkAccessManager.Operation enum
+                method_str = {
+                    QNetworkAccessManager.Operation.GetOperation: "GET",
+                    QNetworkAccessManager.Operation.PostOperation: "POST",
+                    QNetworkAccessManager.Operation.PutOperation: "PUT",
+                    QNetworkAccessManager.Operation.DeleteOperation: "DELETE",
+                    QNetworkAccessManager.Operation.CustomOperation: "PATCH"
+                }.get(method, "UNKNOWN")
+                self.logger.debug("%s %s -> %s", method_str, url, status_code,
+                                  extra={"error": reply.errorString(), "payload": request_payload, "response": response_data})
 
             if status_code % 200 < 100: # All 2XX responses are considered as correct
                 if callback:
@@ -98,11 +91,11 @@ class ApiClient(QObject):
             elif reply.error() == QNetworkReply.NetworkError.NoError:
                 self.error_occurred.emit(response_data["response"], status_code)
             else:
-                print(f"API request reported error: {reply.errorString()}")
+                self.logger.warning("API request reported error: %s", reply.errorString(), extra={"url": url})
                 self.error_occurred.emit(reply.errorString(), status_code)
 
         except Exception as e:
-            print(f"API request processing error: {str(e)}: {traceback.format_exc()}")
+            self.logger.exception("API request processing error: %s", e)
             if error_callback:
                 pass
             else:
@@ -123,6 +116,8 @@ class ApiClient(QObject):
                 reply = self.network_manager.post(request, QByteArray(json_data))
             elif method == "PUT":
                 reply = self.network_manager.put(request, QByteArray(json_data))
+            elif method == "PATCH":
+                reply = self.network_manager.sendCustomRequest(request, QByteArray(b"PATCH"), QByteArray(json_data))
         elif method == "GET":
             reply = self.network_manager.get(request)
         elif method == "DELETE":
@@ -174,9 +169,67 @@ class ApiClient(QObject):
         """GET /items/<item_id>/last_result_tree"""
         self._send_request("GET", f"items/{item_id}/last_result_tree", callback=callback)
 
-    def get_item_results_history(self, item_id: int, callback: Callable = None):
+    def get_item_results_history(self, item_id: int, since_id: int = None, before_id: int = None, limit: int = 10,
+                                 callback: Callable = None):
         """GET /items/<item_id>/results_history"""
-        self._send_request("GET", f"items/{item_id}/results_history", callback=callback)
+        query = "&".join(f"{key}={value}" for key, value in
+                         {"since_id": since_id, "before_id": before_id, "limit": limit}.items() if value is not None)
+        self._send_request("GET", f"items/{item_id}/results_history?{query}", callback=callback)
+
+    def get_item_latency_histograms(self, item_id: int, execution_session_id: int = None, callback: Callable = None):
+        """GET /items/<item_id>/latency"""
+        query = urlencode({"execution_session_id": execution_session_id} if execution_session_id is not None else {})
+        self._send_request("GET", f"items/{item_id}/latency?{query}", callback=callback)
+
+    def get_item_alarm_rules(self, item_id: int, callback: Callable = None):
+        """GET /items/<item_id>/alarm_rules"""
+        self._send_request("GET", f"items/{item_id}/alarm_rules", callback=callback)
+
+    def add_alarm_rule(self, item_id: int, callback: Callable = None, **kwargs):
+        """POST /items/<item_id>/alarm_rules"""
+        self._send_request("POST", f"items/{item_id}/alarm_rules", kwargs, callback=callback)
+
+    def update_alarm_rule(self, rule_id: int, callback: Callable = None, **kwargs):
+        """PUT /alarm_rules/<rule_id>"""
+        self._send_request("PUT", f"alarm_rules/{rule_id}", kwargs, callback=callback)
+
+    def delete_alarm_rule(self, rule_id: int, callback: Callable = None):
+        """DELETE /alarm_rules/<rule_id>"""
+        self._send_request("DELETE", f"alarm_rules/{rule_id}", callback=callback)
+
+    def get_item_alarm_events(self, item_id: int, execution_session_id: int = None, limit: int = 100,
+                              callback: Callable = None):
+        """GET /items/<item_id>/alarm_events"""
+        query = urlencode({key: value for key, value in
+                           {"execution_session_id": execution_session_id, "limit": limit}.items() if value is not None})
+        self._send_request("GET", f"items/{item_id}/alarm_events?{query}", callback=callback)
+
+    def get_item_trend(self, item_id: int, time_from: str = None, time_to: str = None, since_id: int = None,
+                       points: int = None, method: str = "lttb", callback: Callable = None):
+        """GET /items/<item_id>/trend"""
+        query = urlencode({key: value for key, value in
+                           {"from": time_from, "to": time_to, "since_id": since_id, "points": points, "method": method}.items()
+                           if value is not None})
+        self._send_request("GET", f"items/{item_id}/trend?{query}", callback=callback)
+
+    def get_item_series(self, item_id: int, time_from: str = None, time_to: str = None, bucket: int = None,
+                        aggregations: list[str] = None, callback: Callable = None):
+        """GET /items/<item_id>/series"""
+        query = urlencode({key: value for key, value in
+                           {"from": time_from, "to": time_to, "bucket": bucket,
+                            "agg": ",".join(aggregations) if aggregations else None}.items()
+                           if value is not None})
+        self._send_request("GET", f"items/{item_id}/series?{query}", callback=callback)
+
+    def get_items_children(self, parent_id: int = None, offset: int = 0, limit: int = None, callback: Callable = None):
+        """GET /items/<item_id>/children or /items/children for the root level"""
+        endpoint = f"items/{parent_id}/children" if parent_id is not None else "items/children"
+        query = f"offset={offset}" + (f"&limit={limit}" if limit is not None else "")
+        self._send_request("GET", f"{endpoint}?{query}", callback=callback)
+
+    def search_items(self, pattern: str, callback: Callable = None):
+        """GET /items/search"""
+        self._send_request("GET", f"items/search?{urlencode({'name': pattern})}", callback=callback)
 
     def get_items_request_tree(self, callback: Callable = None):
         """GET /items/<item_id>/request_tree"""
@@ -190,18 +243,66 @@ class ApiClient(QObject):
         }
         self._send_request("PUT", f"items/{item_id}", data, callback=callback)
 
+    def update_items_positions(self, positions: list[dict], callback: Callable = None):
+        """PATCH /items/positions"""
+        data = {
+            "positions": positions
+        }
+        self._send_request("PATCH", "items/positions", data, callback=callback)
+
+    def move_item(self, item_id: int, parent_id: int | None, position: int, callback: Callable = None):
+        """POST /items/<item_id>/move"""
+        data = {
+            "parent_id": parent_id,
+            "position": position
+        }
+        self._send_request("POST", f"items/{item_id}/move", data, callback=callback)
+
     def delete_item(self, item_id: int, callback: Callable = None):
         """DELETE /items/<item_id>"""
         self._send_request("DELETE", f"items/{item_id}", callback=callback)
 
-    def run_item(self, item_id: int, callback: Callable = None):
+    def run_item(self, item_id: int, run_options: dict = None, callback: Callable = None):
         """PUT /runner/start/<int:item_id>"""
-        self._send_request("PUT", f"runner/start/{item_id}", data={}, callback=callback)
+        data = {"run_options": run_options} if run_options else {}
+        self._send_request("PUT", f"runner/start/{item_id}", data=data, callback=callback)
 
     def stop_item(self, item_id: int, callback: Callable = None):
         """PUT /runner/stop/<int:item_id>"""
         self._send_request("PUT", f"runner/stop/{item_id}", data={}, callback=callback)
 
+    def get_runs(self, callback: Callable = None):
+        """GET /runner/runs"""
+        self._send_request("GET", f"runner/runs", callback=callback)
+
+    def stop_run(self, run_id: int, callback: Callable = None):
+        """PUT /runner/runs/<int:run_id>/stop"""
+        self._send_request("PUT", f"runner/runs/{run_id}/stop", data={}, callback=callback)
+
+    def get_run_last_result_tree(self, run_id: int, callback: Callable = None):
+        """GET /runner/runs/<int:run_id>/last_result_tree"""
+        self._send_request("GET", f"runner/runs/{run_id}/last_result_tree", callback=callback)
+
     def get_running_threads(self, callback: Callable = None):
         """GET /runner/running_threads"""
         self._send_request("GET", f"runner/running_threads", callback=callback)
+
+    def get_latency_histograms(self, callback: Callable = None):
+        """GET /runner/latency"""
+        self._send_request("GET", f"runner/latency", callback=callback)
+
+    def get_profiling(self, callback: Callable = None):
+        """GET /runner/profiling"""
+        self._send_request("GET", f"runner/profiling", callback=callback)
+
+    def set_profiling(self, enabled: bool = None, reset: bool = False, callback: Callable = None):
+        """PUT /runner/profiling"""
+        data = {"reset": reset}
+        if enabled is not None:
+            data["enabled"] = enabled
+        self._send_request("PUT", f"runner/profiling", data=data, callback=callback)
+
+    def sample_profile(self, seconds: float = 5, interval: float = 0.005, callback: Callable = None):
+        """POST /runner/profiling/sample"""
+        self._send_request("POST", f"runner/profiling/sample", data={"seconds": seconds, "interval": interval},
+                           callback=callback)
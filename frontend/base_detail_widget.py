@@ -54,6 +54,17 @@ class ExecuteButton(QPushButton):
             }
         """)
 
+    def set_stopping(self):
+        self.setEnabled(False)
+        self.run = False
+        self.setText("Stopping...")
+        self.setStyleSheet("""
+            QPushButton {
+                background-color: #F08080;
+                color: white;
+            }
+        """)
+
     def set_blocked(self):
         self.setEnabled(False)
         self.setText("Blocked")
@@ -102,6 +113,7 @@ class BaseResult(Base):
         self.item_last_result = self.item["last_result"]
         self.item_results_history = self.item["results_history"]
         self.running_threads = []
+        self.stopping_threads = []
         self.backend_running = False
 
         # Update the UI every 500 ms:
@@ -119,6 +131,7 @@ class BaseResult(Base):
 
     def set_backend_running_status(self, data):
         self.running_threads = data["running_threads"]
+        self.stopping_threads = data.get("stopping_threads", [])
         self.backend_running = bool(self.running_threads)
         if self.backend_running:
             self.on_running()
@@ -226,6 +239,8 @@ class BaseDetail(BaseResult):
         backend_running_other_item = bool(self.item["item_id"] not in self.running_threads)
         if backend_running_other_item:
             self.execute_button.set_blocked()
+        elif self.item["item_id"] in self.stopping_threads:
+            self.execute_button.set_stopping()
         else:
             self.execute_button.set_stop()
 
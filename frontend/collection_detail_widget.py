@@ -1,6 +1,8 @@
-from PyQt6.QtGui import QStandardItemModel, QStandardItem
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QStandardItemModel, QStandardItem, QIcon
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QTabWidget, QTreeView)
 
+from frontend.alarms_tab_widget import AlarmsTabWidget
 from frontend.base_detail_widget import BaseDetail, BaseResult, BaseRequest
 from frontend.common import convert_time, get_icon
 from frontend.connection_tab_widget import ConnectionTabWidget
@@ -29,6 +31,7 @@ class CollectionRequestWidget(BaseRequest):
 
         detail_tabs.addTab(self.connection_widget, "Connection")
         detail_tabs.addTab(RunOptionsTabWidget(api_client, item), "Run options")
+        detail_tabs.addTab(AlarmsTabWidget(api_client, item), "Alarms")
 
         main_layout.addWidget(detail_tabs)
 
@@ -54,48 +57,91 @@ class CollectionResultTreeView(QTreeView):
         # Set the repository to the tree view
         self.setModel(self.view_model)
 
-    def update_model(self, collection_results):
-        # Clear the repository and repopulate it with updated data
-        self.view_model.clear()
-        self.view_model.setHorizontalHeaderLabels(["Name", "Status"])
-
-        self.setColumnWidth(0, 200)  # Minimum width for column 0
-        self.setColumnWidth(1, 200)  # Minimum width for column 1
-
-        self.populate_model(collection_results["results"])
-        self.expandAll()
-        self.scrollToBottom()
+        self.icons = {}
 
-    def populate_model(self, collection_result, parent=None):
-        """Populate the QStandardItemModel with collections and requests."""
-        if not collection_result:
+    def update_model(self, collection_results):
+        """Update the model in place, matching the nodes by result or request, so expanded items and scroll remain."""
+        if not collection_results or not collection_results["results"]:
             return
 
-        # Create a folder item for the collection
-        folder_item = QStandardItem(f"{collection_result['name']}")
-        status_item = QStandardItem(self.get_collection_status(collection_result))
-
-        # Execution level:
-        if not parent:
-            self.view_model.appendRow([folder_item, status_item])
-            self.populate_model(collection_result, folder_item)
-
-        # Results level:
+        scroll_bar = self.verticalScrollBar()
+        follow_bottom = scroll_bar.value() == scroll_bar.maximum()
+        first_load = self.view_model.rowCount() == 0
+
+        # Execution level and results level show the same root collection:
+        root_result = collection_results["results"]
+        inserted = self.update_rows(self.view_model.invisibleRootItem(), [root_result], recursive=False)
+        inserted |= self.update_rows(self.view_model.item(0, 0), [root_result])
+
+        if first_load:
+            self.setColumnWidth(0, 200)  # Minimum width for column 0
+            self.setColumnWidth(1, 200)  # Minimum width for column 1
+            self.expandAll()
+        if inserted and follow_bottom:
+            self.scrollToBottom()
+
+    def update_rows(self, parent_item, results, recursive: bool = True) -> bool:
+        """Update the children rows of an item with the given results. Return if any row was inserted."""
+        inserted = False
+        for row, result in enumerate(results):
+            name_item = parent_item.child(row, 0)
+            if name_item is None or not self.is_same_node(name_item, result):
+                # Following rows belong to another execution:
+                parent_item.removeRows(row, parent_item.rowCount() - row)
+                name_item, status_item = self.create_row(result)
+                parent_item.appendRow([name_item, status_item])
+                if result["item_handler"] == "CollectionResult":
+                    self.expand(name_item.index())
+                inserted = True
+            else:
+                self.update_row(name_item, parent_item.child(row, 1), result)
+
+            if recursive and result["item_handler"] == "CollectionResult":
+                inserted |= self.update_rows(name_item, result["children"])
+
+        # Remove rows not present anymore:
+        if parent_item.rowCount() > len(results):
+            parent_item.removeRows(len(results), parent_item.rowCount() - len(results))
+        return inserted
+
+    @staticmethod
+    def is_same_node(name_item, result) -> bool:
+        node_data = name_item.data(Qt.ItemDataRole.UserRole)
+        # A new iteration reuses the nodes of the same requests, keeping their expanded state:
+        return node_data["result_id"] == result["item_id"] or node_data["request_id"] == result["request_id"]
+
+    def create_row(self, result):
+        name_item = QStandardItem(result["name"])
+        status_item = QStandardItem()
+        self.update_row(name_item, status_item, result)
+        return name_item, status_item
+
+    def update_row(self, name_item, status_item, result):
+        """Set only the values that changed, to avoid repainting the whole tree."""
+        node_data = {"result_id": result["item_id"], "request_id": result["request_id"]}
+        if name_item.data(Qt.ItemDataRole.UserRole) != node_data:
+            name_item.setData(node_data, Qt.ItemDataRole.UserRole)
+        if name_item.text() != result["name"]:
+            name_item.setText(result["name"])
+
+        if result["item_handler"] == "CollectionResult":
+            text = self.get_collection_status(result)
+            icon_key = None
         else:
-            parent.appendRow([folder_item, status_item])
-
-            # Iterate through children (both collections and requests)
-            for child in collection_result["children"]:
-                if child["item_handler"] == "CollectionResult":
-                    # Handle sub-collection
-                    self.populate_model(child, folder_item)
-                else:
-                    # Handle request
-                    request_item = QStandardItem(child["name"])
-                    text = self.get_request_status(child)
-                    status_item = QStandardItem(text)
-                    status_item.setIcon(get_icon(child["result"]))
-                    folder_item.appendRow([request_item, status_item])
+            text = self.get_request_status(result)
+            icon_key = result["result"]
+        if status_item.text() != text:
+            status_item.setText(text)
+        if status_item.data(Qt.ItemDataRole.UserRole) != icon_key:
+            status_item.setData(icon_key, Qt.ItemDataRole.UserRole)
+            status_item.setIcon(self.get_status_icon(icon_key))
+
+    def get_status_icon(self, result):
+        if result is None:
+            return QIcon()
+        if result not in self.icons:
+            self.icons[result] = get_icon(result)
+        return self.icons[result]
 
     def get_collection_status(self, collection_result):
         total_requests = collection_result["total_ok"] + collection_result["total_failed"] + collection_result["total_pending"]
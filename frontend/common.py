@@ -7,7 +7,6 @@ from PyQt6.QtGui import QIcon
 import weakref
 
 from config import FRONTEND_PATH
-from utils.logger import CustomLogger
 
 
 ITEMS = {
@@ -1,9 +1,9 @@
 from PyQt6.QtCore import Qt, pyqtSignal, QSize
 from PyQt6.QtGui import QIcon, QStandardItemModel
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QLabel,
-                             QLineEdit, QSpinBox, QComboBox, QPushButton,
+                             QLineEdit, QSpinBox, QDoubleSpinBox, QComboBox, QPushButton,
                              QTabWidget, QTextEdit, QGridLayout,
-                             QHBoxLayout, QTableWidget, QAbstractItemView, QHeaderView, QGroupBox,
+                             QHBoxLayout, QTableWidget, QTableView, QAbstractItemView, QHeaderView, QGroupBox,
                              QTableWidgetItem, QSplitter, QMessageBox, QFrame, QSizePolicy, QCheckBox)
 
 from frontend.safe_base import SafeWidget
@@ -88,7 +88,7 @@ class CustomGridLayout(QGridLayout):
             widget.itemChanged.connect(self.signal_update_item)
         elif isinstance(widget, CustomComboBox):
             widget.currentTextChanged.connect(self.signal_update_item)
-        elif isinstance(widget, QSpinBox):
+        elif isinstance(widget, QSpinBox) or isinstance(widget, QDoubleSpinBox):
             widget.valueChanged.connect(self.signal_update_item)
         elif isinstance(widget, QPushButton):
             widget.clicked.connect(self.signal_update_item)
@@ -243,6 +243,44 @@ class CustomTable(QTableWidget):
         return row_data
 
 
+class CustomTableView(QTableView):
+    """Read-only table backed by a model. Rows have a fixed height, so only the visible ones are rendered."""
+
+    def __init__(self, headers_width=200):
+        super().__init__()
+
+        self.headers_width = headers_width
+        self.set_style()
+
+    def set_style(self):
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectItems)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setStyleSheet("""
+            QTableView {
+                border: none; /* Remove any outer border */
+                gridline-color: #E5E5E5;  /* Set the color of table borders */
+            }
+            QTableView::item {
+                background-color: #F8F8FF;
+            }
+            QTableView::item:selected {
+                background-color: #EFEFEF;
+            }
+            QToolTip {
+                background-color: #EFEFEF;
+            }
+        """)
+
+        # Do not measure the contents of every row:
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.horizontalHeader().setDefaultSectionSize(self.headers_width)
+
+    def setModel(self, model):
+        super().setModel(model)
+        self.setMaximumWidth(self.headers_width * model.columnCount() + self.verticalHeader().width() + 30)
+
+
 class CustomComboBox(QComboBox):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -1,4 +1,4 @@
-from PyQt6.QtWidgets import (QLabel,
+from PyQt6.QtWidgets import (QCheckBox, QLabel,
                              QLineEdit, QSpinBox, QVBoxLayout)
 
 from frontend.base_detail_widget import BaseRequest
@@ -43,6 +43,14 @@ class ModbusTcpConnectionGrid(BaseConnectionGrid):
         self.retries_spinbox.setRange(1, 65535)
         self.grid_layout.add_widget(QLabel("Retries:"), self.retries_spinbox)
 
+        # Requests of a collection are sent without waiting for the previous responses:
+        self.pipelining_checkbox = QCheckBox()
+        self.grid_layout.add_widget(QLabel("Pipelining:"), self.pipelining_checkbox)
+
+        self.max_in_flight_spinbox = QSpinBox()
+        self.max_in_flight_spinbox.setRange(1, 256)
+        self.grid_layout.add_widget(QLabel("Max in flight:"), self.max_in_flight_spinbox)
+
         # Set initial state and connect signals:
         self.update_view(data=self.item_client)
 
@@ -54,6 +62,8 @@ class ModbusTcpConnectionGrid(BaseConnectionGrid):
                 "port": int(self.port_spinbox.text()),
                 "timeout": int(self.timeout_spinbox.text()),
                 "retries": int(self.retries_spinbox.text()),
+                "pipelining": bool(self.pipelining_checkbox.isChecked()),
+                "max_in_flight": int(self.max_in_flight_spinbox.text()),
             }
 
             self.call_api(api_method="update_item_from_handler",
@@ -81,6 +91,9 @@ class ModbusTcpConnectionGrid(BaseConnectionGrid):
         self.port_spinbox.setValue(self.item_client["port"])
         self.timeout_spinbox.setValue(self.item_client["timeout"])
         self.retries_spinbox.setValue(self.item_client["retries"])
+        self.pipelining_checkbox.setChecked(bool(self.item_client.get("pipelining")))
+        self.max_in_flight_spinbox.setValue(self.item_client.get("max_in_flight") or 8)
+        self.max_in_flight_spinbox.setEnabled(bool(self.item_client.get("pipelining")))
 
         self.grid_layout.blockSignals(False)
 
@@ -117,6 +130,14 @@ class ModbusRtuConnectionGrid(BaseConnectionGrid):
         self.retries_spinbox.setRange(1, 65535)
         self.grid_layout.add_widget(QLabel("Retries:"), self.retries_spinbox)
 
+        self.broadcast_delay_spinbox = QSpinBox()
+        self.broadcast_delay_spinbox.setRange(0, 10000)
+        self.grid_layout.add_widget(QLabel("Broadcast delay (ms):"), self.broadcast_delay_spinbox)
+
+        # Requests of a collection are ordered across slaves by the serial bus:
+        self.schedule_requests_checkbox = QCheckBox()
+        self.grid_layout.add_widget(QLabel("Schedule requests:"), self.schedule_requests_checkbox)
+
         # Set initial state and connect signals:
         self.update_view(data=self.item_client)
 
@@ -131,6 +152,8 @@ class ModbusRtuConnectionGrid(BaseConnectionGrid):
                 "bytesize": int(self.bytesize_spinbox.text()),
                 "timeout": int(self.timeout_spinbox.text()),
                 "retries": int(self.retries_spinbox.text()),
+                "broadcast_delay": int(self.broadcast_delay_spinbox.text()),
+                "schedule_requests": bool(self.schedule_requests_checkbox.isChecked()),
             }
 
             self.call_api(api_method="update_item_from_handler",
@@ -163,6 +186,8 @@ class ModbusRtuConnectionGrid(BaseConnectionGrid):
         self.bytesize_spinbox.setValue(self.item_client["bytesize"])
         self.timeout_spinbox.setValue(self.item_client["timeout"])
         self.retries_spinbox.setValue(self.item_client["retries"])
+        self.broadcast_delay_spinbox.setValue(self.item_client.get("broadcast_delay", 100))
+        self.schedule_requests_checkbox.setChecked(bool(self.item_client.get("schedule_requests")))
 
         self.grid_layout.blockSignals(False)
 
@@ -1,9 +1,113 @@
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtWidgets import (QVBoxLayout, QTableWidgetItem, QLabel)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtWidgets import QVBoxLayout
 
+from frontend.api.api_helper_mixin import ApiCallMixin
 from frontend.base_detail_widget import BaseResult
 from frontend.common import convert_time, get_icon, convert_timestamp
-from frontend.components.components import CustomTable
+from frontend.components.components import CustomTableView
+
+
+HISTORY_PAGE_SIZE = 200
+
+
+class HistoryTableModel(QAbstractTableModel, ApiCallMixin):
+    """Append-only model of the execution sessions of an item, newest first.
+
+    New sessions are inserted at the top and only the newest one, which may be still running, is updated in place.
+    Older sessions are requested by pages when the view scrolls to the bottom.
+    """
+
+    headers = ["Result", "Elapsed Time", "Timestamp"]
+
+    def __init__(self, api_client, item_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.setup_api_client(api_client)
+
+        self.item_id = item_id
+        self.results = []
+        self.icons = {}
+        self.history_complete = False
+        self.fetching = False
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.results)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return f" {self.headers[section]} "
+        return super().headerData(section, orientation, role)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        result = self.results[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return str(result["result"])
+            elif column == 1:
+                return convert_time(result["elapsed_time"])
+            elif column == 2:
+                return convert_timestamp(result["timestamp"])
+        elif role == Qt.ItemDataRole.DecorationRole and column == 0:
+            # Icons are shared between rows:
+            if result["result"] not in self.icons:
+                self.icons[result["result"]] = get_icon(result["result"])
+            return self.icons[result["result"]]
+        return None
+
+    def get_newest_id(self) -> int | None:
+        return self.results[0]["item_id"] if self.results else None
+
+    def add_results(self, results: list):
+        """Updates the sessions already shown and inserts the new ones at the top. Results are sorted newest first."""
+        newest_id = self.get_newest_id()
+
+        new_results = [result for result in results if newest_id is None or result["item_id"] > newest_id]
+        if new_results:
+            self.beginInsertRows(QModelIndex(), 0, len(new_results) - 1)
+            self.results[0:0] = new_results
+            self.endInsertRows()
+
+        # Only the last sessions may change, so they are searched from the top:
+        for result in results[len(new_results):]:
+            for row, shown_result in enumerate(self.results):
+                if shown_result["item_id"] == result["item_id"]:
+                    if shown_result != result:
+                        self.results[row] = result
+                        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+                    break
+                if shown_result["item_id"] < result["item_id"]:
+                    break
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and bool(self.results) and not self.history_complete and not self.fetching
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self.fetching = True
+        self.call_api(api_method="get_item_results_history",
+                      item_id=self.item_id,
+                      before_id=self.results[-1]["item_id"],
+                      limit=HISTORY_PAGE_SIZE,
+                      callback=self.append_older_results)
+
+    def append_older_results(self, results: list):
+        self.fetching = False
+        if results is None:
+            return
+        if len(results) < HISTORY_PAGE_SIZE:
+            self.history_complete = True
+        if results:
+            self.beginInsertRows(QModelIndex(), len(self.results), len(self.results) + len(results) - 1)
+            self.results.extend(results)
+            self.endInsertRows()
 
 
 class HistoryTabWidget(BaseResult):
@@ -15,23 +119,24 @@ class HistoryTabWidget(BaseResult):
         self.setLayout(self.main_layout)
 
         # Define table:
-        self.table = CustomTable(headers=["Result", "Elapsed Time", "Timestamp"],
-                                 editable=False,
-                                 stretch=False)
+        self.table_model = HistoryTableModel(api_client, self.item["item_id"])
+        self.table = CustomTableView()
+        self.table.setModel(self.table_model)
 
         self.main_layout.addWidget(self.table)
-        self.main_layout.addStretch()
 
         # Update the UI every 1 s:
-        self.timer.timeout.connect(self.reload_data)
         self.timer.start(1000)
 
         # Set initial state and connect signals:
         self.update_view(data=self.item_results_history)
 
     def reload_data(self):
+        # Only the sessions from the newest one shown onwards are requested:
         self.call_api(api_method="get_item_results_history",
                       item_id=self.item["item_id"],
+                      since_id=self.table_model.get_newest_id(),
+                      limit=HISTORY_PAGE_SIZE,
                       callback=self.update_view)
 
     def update_view(self, data: dict):
@@ -40,15 +145,4 @@ class HistoryTabWidget(BaseResult):
         else:
             self.item_results_history = data
 
-        self.table.clear()
-        self.table.setRowCount(len(self.item_results_history))
-        row = 0
-        for result in self.item_results_history:
-            result_widget = QTableWidgetItem(str(result["result"]))
-            result_widget.setIcon(get_icon(result["result"]))
-            self.table.setItem(row, 0, result_widget)
-            elapsed_time_widget = QTableWidgetItem(convert_time(result["elapsed_time"]))
-            self.table.setItem(row, 1, elapsed_time_widget)
-            timestamp_widget = QTableWidgetItem(convert_timestamp(result["timestamp"]))
-            self.table.setItem(row, 2, timestamp_widget)
-            row += 1
+        self.table_model.add_results(self.item_results_history)
@@ -1,6 +1,5 @@
 import argparse
 import sys
-import traceback
 
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import (
@@ -24,6 +23,10 @@ from qt_material import apply_stylesheet
 from frontend.modbus_detail_widget import ModbusDetail
 
 from config import FRONTEND_PATH, load_app_config, PROJECT_DATA_PATH
+from utils.logger import setup_logging, get_logger
+
+
+logger = get_logger(__name__)
 
 
 class Button(QPushButton):
@@ -98,9 +101,7 @@ class MainWindow(QMainWindow, ApiCallMixin):
         help_menu.addAction("About", lambda: self.app_info.show_about(self))
 
     def get_item_request(self):
-        print("get_item_request")
         item_id = self.project_structure_section.get_selected_item_data()
-        print("item_id", item_id)
         if item_id:
             self.call_api(api_method="get_item_request",
                           item_id=item_id,
@@ -124,7 +125,7 @@ class MainWindow(QMainWindow, ApiCallMixin):
 
     def closeEvent(self, *args, **kwargs):
         """Override the close event to perform custom actions."""
-        # Wait until backend stops:
+        # Stop all the items. The backend does not wait for them, they finish their sessions in the background:
         self.call_api(api_method="stop_item",
                       item_id=0)
 
@@ -132,6 +133,7 @@ class MainWindow(QMainWindow, ApiCallMixin):
 
 
 def run(host: str, port: int):
+    setup_logging("frontend", **load_app_config(find_port=False).get("logging", {}))
     app = QApplication(sys.argv)
     apply_stylesheet(app, theme=f"{FRONTEND_PATH}/fixtures/theme.xml", css_file=f"{FRONTEND_PATH}/fixtures/styles.css")
 
@@ -142,7 +144,7 @@ def run(host: str, port: int):
         exec_obj = app.exec()
         sys.exit(exec_obj)
     except Exception as e:
-        print(f"Main window critical error: {str(e)}: {traceback.format_exc()}")
+        logger.critical("Main window critical error: %s", e, exc_info=True)
 
 
 if __name__ == "__main__":
@@ -6,12 +6,14 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QLabel,
                              QTabWidget, QTextEdit, QHBoxLayout, QGroupBox,
                              QTableWidgetItem)
 
+from frontend.alarms_tab_widget import AlarmsTabWidget
 from frontend.base_detail_widget import BaseDetail, BaseResult, BaseRequest
 from frontend.common import convert_time, get_model_value, convert_timestamp
 from frontend.components.components import CustomGridLayout, CustomTable, CustomComboBox
 from frontend.connection_tab_widget import ConnectionTabWidget
 from frontend.history_tab_widget import HistoryTabWidget
 from frontend.run_options_tab_widget import RunOptionsTabWidget
+from frontend.trend_tab_widget import TrendTabWidget
 from frontend.safe_base import SafeWidget
 
 FUNCTIONS_DICT = {
@@ -177,6 +179,7 @@ class ModbusRequestWidget(SafeWidget):
         detail_tabs.addTab(self.request_widget, "Request")
 
         detail_tabs.addTab(RunOptionsTabWidget(api_client, item), "Run options")
+        detail_tabs.addTab(AlarmsTabWidget(api_client, item), "Alarms")
 
         main_layout.addWidget(detail_tabs)
 
@@ -285,6 +288,10 @@ class ModbusResponseWidget(BaseResult):
         self.history_tab = HistoryTabWidget(api_client, item)
         self.tabs.addTab(self.history_tab, "History")
 
+        # Trend
+        self.trend_tab = TrendTabWidget(api_client, item)
+        self.tabs.addTab(self.trend_tab, "Trend")
+
         # Set initial state and connect signals:
         self.update_view(data=self.item_last_result)
 
@@ -1,6 +1,7 @@
 import dataclasses
 import json
 import sys
+from functools import partial
 
 from PyQt6.QtCore import QEvent, Qt, QSortFilterProxyModel, QRect, pyqtSignal, QModelIndex
 from PyQt6.QtGui import QStandardItemModel, QIcon, QDrag, QMouseEvent, QStandardItem
@@ -27,6 +28,9 @@ from config import FRONTEND_PATH, OUTPUTS_PATH
 from frontend.safe_base import SafeWidget
 
 
+CHILDREN_PAGE_SIZE = 100
+
+
 class Button(QPushButton):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -48,6 +52,7 @@ class CustomStandardItemModel(QStandardItemModel, ApiCallMixin):
 
     signal_move_item = pyqtSignal(CustomStandardItem)
     signal_update_item = pyqtSignal()
+    signal_search_loaded = pyqtSignal()
 
     def __init__(self, api_client, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -55,73 +60,148 @@ class CustomStandardItemModel(QStandardItemModel, ApiCallMixin):
         self.setup_api_client(api_client)
 
         self.view_items = {}
+        self.fetch_offsets = {None: 0}  # Offset of the next page of each parent with pending children. Root is None
+        self.fetching = set()  # Parents with a page request in progress
+        self.search_pattern = None  # Pattern of the last search
+        self.search_parents = set()  # Parents to load completely for the search, as their descendants match it
+
+        self.setHorizontalHeaderLabels(["Project"])
 
-        # Load all model by calling the API:
-        self.call_api(api_method="get_items_request_tree",
-                      callback=self.load_model)
+        # Load the root level by calling the API; children are loaded when their parent is expanded:
+        self.fetchMore(QModelIndex())
 
     def create_view_item(self, item) -> CustomStandardItem:
         view_item = CustomStandardItem(item["name"], item["item_handler"])
         item_data = {
             "item_id": item["item_id"],
             "item_handler": item["item_handler"],
+            "position": item.get("position"),
+            "has_children": item.get("has_children", False),
         }
         view_item.setData(item_data, role=Qt.ItemDataRole.UserRole)
         self.view_items[item["item_id"]] = view_item  # Save reference
+        if item_data["has_children"]:
+            self.fetch_offsets[item["item_id"]] = 0
         return view_item
 
-    def load_model(self, data: dict):
-        """Loads all elements from repository into a QStandardItemModel, considering the 'position' key."""
-        self.view_items = {}
-        self.clear()
-        self.setHorizontalHeaderLabels(["Project"])
+    def get_parent_id(self, parent: QModelIndex) -> int | None:
+        if not parent.isValid():
+            return None
+        return self.itemFromIndex(parent).data(Qt.ItemDataRole.UserRole)["item_id"]
 
-        # Step 1: Create QStandardItem objects for each item
-        def get_items(data):
-            if not data:
-                return
-            for db_item in data:
-                item = self.create_view_item(db_item)
-                self.view_items[db_item.get("item_id")] = item
-                get_items(db_item.get("children"))
-        # Get items::
-        get_items(data)
-
-        # Step 2: Attach items to parents, maintaining order
-        root_level_item = self.invisibleRootItem()
-        def set_model(data):
-            if not data:
-                return
-            for db_item in data:
-                if db_item.get("parent_id"):  # Attach to a parent
-                    parent_view_item = self.view_items.get(db_item.get("parent_id"))
-                    parent_view_item.appendRow(self.view_items[db_item.get("item_id")])
-                else:  # Root-level items
-                    root_level_item.appendRow(self.view_items[db_item.get("item_id")])
-                set_model(db_item.get("children"))
-        # Set model:
-        set_model(data)
-
-    def recalculate_positions(self):
-        """Recalculates and updates the 'position' of each item based on its order in the QStandardItemModel."""
-
-        def update_positions_recursive(parent_item):
-            """Recursively updates positions of child items under the given parent."""
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        # Collections with children not loaded yet must show the expand arrow:
+        if parent.isValid() and self.get_parent_id(parent) in self.fetch_offsets:
+            return True
+        return super().hasChildren(parent)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        parent_id = self.get_parent_id(parent)
+        return parent_id in self.fetch_offsets and parent_id not in self.fetching
+
+    def fetchMore(self, parent: QModelIndex):
+        parent_id = self.get_parent_id(parent)
+        if parent_id not in self.fetch_offsets or parent_id in self.fetching:
+            return
+        self.fetching.add(parent_id)
+        self.call_api(api_method="get_items_children",
+                      callback=partial(self.load_children, parent_id),
+                      parent_id=parent_id,
+                      offset=self.fetch_offsets[parent_id],
+                      limit=CHILDREN_PAGE_SIZE)
+
+    def load_children(self, parent_id: int | None, data: dict):
+        """Appends a page of children from repository to its parent, which is already ordered by 'position'."""
+        self.fetching.discard(parent_id)
+        if parent_id is None:
+            parent_item = self.invisibleRootItem()
+        elif parent_id in self.view_items:
+            parent_item = self.view_items[parent_id]
+        else:  # Parent deleted while loading
+            self.fetch_offsets.pop(parent_id, None)
+            return
+
+        for db_item in data["children"]:
+            # Items added or moved locally before their parent was loaded are already in the model:
+            if db_item["item_id"] in self.view_items:
+                continue
+            parent_item.appendRow(self.create_view_item(db_item))
+
+        if data["has_more"]:
+            self.fetch_offsets[parent_id] += len(data["children"])
+        else:
+            self.fetch_offsets.pop(parent_id, None)
+
+        if parent_id in self.search_parents:
+            self.fetch_search_parents()
+
+    def search(self, pattern: str):
+        """Load the branches of the items whose name matches the pattern, which may not be loaded yet."""
+        self.search_pattern = pattern
+        self.search_parents = set()
+        if pattern:
+            self.call_api(api_method="search_items",
+                          callback=partial(self.load_search, pattern),
+                          pattern=pattern)
+
+    def load_search(self, pattern: str, data: dict):
+        # Results of an older search:
+        if pattern != self.search_pattern:
+            return
+        # Root items may match too:
+        self.search_parents = set(data["ancestor_ids"]) | {None}
+        self.fetch_search_parents()
+
+    def fetch_search_parents(self):
+        """Fetch the next page of children of the search parents that are loaded, until all their children are."""
+        for parent_id in list(self.search_parents):
+            if parent_id not in self.fetch_offsets:
+                self.search_parents.discard(parent_id)
+            elif parent_id is None:
+                self.fetchMore(QModelIndex())
+            elif parent_id in self.view_items:
+                self.fetchMore(self.indexFromItem(self.view_items[parent_id]))
+            # Parents not loaded yet are fetched when their own parent is loaded
+        self.signal_search_loaded.emit()
+
+    def recalculate_positions(self, *parent_items):
+        """Updates the 'position' of the children of the given parents whose order changed, in a single API call."""
+        positions = []
+        for parent_item in parent_items:
             for index in range(parent_item.rowCount()):
                 child_item = parent_item.child(index)
                 item_data = child_item.data(Qt.ItemDataRole.UserRole)  # Retrieve the unique identifier
 
-                # Update position based on index within the parent
-                self.call_api(api_method="update_item_from_handler",
-                              item_handler=item_data["item_handler"],
-                              item_id=item_data["item_id"],
-                              position=index)
-
-                # Recursively update children
-                update_positions_recursive(child_item)
-
-        root_item = self.invisibleRootItem()
-        update_positions_recursive(root_item)
+                # Only siblings that changed their index are sent:
+                if item_data.get("position") == index:
+                    continue
+
+                item_data["position"] = index
+                self.blockSignals(True)  # Avoid notifying an item edition
+                child_item.setData(item_data, role=Qt.ItemDataRole.UserRole)
+                self.blockSignals(False)
+
+                positions.append({
+                    "item_id": item_data["item_id"],
+                    "item_handler": item_data["item_handler"],
+                    "position": index,
+                })
+
+        if positions:
+            self.call_api(api_method="update_items_positions",
+                          positions=positions)
+
+    def update_siblings_positions(self, data: dict):
+        """Patches the stored 'position' of the siblings returned by a move, without reloading the model."""
+        self.blockSignals(True)  # Avoid notifying an item edition
+        for sibling in data["siblings"]:
+            view_item = self.view_items.get(sibling["item_id"])
+            if view_item is None:
+                continue
+            item_data = view_item.data(Qt.ItemDataRole.UserRole)
+            item_data["position"] = sibling["position"]
+            view_item.setData(item_data, role=Qt.ItemDataRole.UserRole)
+        self.blockSignals(False)
 
     def move_to_destination(self, source_index, destination_index):
         """Move an item to the exact drop location with restrictions."""
@@ -196,28 +276,32 @@ class CustomStandardItemModel(QStandardItemModel, ApiCallMixin):
 
         self.layoutChanged.emit()
 
-        # Update backend repository
-        self.call_api(api_method="update_item_from_handler",
-                      item_handler=item_data["item_handler"],
+        # Update backend repository: siblings are shifted server side
+        self.call_api(api_method="move_item",
+                      callback=self.update_siblings_positions,
                       item_id=item_data["item_id"],
-                      parent_id=parent_data.get("item_id"))
+                      parent_id=parent_data.get("item_id"),
+                      position=source_item.row())
 
         if destination_item != self.invisibleRootItem():
             self.signal_move_item.emit(destination_item)
         else:
             self.signal_move_item.emit(source_item)
 
-        self.recalculate_positions()
-
     def add_item(self, item):
+        # The item will be loaded with the rest of the children of its parent, as the last one:
+        if item["parent_id"] in self.fetch_offsets:
+            return
+
         view_item = self.create_view_item(item)
         root_level_item = self.invisibleRootItem()
         if item["parent_id"]:
-            self.view_items[item["parent_id"]].appendRow(view_item)
+            parent_item = self.view_items[item["parent_id"]]
         else:
-            root_level_item.appendRow(view_item)
+            parent_item = root_level_item
+        parent_item.appendRow(view_item)
 
-        self.recalculate_positions()
+        self.recalculate_positions(parent_item)
 
     def delete_item(self, item_id: int):
         view_item = self.view_items[item_id]
@@ -225,11 +309,16 @@ class CustomStandardItemModel(QStandardItemModel, ApiCallMixin):
         parent_item = view_item.parent() or root_level_item
         parent_item.removeRow(view_item.row())
         self.view_items.pop(item_id)  # Delete reference
+        self.fetch_offsets.pop(item_id, None)
 
-        self.recalculate_positions()
+        self.recalculate_positions(parent_item)
 
 
 class HierarchicalFilterProxyModel(QSortFilterProxyModel):
+    def refresh(self):
+        """Filter again the rows, as the parents of rows loaded later are not filtered again."""
+        self.invalidateFilter()
+
     def filterAcceptsRow(self, source_row, source_parent):
         # Get the source index for the current row:
         source_index = self.sourceModel().index(source_row, 0, source_parent)
@@ -420,6 +509,7 @@ class ProjectStructureSection(SafeWidget, ApiCallMixin):
         self.view_model = CustomStandardItemModel(self.api_client)
         self.view_model.itemChanged.connect(self.edit_item)
         self.view_model.signal_move_item.connect(self.move_item)
+        self.view_model.signal_search_loaded.connect(self.refresh_filter)
 
         # Proxy repository to filter tree:
         self.proxy_model = HierarchicalFilterProxyModel(self)
@@ -455,6 +545,13 @@ class ProjectStructureSection(SafeWidget, ApiCallMixin):
     def apply_filter(self, text):
         self.proxy_model.setFilterRegularExpression(text)
         self.tree_view.expandAll()
+        # Children of collections not expanded yet are not loaded, so the matches are searched in the repository:
+        self.view_model.search(text)
+
+    def refresh_filter(self):
+        if self.filter_input.text():
+            self.proxy_model.refresh()
+            self.tree_view.expandAll()
 
     def expand_tree_view_item(self, item):
         def expand_all_parents(index):
@@ -1,8 +1,8 @@
 from PyQt6.QtWidgets import (QCheckBox, QWidget, QLabel,
-                             QLineEdit, QSpinBox, QVBoxLayout)
+                             QLineEdit, QSpinBox, QDoubleSpinBox, QVBoxLayout)
 
 from frontend.base_detail_widget import BaseRequest
-from frontend.components.components import CustomGridLayout
+from frontend.components.components import CustomGridLayout, CustomComboBox
 
 
 class RunOptionsTabWidget(BaseRequest):
@@ -27,10 +27,30 @@ class RunOptionsTabWidget(BaseRequest):
 
         self.continuous_monitoring = QCheckBox()
 
+        # Results of requests stored on every poll or only when their values change beyond the deadband:
+        self.persistence_combo = CustomComboBox()
+        self.persistence_combo.addItems(["Every poll", "On change"])
+
+        self.deadband_absolute = QDoubleSpinBox()
+        self.deadband_absolute.setRange(0, 1e12)
+        self.deadband_absolute.setDecimals(3)
+
+        self.deadband_percent = QDoubleSpinBox()
+        self.deadband_percent.setRange(0, 100)
+        self.deadband_percent.setDecimals(2)
+
+        self.heartbeat_interval = QSpinBox()
+        self.heartbeat_interval.setRange(0, 999999)
+
         # self.grid_layout.add_widget(QLabel("Polling:"), self.polling_label)
         self.grid_layout.add_widget(QLabel("Polling interval:"), self.polling_interval_label)
         self.grid_layout.add_widget(QLabel("Delayed start:"), self.delayed_start)
         self.grid_layout.add_widget(QLabel("Continuous monitoring:"), self.continuous_monitoring)
+        if self.item.get("item_handler") != "Collection":
+            self.grid_layout.add_widget(QLabel("Store results:"), self.persistence_combo)
+            self.grid_layout.add_widget(QLabel("Deadband:"), self.deadband_absolute)
+            self.grid_layout.add_widget(QLabel("Deadband (%):"), self.deadband_percent)
+            self.grid_layout.add_widget(QLabel("Heartbeat interval:"), self.heartbeat_interval)
 
         # Add the grid layout to the main layout
         main_layout.addLayout(self.grid_layout)
@@ -50,6 +70,10 @@ class RunOptionsTabWidget(BaseRequest):
                 "polling_interval": int(self.polling_interval_label.text()),
                 "delayed_start": int(self.delayed_start.text()),
                 "continuous_monitoring": bool(self.continuous_monitoring.isChecked()),
+                "persistence": self.persistence_combo.currentText(),
+                "deadband_absolute": self.deadband_absolute.value(),
+                "deadband_percent": self.deadband_percent.value(),
+                "heartbeat_interval": int(self.heartbeat_interval.text()),
             }
 
             self.call_api(api_method="update_item_from_handler",
@@ -77,5 +101,12 @@ class RunOptionsTabWidget(BaseRequest):
         self.polling_interval_label.setValue(self.item_run_options["polling_interval"])
         self.delayed_start.setValue(self.item_run_options["delayed_start"])
         self.continuous_monitoring.setChecked(self.item_run_options["continuous_monitoring"])
+        self.persistence_combo.setCurrentText(self.item_run_options.get("persistence") or "Every poll")
+        self.deadband_absolute.setValue(self.item_run_options.get("deadband_absolute") or 0)
+        self.deadband_percent.setValue(self.item_run_options.get("deadband_percent") or 0)
+        self.heartbeat_interval.setValue(self.item_run_options.get("heartbeat_interval") or 0)
+        on_change = self.persistence_combo.currentText() == "On change"
+        for widget in (self.deadband_absolute, self.deadband_percent, self.heartbeat_interval):
+            widget.setEnabled(on_change)
 
         self.grid_layout.blockSignals(False)
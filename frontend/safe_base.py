@@ -1,8 +1,12 @@
 import types
-import traceback
 import functools
 from PyQt6.QtWidgets import QWidget
 
+from utils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
 def catch_exceptions(method):
     """Decorator that catches and logs exceptions in methods."""
     @functools.wraps(method)
@@ -11,10 +15,8 @@ def catch_exceptions(method):
             return method(*args, **kwargs)
         except Exception as e:
             cls_name = args[0].__class__.__name__ if args else "<unknown>"
-            print(f"[Exception] in {cls_name}.{method.__name__}: {e}")
-            print(f"  args: {args}")
-            print(f"  kwargs: {kwargs}")
-            print(traceback.format_exc())
+            logger.exception("Exception in %s.%s: %s", cls_name, method.__name__, e,
+                             extra={"method_args": args, "method_kwargs": kwargs})
             # Optional: show QMessageBox or log to file here
     return wrapper
 
@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+
+import tzlocal
+from PyQt6.QtCharts import QChart, QChartView, QLineSeries, QDateTimeAxis, QValueAxis
+from PyQt6.QtCore import Qt, QDateTime, QPointF
+from PyQt6.QtGui import QPainter
+from PyQt6.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel
+
+from frontend.base_detail_widget import BaseResult
+from frontend.components.components import CustomComboBox
+
+
+TREND_WINDOWS = {
+    "Last 5 minutes": timedelta(minutes=5),
+    "Last hour": timedelta(hours=1),
+    "Last 24 hours": timedelta(hours=24),
+}
+
+
+class TrendTabWidget(BaseResult):
+    """Trend of the decoded register values of a request.
+
+    The stored history is downsampled by the backend to the chart width, and new values are appended while the request
+    is running. When the appended points double the chart width, the window is downsampled again.
+    """
+
+    def __init__(self, api_client, item):
+        super().__init__(api_client, item)
+
+        self.main_layout = QVBoxLayout()
+        self.setLayout(self.main_layout)
+
+        # Window and downsampling options:
+        options_layout = QHBoxLayout()
+        self.window_combo = CustomComboBox()
+        self.window_combo.addItems(list(TREND_WINDOWS))
+        self.window_combo.set_item("Last hour")
+        self.method_combo = CustomComboBox()
+        self.method_combo.addItems(["lttb", "minmax"])
+        options_layout.addWidget(QLabel("Window:"))
+        options_layout.addWidget(self.window_combo)
+        options_layout.addWidget(QLabel("Downsampling:"))
+        options_layout.addWidget(self.method_combo)
+        options_layout.addStretch()
+        self.main_layout.addLayout(options_layout)
+
+        # Chart:
+        self.chart = QChart()
+        self.chart.legend().setAlignment(Qt.AlignmentFlag.AlignBottom)
+        self.axis_x = QDateTimeAxis()
+        self.axis_x.setFormat("HH:mm:ss")
+        self.axis_y = QValueAxis()
+        self.chart.addAxis(self.axis_x, Qt.AlignmentFlag.AlignBottom)
+        self.chart.addAxis(self.axis_y, Qt.AlignmentFlag.AlignLeft)
+        self.chart_view = QChartView(self.chart)
+        self.chart_view.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.main_layout.addWidget(self.chart_view)
+
+        self.series = {}
+        self.last_id = None
+        self.appended_points = 0
+        self.loading = False
+
+        # Update the UI every 1 s:
+        self.timer.start(1000)
+
+        # Set initial state and connect signals:
+        self.window_combo.currentTextChanged.connect(self.load_window)
+        self.method_combo.currentTextChanged.connect(self.load_window)
+        self.load_window()
+
+    def get_points(self) -> int:
+        return max(self.chart_view.width(), 100)
+
+    def get_window_start(self) -> datetime:
+        return datetime.now(tzlocal.get_localzone()) - TREND_WINDOWS[self.window_combo.currentText()]
+
+    def load_window(self, *args):
+        self.loading = True
+        self.call_api(api_method="get_item_trend",
+                      item_id=self.item["item_id"],
+                      time_from=self.get_window_start().isoformat(),
+                      points=self.get_points(),
+                      method=self.method_combo.currentText(),
+                      callback=self.update_view)
+
+    def reload_data(self):
+        self.call_api(api_method="get_running_threads",
+                      callback=self.set_backend_running_status)
+
+    def on_running(self):
+        if self.loading:
+            return
+
+        # Only the values received since the last update are requested:
+        self.call_api(api_method="get_item_trend",
+                      item_id=self.item["item_id"],
+                      time_from=self.get_window_start().isoformat(),
+                      since_id=self.last_id,
+                      callback=self.append_view)
+
+    def on_finished(self):
+        pass
+
+    def get_series(self, label: str) -> QLineSeries:
+        if label not in self.series:
+            series = QLineSeries()
+            series.setName(label)
+            self.chart.addSeries(series)
+            series.attachAxis(self.axis_x)
+            series.attachAxis(self.axis_y)
+            self.series[label] = series
+        return self.series[label]
+
+    def update_view(self, data: dict):
+        if data is None:
+            return
+
+        for series in self.series.values():
+            series.clear()
+        for label, points in data["series"].items():
+            self.get_series(label).replace([QPointF(x, y) for x, y in points])
+
+        self.last_id = data["last_id"]
+        self.appended_points = 0
+        self.loading = False
+        self.update_axes()
+
+    def append_view(self, data: dict):
+        if data is None or self.loading or not data["series"]:
+            return
+
+        for label, points in data["series"].items():
+            self.get_series(label).append([QPointF(x, y) for x, y in points])
+        self.appended_points += max(len(points) for points in data["series"].values())
+
+        self.last_id = data["last_id"]
+        if self.appended_points > 2 * self.get_points():
+            self.load_window()
+        else:
+            self.update_axes()
+
+    def update_axes(self):
+        window_end = datetime.now(tzlocal.get_localzone())
+        window_start = self.get_window_start()
+        self.axis_x.setRange(QDateTime.fromMSecsSinceEpoch(int(window_start.timestamp() * 1000)),
+                             QDateTime.fromMSecsSinceEpoch(int(window_end.timestamp() * 1000)))
+
+        values = [point.y() for series in self.series.values() for point in series.points()]
+        if values:
+            margin = (max(values) - min(values)) * 0.05 or 1
+            self.axis_y.setRange(min(values) - margin, max(values) + margin)
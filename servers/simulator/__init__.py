@@ -0,0 +1,6 @@
+"""Configurable Modbus TCP simulator for load tests: N devices with register maps, value generators, response
+latencies, injected exceptions and timeouts, and connection limits.
+
+    python -m servers.simulator --config servers/simulator/example_config.json
+"""
+from servers.simulator.server import SimulatorThread, create_servers, load_simulator_config, run_simulator
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+import os
+
+from servers.simulator.server import load_simulator_config, run_simulator
+from utils.logger import setup_logging, get_logger
+
+
+logger = get_logger(__name__)
+
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(__file__), "example_config.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m servers.simulator", description="Simulate Modbus TCP devices.")
+    parser.add_argument("--config", help="Simulator configuration file.", default=EXAMPLE_CONFIG)
+    parser.add_argument("--log-level", help="Log level.", default="INFO")
+    args = parser.parse_args()
+
+    # Pymodbus logs every exception response as an error:
+    setup_logging("simulator", level=args.log_level, levels={"pymodbus": "CRITICAL"})
+    try:
+        asyncio.run(run_simulator(load_simulator_config(args.config)))
+    except KeyboardInterrupt:
+        logger.info("Simulator stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import random
+import time
+
+from pymodbus.datastore import ModbusSequentialDataBlock, ModbusSlaveContext
+
+from servers.simulator.generators import create_generator
+
+
+DEFAULT_REGISTERS_SIZE = 100
+
+# Key: register map name in the configuration, Value: data block of the slave context:
+REGISTER_TYPES = {
+    "coils": "c",
+    "discrete_inputs": "d",
+    "holding_registers": "h",
+    "input_registers": "i",
+}
+
+
+class LatencyDistribution:
+    """Response delay in seconds, sampled on every request.
+
+    Distributions: constant (value), uniform (minimum, maximum), normal (mean, stddev) and exponential (mean).
+    """
+
+    def __init__(self, distribution: str = "constant", rng: random.Random = None, value: float = 0,
+                 minimum: float = 0, maximum: float = 0, mean: float = 0, stddev: float = 0):
+        if distribution not in ("constant", "uniform", "normal", "exponential"):
+            raise ValueError(f"Unknown latency distribution '{distribution}'")
+        self.distribution = distribution
+        self.rng = rng or random.Random()
+        self.value = value
+        self.minimum = minimum
+        self.maximum = maximum
+        self.mean = mean
+        self.stddev = stddev
+
+    def sample(self) -> float:
+        if self.distribution == "uniform":
+            return self.rng.uniform(self.minimum, self.maximum)
+        if self.distribution == "normal":
+            return max(self.rng.gauss(self.mean, self.stddev), 0)
+        if self.distribution == "exponential":
+            return self.rng.expovariate(1 / self.mean) if self.mean > 0 else 0
+        return self.value
+
+
+class SimulatedDevice(ModbusSlaveContext):
+    """Slave context of a simulated device: register maps with value generators and the faults of its responses.
+
+    Addresses start at 0. Registers with a generator get a new value every time they are read; the rest keep their
+    initial or written values.
+    """
+
+    def __init__(self, name: str, registers: dict = None, latency: dict = None, exception_rate: float = 0,
+                 exception_code: int = 4, timeout_rate: float = 0, seed: int = None):
+        self.name = name
+        self.rng = random.Random(seed)
+        self.start_time = time.monotonic()
+        self.generators = {block: [] for block in REGISTER_TYPES.values()}  # Key: block, Value: [(address, count, generator)]
+
+        blocks = {}
+        for register_type, block in REGISTER_TYPES.items():
+            register_map = (registers or {}).get(register_type, {})
+            values = list(register_map.get("values", []))
+            values += [0] * (register_map.get("size", DEFAULT_REGISTERS_SIZE) - len(values))
+            # Context addresses are shifted by one, so the blocks start at 1 and address 0 is the first value:
+            blocks[block] = ModbusSequentialDataBlock(1, values)
+            for specification in register_map.get("generators", []):
+                self.generators[block].append((specification.get("address", 0),
+                                               specification.get("count", 1),
+                                               create_generator(specification, rng=self.rng)))
+        super().__init__(di=blocks["d"], co=blocks["c"], hr=blocks["h"], ir=blocks["i"])
+
+        self.latency = LatencyDistribution(**(latency or {}), rng=self.rng)
+        self.exception_rate = exception_rate
+        self.exception_code = exception_code
+        self.timeout_rate = timeout_rate
+
+    def update_generated_values(self, block: str, address: int, count: int):
+        elapsed_time = time.monotonic() - self.start_time
+        for generator_address, generator_count, generator in self.generators[block]:
+            start = max(address, generator_address)
+            end = min(address + count, generator_address + generator_count)
+            if start < end:
+                values = [generator(elapsed_time, index - generator_address) for index in range(start, end)]
+                self.store[block].setValues(start + 1, values)
+
+    def getValues(self, fc_as_hex, address, count=1):
+        self.update_generated_values(self.decode(fc_as_hex), address, count)
+        return super().getValues(fc_as_hex, address, count)
+
+    def get_fault(self) -> str | None:
+        """Fault of the next response: 'timeout' (no response), 'exception' or None."""
+        draw = self.rng.random()
+        if draw < self.timeout_rate:
+            return "timeout"
+        if draw < self.timeout_rate + self.exception_rate:
+            return "exception"
+        return None
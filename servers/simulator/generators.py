@@ -0,0 +1,59 @@
+import math
+import random
+from typing import Callable
+
+
+REGISTER_MAXIMUM = 0xFFFF
+
+# A generator returns the value of the register at the given index of its range, at the given time in seconds:
+Generator = Callable[[float, int], int]
+
+
+def constant(value: int = 0, **_) -> Generator:
+    return lambda time, index: value
+
+
+def counter(start: int = 0, step: int = 1, maximum: int = REGISTER_MAXIMUM, **_) -> Generator:
+    """Incremented on every read, wrapping around after the maximum."""
+    counts = {}
+
+    def generate(time: float, index: int) -> int:
+        counts[index] = counts.get(index, -1) + 1
+        return (start + counts[index] * step) % (maximum + 1)
+
+    return generate
+
+
+def uniform(minimum: int = 0, maximum: int = REGISTER_MAXIMUM, rng: random.Random = None, **_) -> Generator:
+    rng = rng or random.Random()
+    return lambda time, index: rng.randint(minimum, maximum)
+
+
+def sine(offset: int = 32768, amplitude: int = 1000, period: float = 60, phase: float = 0, **_) -> Generator:
+    """Sine wave of the given period in seconds. Every register of the range is shifted by the phase, in periods."""
+    return lambda time, index: round(offset + amplitude * math.sin(2 * math.pi * (time / period + index * phase)))
+
+
+def square(low: int = 0, high: int = 1, period: float = 10, duty: float = 0.5, **_) -> Generator:
+    """Square wave of the given period in seconds, also used to toggle coils and discrete inputs."""
+    return lambda time, index: high if (time / period) % 1 < duty else low
+
+
+GENERATORS = {
+    "constant": constant,
+    "counter": counter,
+    "uniform": uniform,
+    "sine": sine,
+    "square": square,
+}
+
+
+def create_generator(specification: dict, rng: random.Random = None) -> Generator:
+    """Create a generator from its configuration, e.g. {"type": "sine", "amplitude": 100, "period": 30}."""
+    generator_type = specification.get("type", "constant")
+    if generator_type not in GENERATORS:
+        raise ValueError(f"Unknown value generator '{generator_type}', use one of {list(GENERATORS)}")
+    arguments = {key: value for key, value in specification.items() if key not in ("type", "address", "count")}
+    generator = GENERATORS[generator_type](rng=rng, **arguments)
+    # Registers are unsigned 16-bit words, so negative values are stored in two's complement:
+    return lambda time, index: int(generator(time, index)) & REGISTER_MAXIMUM
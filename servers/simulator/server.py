@@ -0,0 +1,179 @@
+import asyncio
+import json
+import threading
+
+from pymodbus import FramerType
+from pymodbus.datastore import ModbusServerContext
+from pymodbus.exceptions import ModbusIOException, NoSuchSlaveException
+from pymodbus.pdu.pdu import ExceptionResponse
+from pymodbus.server import ModbusTcpServer
+from pymodbus.server.requesthandler import ServerRequestHandler
+
+from servers.simulator.device import SimulatedDevice
+from utils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+DEVICE_SETTINGS = ("registers", "latency", "exception_rate", "exception_code", "timeout_rate")
+BROADCAST_UNIT_ID = 0
+
+
+class SimulatorRequestHandler(ServerRequestHandler):
+    """Connection of a simulator server: delays, fails or drops the responses as configured in the device.
+
+    Every request is handled in its own task, so pipelined requests are answered as soon as their delay ends, in any
+    order, as gateways that support several transactions in flight do.
+    """
+
+    def __init__(self, owner):
+        super().__init__(owner)
+        self.tasks = set()
+
+    def callback_connected(self):
+        super().callback_connected()
+        max_connections = self.server.max_connections
+        if max_connections and len(self.server.active_connections) > max_connections:
+            logger.warning("Connection refused by %s: limit of %s connections", self.server.name, max_connections)
+            self.close()
+
+    def callback_data(self, data: bytes, addr: tuple = None) -> int:
+        """Handle all the complete requests of the received data. Incomplete ones wait for more data."""
+        used_length = 0
+        while used_length < len(data):
+            try:
+                length, pdu = self.framer.processIncomingFrame(data[used_length:])
+            except ModbusIOException:
+                self.server_send(ExceptionResponse(0, ExceptionResponse.ILLEGAL_FUNCTION), addr)
+                return len(data)
+            if not length:
+                break
+            used_length += length
+            if pdu:
+                task = asyncio.get_running_loop().create_task(self.handle_pdu(pdu, addr))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        return used_length
+
+    async def handle_pdu(self, pdu, address: tuple = None):
+        if pdu.dev_id == BROADCAST_UNIT_ID and BROADCAST_UNIT_ID not in self.server.context:
+            # Broadcasts are written to every device and not answered:
+            for unit_id in self.server.context.slaves():
+                await pdu.update_datastore(self.server.context[unit_id])
+            return
+
+        try:
+            device = self.server.context[pdu.dev_id]
+            fault = device.get_fault()
+            await asyncio.sleep(device.latency.sample())
+            if fault == "timeout":
+                return
+            if fault == "exception":
+                response = ExceptionResponse(pdu.function_code, device.exception_code)
+            else:
+                response = await pdu.update_datastore(device)
+        except NoSuchSlaveException:
+            response = ExceptionResponse(pdu.function_code, ExceptionResponse.GATEWAY_NO_RESPONSE)
+        except Exception as error:
+            logger.error("Simulated device error: %s", error, exc_info=True)
+            response = ExceptionResponse(pdu.function_code, ExceptionResponse.SLAVE_FAILURE)
+
+        if self.transport:
+            response.transaction_id = pdu.transaction_id
+            response.dev_id = pdu.dev_id
+            self.server_send(response, address)
+
+
+class SimulatorTcpServer(ModbusTcpServer):
+    def __init__(self, name: str, context: ModbusServerContext, address: tuple, max_connections: int = 0,
+                 framer: FramerType = FramerType.SOCKET):
+        super().__init__(context, address=address, framer=framer)
+        self.name = name
+        self.max_connections = max_connections
+
+    def callback_new_connection(self):
+        return SimulatorRequestHandler(self)
+
+
+def load_simulator_config(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def create_servers(config: dict) -> list[SimulatorTcpServer]:
+    """Create the servers of the devices in the configuration. It must be called from a running event loop.
+
+    Every device entry is served on 'count' consecutive ports from 'port', each with the unit IDs in 'unit_ids' or 1 to
+    'units', so N devices can be simulated with N ports or with N unit IDs on a single port. With the 'rtu' framer, the
+    port serves RTU frames over TCP, e.g. a serial bus of N slaves for a 'socket://host:port' serial port.
+    """
+    host = config.get("host", "127.0.0.1")
+    servers = []
+    for device_config in config["devices"]:
+        name = device_config.get("name", "device")
+        unit_ids = device_config.get("unit_ids") or list(range(1, device_config.get("units", 1) + 1))
+        seed = device_config.get("seed")
+        for device_index in range(device_config.get("count", 1)):
+            port = device_config["port"] + device_index
+            devices = {}
+            for unit_id in unit_ids:
+                devices[unit_id] = SimulatedDevice(
+                    name=f"{name}-{device_index}/{unit_id}",
+                    seed=None if seed is None else hash((seed, device_index, unit_id)),
+                    **{key: device_config[key] for key in DEVICE_SETTINGS if key in device_config}
+                )
+            servers.append(SimulatorTcpServer(name=f"{name}-{device_index} ({host}:{port})",
+                                              context=ModbusServerContext(slaves=devices, single=False),
+                                              address=(host, port),
+                                              max_connections=device_config.get("max_connections", 0),
+                                              framer=FramerType(device_config.get("framer", "socket"))))
+    return servers
+
+
+async def run_simulator(config: dict, ready: threading.Event = None, stop: asyncio.Event = None):
+    """Serve all the devices of the configuration until the stop event is set or the task is cancelled."""
+    servers = create_servers(config)
+    try:
+        for server in servers:
+            await server.serve_forever(background=True)
+            if not server.transport:
+                raise OSError(f"Simulator server {server.name} could not listen")
+        logger.info("Simulating %s devices in %s ports", sum(len(server.context.slaves()) for server in servers),
+                    len(servers))
+        if ready:
+            ready.set()
+        await (stop or asyncio.Event()).wait()
+    finally:
+        for server in servers:
+            await server.shutdown()
+
+
+class SimulatorThread(threading.Thread):
+    """Run the simulator in a background thread, e.g. for benchmarks. 'start' returns once it is listening."""
+
+    def __init__(self, config: dict):
+        super().__init__(name="modbus-simulator", daemon=True)
+        self.config = config
+        self.ready = threading.Event()
+        self.loop = None
+        self.stop_event = None
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.ready.set()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        await run_simulator(self.config, ready=self.ready, stop=self.stop_event)
+
+    def start(self):
+        super().start()
+        self.ready.wait()
+
+    def stop(self):
+        if self.loop and self.stop_event:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        self.join()
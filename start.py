@@ -1,45 +1,102 @@
 # start.py
 import multiprocessing
 import os
+import re
+import sqlite3
 import time
-import requests
 import argparse
 from multiprocessing import Process
 from config import load_app_config, ALEMBIC_INI, DB_FILE, ALEMBIC_PATH, LOG_PATH
-from alembic.config import Config
-from alembic import command
+from utils.logger import setup_logging, shutdown_logging, get_logger
 import traceback
 
-from backend import main as backend_main
-from frontend import main_window as frontend_main
+
+# Backend, frontend and Alembic modules are imported where they are used, so every process only loads what it needs
+# and the launcher starts without loading PyQt, SQLAlchemy or pymodbus.
+
+logger = get_logger("launcher")
+
+
+BACKEND_READY_TIMEOUT = 10
+
+
+def get_head_revision(versions_path: str = os.path.join(ALEMBIC_PATH, "versions")) -> str | None:
+    """Latest revision of the migration scripts, read from their headers without loading Alembic."""
+    revisions = set()
+    down_revisions = set()
+    for file_name in os.listdir(versions_path):
+        if not file_name.endswith(".py"):
+            continue
+        with open(os.path.join(versions_path, file_name), encoding="utf-8") as f:
+            script = f.read()
+        revision = re.search(r"^revision: str = '(\w+)'", script, re.MULTILINE)
+        down_revision = re.search(r"^down_revision: .* = '(\w+)'", script, re.MULTILINE)
+        if revision:
+            revisions.add(revision.group(1))
+        if down_revision:
+            down_revisions.add(down_revision.group(1))
+    heads = revisions - down_revisions
+    return heads.pop() if len(heads) == 1 else None
+
+
+def get_database_revision(database_file: str = DB_FILE) -> str | None:
+    """Revision stored by Alembic in the database, or None if the database or the version table does not exist."""
+    if not os.path.exists(database_file):
+        return None
+    try:
+        with sqlite3.connect(database_file) as connection:
+            row = connection.execute("SELECT version_num FROM alembic_version").fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
 
 
 def run_alembic_migrations(db_url):
-    print("Running Alembic migrations...")
+    from alembic.config import Config
+    from alembic import command
+
+    logger.info("Running Alembic migrations...")
     alembic_cfg = Config(str(ALEMBIC_INI))
     alembic_cfg.set_main_option('script_location', str(ALEMBIC_PATH))
     alembic_cfg.set_main_option('sqlalchemy.url', db_url)
     command.upgrade(alembic_cfg, 'head')
 
 
+def upgrade_database(db_url):
+    """Run the migrations only if the database is not at the latest revision."""
+    database_revision = get_database_revision()
+    head_revision = get_head_revision()
+    if head_revision is not None and database_revision == head_revision:
+        logger.info("Database is up to date (revision %s).", database_revision)
+        return
+    run_alembic_migrations(db_url)
+
+
 def rebuild_database(db_url):
     if os.path.exists(DB_FILE):
-        print("Removing existing database...")
+        logger.info("Removing existing database...")
         os.remove(DB_FILE)
     run_alembic_migrations(db_url)
 
 
-def run_backend(host, port, db_url):
+def run_backend(host, port, db_url, ready_connection=None):
     try:
-        backend_main.run(debug=False, database_url=db_url, host=host, port=port)
+        from backend import main as backend_main
+
+        backend_main.run(debug=False, database_url=db_url, host=host, port=port, ready_connection=ready_connection)
     except Exception:
         with open(f"{LOG_PATH}/backend_error.log", "w") as f:
             f.write(traceback.format_exc())
         raise
 
 
-def run_frontend(host, port):
+def run_frontend(host, port, backend_ready=None):
     try:
+        # The GUI modules are imported while the backend starts, and the window is only opened once it is ready:
+        from frontend import main_window as frontend_main
+
+        if backend_ready is not None and not backend_ready.wait(BACKEND_READY_TIMEOUT):
+            return
         frontend_main.run(host=host, port=port)
     except Exception:
         with open(f"{LOG_PATH}/frontend_error.log", "w") as f:
@@ -47,19 +104,16 @@ def run_frontend(host, port):
         raise
 
 
-def wait_for_backend(config, timeout=10):
-    api_url = f"http://{config['api']['host']}:{config['api']['port']}"
-    print(f"Waiting for backend to become available at {api_url}...")
-    for _ in range(timeout):
-        try:
-            r = requests.get(f"{api_url}/ping", timeout=1)
-            if r.status_code == 200:
-                print("Backend is live.")
-                return True
-        except requests.exceptions.RequestException:
-            pass
-        time.sleep(1)
-    print("Backend did not respond in time.")
+def wait_for_backend(ready_connection, timeout=BACKEND_READY_TIMEOUT) -> bool:
+    """Wait for the backend process to signal that it is listening. Returns False on timeout or if it exits."""
+    logger.info("Waiting for backend to become available...")
+    try:
+        if ready_connection.poll(timeout) and ready_connection.recv():
+            logger.info("Backend is live.")
+            return True
+    except EOFError:
+        pass
+    logger.warning("Backend did not respond in time.")
     return False
 
 
@@ -73,55 +127,65 @@ def parse_args():
 def main():
     args = parse_args()
 
-    print(f"Logs path: {LOG_PATH}")
-
     config = load_app_config()
+    setup_logging("launcher", **config.get("logging", {}))
+    logger.info("Logs path: %s", LOG_PATH)
 
     if args.rebuild_db:
         rebuild_database(config["db"]["url"])
-    elif not os.path.exists(DB_FILE):
-        run_alembic_migrations(config["db"]["url"])
+    else:
+        upgrade_database(config["db"]["url"])
 
     if args.test:
-        print("Test mode: config loaded, DB check passed. No apps launched.")
+        logger.info("Test mode: config loaded, DB check passed. No apps launched.")
         return
 
-    backend_proc = Process(target=run_backend, args=(config["api"]["host"], config["api"]["port"], config["db"]["url"]))
+    ready_connection, backend_ready_connection = multiprocessing.Pipe(duplex=False)
+    backend_proc = Process(target=run_backend, args=(config["api"]["host"], config["api"]["port"], config["db"]["url"], backend_ready_connection))
     backend_proc.start()
+    backend_ready_connection.close()  # Only the backend keeps the sending end, so its exit is seen as EOF
 
-    if wait_for_backend(config):
-        frontend_proc = Process(target=run_frontend, args=(config["api"]["host"], config["api"]["port"]))
-        frontend_proc.start()
+    # Both processes start at once, and the frontend waits for the backend before opening the window:
+    backend_ready = multiprocessing.Event()
+    frontend_proc = Process(target=run_frontend, args=(config["api"]["host"], config["api"]["port"], backend_ready))
+    frontend_proc.start()
+
+    if wait_for_backend(ready_connection):
+        backend_ready.set()
 
         try:
             while True:
                 if not frontend_proc.is_alive():
-                    print("Frontend closed.")
+                    logger.info("Frontend closed.")
                     break
                 if not backend_proc.is_alive():
-                    print("Backend terminated.")
+                    logger.warning("Backend terminated.")
                     break
                 time.sleep(0.5)
 
         except KeyboardInterrupt:
-            print("Keyboard interrupt received.")
+            logger.info("Keyboard interrupt received.")
 
         finally:
             if frontend_proc.is_alive():
-                print("Terminating frontend...")
+                logger.info("Terminating frontend...")
                 frontend_proc.terminate()
                 frontend_proc.join()
 
             if backend_proc.is_alive():
-                print("Terminating backend...")
+                logger.info("Terminating backend...")
                 backend_proc.terminate()
                 backend_proc.join()
 
     else:
-        print("Backend not available, aborting.")
+        logger.warning("Backend not available, aborting.")
+        frontend_proc.terminate()
+        frontend_proc.join()
         backend_proc.terminate()
         backend_proc.join()
 
+    shutdown_logging()
+
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()
@@ -1,39 +1,164 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
 
 from config import LOG_PATH
 
 
-class CustomLogger(logging.Logger):
-    def __init__(self, name: str, log_file: str = None):
-        # Initialize base logger:
-        super().__init__(name, logging.DEBUG)
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
 
-        if log_file:
-            self.log_file = log_file
-        else:
-            file_name = name.replace(".", "_")
-            self.log_file = f"{LOG_PATH}/{file_name}.log"
+# Attributes of every log record. The rest are the structured fields given with 'extra':
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
 
-        os.makedirs(LOG_PATH, exist_ok=True)
+_queue = None
+_listener = None
+_listener_pid = None  # Forked processes inherit the listener, but not its thread
+_session_handler = None
 
-        # Create a formatter:
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
-        # Console: INFO level
+class StructuredFormatter(logging.Formatter):
+    """Formats the message and appends the structured fields of the record as JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = {key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES}
+        if fields:
+            message += " " + json.dumps(fields, default=str)
+        return message
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves the formatting to the listener thread.
+
+    The standard handler formats the message in the calling thread. Records never leave the process, so they are
+    queued as they are and the calling thread only pays for the queue put.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SessionFileHandler(logging.Handler):
+    """Writes the records of every execution session to its own rotating log file.
+
+    A record belongs to a session when it has an 'execution_session_id' field. Files are opened with 'open_session_log'
+    and closed with 'close_session_log', so records of unknown sessions are skipped. Closing goes through the queue, so
+    the records logged before it are still written.
+    """
+
+    def __init__(self, log_path: str):
+        super().__init__()
+        self.log_path = log_path
+        self.handlers = {}  # Key: execution session ID, Value: file handler
+
+    def open(self, execution_session_id: int):
+        os.makedirs(self.log_path, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(f"{self.log_path}/session_{execution_session_id}.log",
+                                                       maxBytes=LOG_FILE_MAX_BYTES,
+                                                       backupCount=LOG_FILE_BACKUPS,
+                                                       delay=True)
+        handler.setFormatter(self.formatter)
+        self.handlers[execution_session_id] = handler
+
+    def close_session(self, execution_session_id: int):
+        handler = self.handlers.pop(execution_session_id, None)
+        if handler:
+            handler.close()
+
+    def emit(self, record: logging.LogRecord):
+        if getattr(record, "close_session_log", False):
+            self.close_session(record.execution_session_id)
+            return
+        handler = self.handlers.get(getattr(record, "execution_session_id", None))
+        if handler:
+            handler.handle(record)
+
+    def close(self):
+        for execution_session_id in list(self.handlers):
+            self.close_session(execution_session_id)
+        super().close()
+
+
+def setup_logging(component: str, level: str = "INFO", levels: dict = None, console: bool = True,
+                  log_path: str = LOG_PATH):
+    """Configure the logging of the current process. Call it once, at the start of the process.
+
+    Loggers only put the records in a queue. A listener thread formats them and writes them to the console, to the
+    rotating log file of the component and to the log files of the execution sessions. Levels are set by logger name,
+    e.g. {"backend.core.runner": "DEBUG"}, so disabled records are discarded before they are queued.
+    """
+    global _queue, _listener, _listener_pid, _session_handler
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    os.makedirs(log_path, exist_ok=True)
+    formatter = StructuredFormatter(LOG_FORMAT)
+
+    file_handler = logging.handlers.RotatingFileHandler(f"{log_path}/{component}.log",
+                                                        maxBytes=LOG_FILE_MAX_BYTES,
+                                                        backupCount=LOG_FILE_BACKUPS)
+    file_handler.setFormatter(formatter)
+    file_handler.setLevel(logging.DEBUG)
+    _session_handler = SessionFileHandler(f"{log_path}/sessions")
+    _session_handler.setFormatter(formatter)
+    handlers = [file_handler, _session_handler]
+    if console:
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        self.addHandler(console_handler)
+        console_handler.setLevel(logging.DEBUG)
+        handlers.append(console_handler)
+
+    _queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+    atexit.register(shutdown_logging)
+
+    root_logger = logging.getLogger()
+    root_logger.handlers = [LazyQueueHandler(_queue)]
+    root_logger.setLevel(level)
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+
+def shutdown_logging():
+    """Write the queued records and stop the listener thread."""
+    global _queue, _listener, _session_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _queue = None
+        _listener = None
+        _session_handler = None
+
+
+def open_session_log(execution_session_id: int):
+    """Start writing the records with the given 'execution_session_id' field to their own log file."""
+    if _session_handler is not None:
+        _session_handler.open(execution_session_id)
+
+
+def close_session_log(execution_session_id: int):
+    if _queue is not None:
+        # Level 0 records are skipped by the console and component file handlers:
+        _queue.put(logging.makeLogRecord({"levelno": logging.NOTSET,
+                                          "execution_session_id": execution_session_id,
+                                          "close_session_log": True}))
+
 
-        # File: DEBUG level
-        file_handler = logging.FileHandler(self.log_file)
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
-        self.addHandler(file_handler)
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
 
 
 if __name__ == "__main__":
-    logger = CustomLogger("logger")
+    setup_logging("logger", level="DEBUG")
+    logger = get_logger("logger")
     logger.debug("Debug log")
-    logger.info("Info log")
+    logger.info("Info log", extra={"item_id": 1})
+    shutdown_logging()